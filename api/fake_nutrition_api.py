@@ -0,0 +1,130 @@
+"""A local stand-in for the CalorieNinjas nutrition endpoint, for development and tests without an API key or network.
+
+Point the app at it with API_BASE_URL, e.g.:
+    python -m api.fake_nutrition_api --port 8001 --latency 0.5 --failure-rate 0.2
+    API_BASE_URL=http://127.0.0.1:8001/v1/nutrition python weightloss_dashboard.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# values per 100 g, in the format of one CalorieNinjas item
+FOODS: Dict[str, Dict[str, float]] = {
+    "oats": {"calories": 379.0, "fat_total_g": 6.5, "fat_saturated_g": 1.1, "protein_g": 13.2, "sodium_mg": 6, "potassium_mg": 362, "cholesterol_mg": 0, "carbohydrates_total_g": 67.7, "fiber_g": 10.1, "sugar_g": 1.0},
+    "banana": {"calories": 89.0, "fat_total_g": 0.3, "fat_saturated_g": 0.1, "protein_g": 1.1, "sodium_mg": 1, "potassium_mg": 22, "cholesterol_mg": 0, "carbohydrates_total_g": 23.2, "fiber_g": 2.6, "sugar_g": 12.3},
+    "rice": {"calories": 127.4, "fat_total_g": 0.3, "fat_saturated_g": 0.1, "protein_g": 2.7, "sodium_mg": 1, "potassium_mg": 42, "cholesterol_mg": 0, "carbohydrates_total_g": 28.4, "fiber_g": 0.4, "sugar_g": 0.1},
+    "chicken breast": {"calories": 166.2, "fat_total_g": 3.6, "fat_saturated_g": 1.0, "protein_g": 31.0, "sodium_mg": 72, "potassium_mg": 179, "cholesterol_mg": 85, "carbohydrates_total_g": 0.0, "fiber_g": 0.0, "sugar_g": 0.0},
+    "apple": {"calories": 53.0, "fat_total_g": 0.2, "fat_saturated_g": 0.0, "protein_g": 0.3, "sodium_mg": 1, "potassium_mg": 11, "cholesterol_mg": 0, "carbohydrates_total_g": 14.1, "fiber_g": 2.4, "sugar_g": 10.3},
+    "bread": {"calories": 261.6, "fat_total_g": 3.4, "fat_saturated_g": 0.7, "protein_g": 8.9, "sodium_mg": 483, "potassium_mg": 112, "cholesterol_mg": 0, "carbohydrates_total_g": 49.2, "fiber_g": 2.7, "sugar_g": 5.3},
+    "egg": {"calories": 147.0, "fat_total_g": 9.7, "fat_saturated_g": 3.1, "protein_g": 12.6, "sodium_mg": 139, "potassium_mg": 199, "cholesterol_mg": 371, "carbohydrates_total_g": 0.8, "fiber_g": 0.0, "sugar_g": 0.4},
+    "yogurt": {"calories": 61.0, "fat_total_g": 3.3, "fat_saturated_g": 2.1, "protein_g": 3.5, "sodium_mg": 45, "potassium_mg": 30, "cholesterol_mg": 13, "carbohydrates_total_g": 4.7, "fiber_g": 0.0, "sugar_g": 4.7},
+    "pasta": {"calories": 157.1, "fat_total_g": 0.9, "fat_saturated_g": 0.2, "protein_g": 5.8, "sodium_mg": 1, "potassium_mg": 58, "cholesterol_mg": 0, "carbohydrates_total_g": 30.9, "fiber_g": 1.8, "sugar_g": 0.6},
+    "salmon": {"calories": 208.0, "fat_total_g": 12.4, "fat_saturated_g": 3.1, "protein_g": 22.1, "sodium_mg": 59, "potassium_mg": 211, "cholesterol_mg": 55, "carbohydrates_total_g": 0.0, "fiber_g": 0.0, "sugar_g": 0.0},
+}
+
+_QUANTITY = re.compile(r"^\s*(.*?)\s+(\d+(?:\.\d+)?)\s*g\s*$")
+
+
+def parse_query(query: str) -> List[Tuple[str, float]]:
+    """Splits a query like "oats 100g and rice 50g" into (food, grams) pairs, 100 g where no quantity is given."""
+    pairs = []
+    for part in re.split(r"\s+and\s+|,", query):
+        if not part.strip():
+            continue
+        match = _QUANTITY.match(part)
+        name, grams = (match.group(1), float(match.group(2))) if match else (part.strip(), 100.0)
+        pairs.append((name.lower(), grams))
+    return pairs
+
+
+def lookup(query: str) -> Dict[str, List[Dict[str, any]]]:
+    """Answers a query like the real API: one item per known food, in query order, unknown foods are left out."""
+    items = []
+    for name, grams in parse_query(query):
+        values = FOODS.get(name)
+        if values is None:
+            continue
+        item = {"name": name, "serving_size_g": grams}
+        item.update({key: value * grams / 100.0 for key, value in values.items()})
+        items.append(item)
+    return {"items": items}
+
+
+class FakeNutritionApiHandler(BaseHTTPRequestHandler):
+    """Serves GET requests with a query parameter, optionally slowed down and failing with 503 at random."""
+
+    latency = 0.0
+    failure_rate = 0.0
+    request_count = 0
+    _count_lock = threading.Lock()
+
+    def do_GET(self) -> None:
+        with self._count_lock:
+            type(self).request_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            self._respond(503, {"error": "service unavailable"})
+            return
+        query = parse_qs(urlparse(self.path).query).get("query", [""])[0]
+        self._respond(200, lookup(query))
+
+    def _respond(self, status: int, body: Dict[str, any]) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def start_fake_api(
+    host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, failure_rate: float = 0.0
+) -> Tuple[ThreadingHTTPServer, str]:
+    """Starts the fake API in a background thread.
+
+    Args:
+        host (str): The address to listen on.
+        port (int): The port to listen on, 0 for any free port.
+        latency (float): Seconds to wait before every response.
+        failure_rate (float): The share of requests answered with 503.
+
+    Returns:
+        tuple: The running server, stopped with server.shutdown(), and the URL to use as API_BASE_URL.
+    """
+    handler = type(
+        "ConfiguredFakeNutritionApiHandler",
+        (FakeNutritionApiHandler,),
+        {"latency": latency, "failure_rate": failure_rate, "request_count": 0},
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1/nutrition"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before every response")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of requests answered with 503")
+    args = parser.parse_args()
+    server, url = start_fake_api(args.host, args.port, args.latency, args.failure_rate)
+    print(f"Fake nutrition API listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""Imports food composition datasets into a local database that is consulted before the nutrition API.
+
+Run from the repository root:
+    python -m api.food_composition import foods.csv
+    python -m api.food_composition lookup "chiken brest"
+"""
+import argparse
+import csv
+import difflib
+import heapq
+import json
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from api.nutrition_cache import normalize_food_name
+from data_tools.data_manager import connection_manager
+from data_tools.migrations import TABLE_SCHEMAS
+
+# the values per 100 g, named like the items of the CalorieNinjas API and the columns of food_eaten
+NUTRIENT_COLUMNS = [
+    column for column in TABLE_SCHEMAS["food_eaten"] if column not in ("id", "timestamp", "name", "serving_size_g")
+]
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(a: Set[str], b: Set[str]) -> float:
+    return 2 * len(a & b) / (len(a) + len(b)) if a or b else 0.0
+
+
+def read_records(path: str) -> Iterator[Dict[str, any]]:
+    """Reads the foods of a CSV file with a header row, or of a JSON file holding a list of objects or a CalorieNinjas response.
+
+    Args:
+        path (str): The path of the dataset, its extension decides the format.
+
+    Returns:
+        Iterator[dict]: One record per food with a name and its values per serving_size_g, per 100 g if it is missing.
+    """
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        yield from data["items"] if isinstance(data, dict) else data
+        return
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+class FoodCompositionDatabase:
+    """A local table of nutrition values per 100 g with a fuzzy name index, so known foods are found without the API.
+
+    A lookup first tries the normalized name exactly. Otherwise the FTS5 trigram index collects the foods sharing
+    the rarest three-letter sequences with the query, and the most similar one is taken if it is similar enough.
+    That also finds names with typos or a different word order, e.g. "chiken brest" or "breast chicken".
+    Foods that contain all words of the query are preferred as candidates.
+
+    Args:
+        db_path (str): The path to the SQLite3 database file holding the table.
+        min_similarity (float): The minimum similarity between 0 and 1 for a fuzzy match.
+        candidates (int): The number of foods taken from the trigram index.
+        compared (int): The number of candidates with the largest trigram overlap whose similarity is computed.
+        trigrams_per_word (int): The number of the rarest trigrams of each word of the query that are searched for.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        min_similarity: float = 0.75,
+        candidates: int = 20,
+        compared: int = 3,
+        trigrams_per_word: int = 2,
+    ):
+        self.db_path = db_path
+        self.min_similarity = min_similarity
+        self.candidates = candidates
+        self.compared = compared
+        self.trigrams_per_word = trigrams_per_word
+        self._document_frequencies: Optional[Dict[str, int]] = None
+        columns = ", ".join(f"{column} REAL NOT NULL DEFAULT 0" for column in NUTRIENT_COLUMNS)
+        with connection_manager.transaction(self.db_path) as cursor:
+            cursor.execute(
+                f"""CREATE TABLE IF NOT EXISTS food_composition (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL UNIQUE,
+                    {columns},
+                    source TEXT
+                )"""
+            )
+            cursor.execute(
+                """CREATE VIRTUAL TABLE IF NOT EXISTS food_composition_fts USING fts5(
+                    name, content='food_composition', content_rowid='id', tokenize='trigram'
+                )"""
+            )
+            cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS food_composition_vocab USING fts5vocab(food_composition_fts, 'row')"
+            )
+
+    def import_records(self, records: Iterable[Dict[str, any]], source: Optional[str] = None, chunk_size: int = 5000) -> int:
+        """Inserts or replaces foods and rebuilds the name index, all in one transaction.
+
+        Args:
+            records (Iterable[dict]): The foods, each with a name and any of the NUTRIENT_COLUMNS. Missing values count as 0.
+                The values are per serving_size_g like in the items of a CalorieNinjas response, or per 100 g without it,
+                and are stored scaled to 100 g.
+            source (str, optional): Where the values come from, e.g. the file name.
+            chunk_size (int): The number of foods inserted per executemany call.
+
+        Returns:
+            int: The number of imported foods. Records without a name, with values that are not numbers or with a serving
+                size that is not positive are skipped.
+        """
+        placeholders = ", ".join(["?"] * (len(NUTRIENT_COLUMNS) + 2))
+        query = (
+            f"INSERT INTO food_composition (name, {', '.join(NUTRIENT_COLUMNS)}, source) VALUES ({placeholders}) "
+            f"ON CONFLICT(name) DO UPDATE SET "
+            + ", ".join(f"{column} = excluded.{column}" for column in NUTRIENT_COLUMNS + ["source"])
+        )
+        imported = 0
+        with connection_manager.transaction(self.db_path) as cursor:
+            chunk = []
+            for record in records:
+                name = normalize_food_name(str(record.get("name") or ""))
+                try:
+                    # the same scaling as _scale_to_100g in api.foodninja_api
+                    serving_size_g = record.get("serving_size_g")
+                    scale = 1.0 if serving_size_g in (None, "") else 100.0 / float(serving_size_g)
+                    values = [float(record.get(column) or 0) * scale for column in NUTRIENT_COLUMNS]
+                except (TypeError, ValueError, ZeroDivisionError):
+                    continue
+                if not name or scale <= 0:
+                    continue
+                chunk.append((name, *values, source))
+                if len(chunk) >= chunk_size:
+                    cursor.executemany(query, chunk)
+                    imported += len(chunk)
+                    chunk = []
+            cursor.executemany(query, chunk)
+            imported += len(chunk)
+            cursor.execute("INSERT INTO food_composition_fts (food_composition_fts) VALUES ('rebuild')")
+        self._document_frequencies = None
+        return imported
+
+    def import_file(self, path: str) -> int:
+        """Imports a CSV or JSON dataset, see read_records for the formats.
+
+        Args:
+            path (str): The path of the dataset.
+
+        Returns:
+            int: The number of imported foods.
+        """
+        return self.import_records(read_records(path), source=os.path.basename(path))
+
+    def _to_item(self, row: tuple) -> Dict[str, any]:
+        name, *values = row
+        return {"name": name, "serving_size_g": 100.0, **dict(zip(NUTRIENT_COLUMNS, values))}
+
+    def _trigram_frequencies(self, cursor) -> Dict[str, int]:
+        """Returns the number of foods containing each trigram, read from the index once and kept until the next import."""
+        if self._document_frequencies is None:
+            self._document_frequencies = dict(
+                cursor.execute("SELECT term, doc FROM food_composition_vocab").fetchall()
+            )
+        return self._document_frequencies
+
+    def _fuzzy_candidates(self, cursor, name: str) -> List[tuple]:
+        """Collects the foods sharing the rarest trigrams of the words of the name.
+        Common trigrams like "ed " match a large part of the table and would make ranking the matches slow,
+        trigrams no food contains are typos of the query. Foods matching every word are searched first,
+        foods matching any word only if there are none.
+        """
+        frequencies = self._trigram_frequencies(cursor)
+        word_groups = []
+        for word in name.split():
+            word_trigrams = {word[i:i + 3] for i in range(len(word) - 2)} & frequencies.keys()
+            rarest = sorted(word_trigrams, key=frequencies.get)[:self.trigrams_per_word]
+            if rarest:
+                word_groups.append(" OR ".join('"{}"'.format(trigram.replace('"', '""')) for trigram in rarest))
+        if not word_groups:
+            return []
+        query = f"""SELECT food_composition.name, {', '.join(NUTRIENT_COLUMNS)}
+            FROM food_composition_fts JOIN food_composition ON food_composition.id = food_composition_fts.rowid
+            WHERE food_composition_fts MATCH ? ORDER BY rank LIMIT ?"""
+        for operator in (" AND ", " OR "):
+            candidates = cursor.execute(
+                query, (operator.join(f"({group})" for group in word_groups), self.candidates)
+            ).fetchall()
+            if candidates or len(word_groups) == 1:
+                return candidates
+        return candidates
+
+    def similarity(self, query: str, name: str) -> float:
+        """Rates how alike two normalized food names are, between 0 and 1, ignoring the order of their words."""
+        matcher = difflib.SequenceMatcher(None, query, name)
+        # the quick ratios only count shared characters, so they bound both word orders
+        if matcher.real_quick_ratio() < self.min_similarity or matcher.quick_ratio() < self.min_similarity:
+            return 0.0
+        sorted_words = difflib.SequenceMatcher(None, " ".join(sorted(query.split())), " ".join(sorted(name.split())))
+        return max(matcher.ratio(), sorted_words.ratio())
+
+    def lookup(self, food_item: str) -> Optional[Dict[str, any]]:
+        """Finds the nutrition values of a food by its exact or a similar name.
+
+        Args:
+            food_item (str): The food name as entered by the user.
+
+        Returns:
+            dict: The values per 100 g in the format of one CalorieNinjas item, or None if no food is similar enough.
+        """
+        name = normalize_food_name(food_item)
+        with connection_manager.connection(self.db_path) as conn:
+            cursor = conn.cursor()
+            row = cursor.execute(
+                f"SELECT name, {', '.join(NUTRIENT_COLUMNS)} FROM food_composition WHERE name = ?", (name,)
+            ).fetchone()
+            if row is not None:
+                return self._to_item(row)
+            candidates = self._fuzzy_candidates(cursor, name)
+        if not candidates:
+            return None
+        # the cheap trigram overlap picks the few candidates that are worth the exact comparison
+        query_trigrams = _trigrams(name)
+        candidates = heapq.nlargest(
+            self.compared, candidates, key=lambda candidate: _dice(query_trigrams, _trigrams(candidate[0]))
+        )
+        similarity, best = max((self.similarity(name, candidate[0]), candidate) for candidate in candidates)
+        if similarity < self.min_similarity:
+            return None
+        return self._to_item(best)
+
+    def count(self) -> int:
+        """Returns the number of foods in the table."""
+        with connection_manager.connection(self.db_path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM food_composition").fetchone()[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.getenv("FOOD_COMPOSITION_DB", "data/food_composition.db"))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="import CSV or JSON datasets with values per 100 g")
+    import_parser.add_argument("paths", nargs="+")
+    lookup_parser = subparsers.add_parser("lookup", help="look a food up like the app does")
+    lookup_parser.add_argument("food_item")
+    args = parser.parse_args()
+
+    database = FoodCompositionDatabase(args.db)
+    if args.command == "import":
+        for path in args.paths:
+            print(f"{path}: {database.import_file(path)} foods imported")
+        print(f"{args.db}: {database.count()} foods")
+    else:
+        print(json.dumps(database.lookup(args.food_item), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Set
+
+from api.foodninja_api import get_food_info_from_api
+from data_tools.data_manager import bump_data_version, connection_manager, ensure_schema
+from data_tools.data_processing import normalize_timestamp, process_nutrition_data
+from data_tools.migrations import FOOD_LOOKUP_JOBS_TABLE
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class FoodLookupQueue:
+    """A background queue resolving the nutrition values of food entries, so a submission does not wait for the API.
+
+    Submitting a food inserts the food eaten entry without nutrition values together with a lookup job, both in one transaction.
+    Jobs live in the database, so they survive a restart and are visible to every process. A pool of worker threads
+    claims due jobs, looks the food up and fills in the entry. Lookups that fail because the API is unreachable are
+    retried with exponential backoff until max_attempts is reached, foods the API does not know fail right away.
+
+    Args:
+        db_path (str): The path to the SQLite3 database file.
+        workers (int): The number of worker threads.
+        max_attempts (int): The number of attempts before a job is marked as failed.
+        retry_delay (float): The seconds to wait before the first retry, doubled for every further one.
+        max_retry_delay (float): The maximum number of seconds to wait between two attempts.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        workers: int = 2,
+        max_attempts: int = 5,
+        retry_delay: float = 5.0,
+        max_retry_delay: float = 300.0,
+    ):
+        ensure_schema(db_path)
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="food-lookup")
+        # the timers of the scheduled retries, cancelled on shutdown so none submits to the stopped executor
+        self._timers: Set[threading.Timer] = set()
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._recover()
+
+    def _recover(self) -> None:
+        """Requeues the jobs a previous process left running and schedules all unfinished jobs."""
+        now = time.time()
+        with connection_manager.transaction(self.db_path) as cursor:
+            cursor.execute(
+                f"UPDATE {FOOD_LOOKUP_JOBS_TABLE} SET status = ?, updated_at = ? WHERE status = ?",
+                (PENDING, now, RUNNING),
+            )
+            next_attempts = cursor.execute(
+                f"SELECT next_attempt_at FROM {FOOD_LOOKUP_JOBS_TABLE} WHERE status = ?", (PENDING,)
+            ).fetchall()
+        for (next_attempt_at,) in next_attempts:
+            self._schedule(next_attempt_at - now)
+
+    def _schedule(self, delay: float) -> None:
+        """Lets a worker process the due jobs, right away or after the given number of seconds. Does nothing after shutdown."""
+        with self._lock:
+            if self._stopped:
+                return
+            if delay <= 0:
+                self._executor.submit(self._drain)
+                return
+            timer = threading.Timer(delay, lambda: self._timer_expired(timer))
+            timer.daemon = True
+            self._timers.add(timer)
+            timer.start()
+
+    def _timer_expired(self, timer: threading.Timer) -> None:
+        with self._lock:
+            self._timers.discard(timer)
+        self._schedule(0)
+
+    def submit(self, food_item: str, weight: float, timestamp: Optional[str]) -> int:
+        """Saves a food entry without nutrition values and queues the lookup filling them in.
+
+        Args:
+            food_item (str): The name of the food.
+            weight (float): The eaten weight in grams.
+            timestamp (str, optional): The time the food was eaten.
+
+        Returns:
+            int: The ID of the new food eaten entry.
+        """
+        now = time.time()
+        with connection_manager.transaction(self.db_path) as cursor:
+            cursor.execute(
+                "INSERT INTO food_eaten (timestamp, name, serving_size_g) VALUES (?, ?, ?)",
+                (normalize_timestamp(timestamp) if timestamp else None, food_item, float(weight)),
+            )
+            food_eaten_id = cursor.lastrowid
+            cursor.execute(
+                f"""INSERT INTO {FOOD_LOOKUP_JOBS_TABLE}
+                (food_eaten_id, food_item, weight, status, next_attempt_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (food_eaten_id, food_item, float(weight), PENDING, now, now, now),
+            )
+            bump_data_version(cursor, "food_eaten")
+        self._schedule(0)
+        return food_eaten_id
+
+    def retry(self, food_eaten_id: int) -> bool:
+        """Queues a failed lookup again, with a fresh number of attempts.
+
+        Args:
+            food_eaten_id (int): The ID of the food eaten entry whose lookup failed.
+
+        Returns:
+            bool: Whether there was a failed lookup to retry.
+        """
+        now = time.time()
+        with connection_manager.transaction(self.db_path) as cursor:
+            cursor.execute(
+                f"""UPDATE {FOOD_LOOKUP_JOBS_TABLE} SET status = ?, attempts = 0, next_attempt_at = ?, updated_at = ?
+                WHERE food_eaten_id = ? AND status = ?""",
+                (PENDING, now, now, food_eaten_id, FAILED),
+            )
+            retried = cursor.rowcount > 0
+        if retried:
+            self._schedule(0)
+        return retried
+
+    def _claim(self) -> Optional[Dict[str, any]]:
+        """Marks the oldest due job as running, so no other worker picks it up.
+
+        Returns:
+            dict: The claimed job, or None if no job is due.
+        """
+        now = time.time()
+        with connection_manager.transaction(self.db_path) as cursor:
+            row = cursor.execute(
+                f"""UPDATE {FOOD_LOOKUP_JOBS_TABLE} SET status = ?, attempts = attempts + 1, updated_at = ?
+                WHERE id = (
+                    SELECT id FROM {FOOD_LOOKUP_JOBS_TABLE} WHERE status = ? AND next_attempt_at <= ? ORDER BY id LIMIT 1
+                )
+                RETURNING id, food_eaten_id, food_item, weight, attempts""",
+                (RUNNING, now, PENDING, now),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("id", "food_eaten_id", "food_item", "weight", "attempts"), row))
+
+    def _drain(self) -> None:
+        """Processes due jobs until there are none left or the queue is shut down."""
+        while not self._stopped:
+            job = self._claim()
+            if job is None:
+                return
+            try:
+                self._process(job)
+            except Exception as e:
+                logging.exception(f"Nutrition lookup of {job['food_item']} crashed")
+                self._finish_attempt(job, f"{type(e).__name__}: {e}", retryable=True)
+
+    def _process(self, job: Dict[str, any]) -> None:
+        """Looks up one food and fills in its entry, or records why it did not work."""
+        nutrition_data = get_food_info_from_api(job["food_item"], job["weight"])
+        if nutrition_data is None:
+            self._finish_attempt(job, "nutrition API unavailable", retryable=True)
+            return
+        if not nutrition_data.get("items"):
+            self._finish_attempt(job, "unknown food", retryable=False)
+            return
+        data = process_nutrition_data(job["weight"], nutrition_data)
+        # the entry keeps the time, name and weight the user entered
+        for column in ("timestamp", "name", "serving_size_g"):
+            data.pop(column, None)
+        set_clause = ", ".join(f"{column} = ?" for column in data)
+        now = time.time()
+        with connection_manager.transaction(self.db_path) as cursor:
+            # an entry edited or deleted during the lookup has its job ended by a trigger, its values must not be overwritten
+            cursor.execute(
+                f"""UPDATE food_eaten SET {set_clause}
+                WHERE id = ? AND name = ? AND serving_size_g = ?
+                AND EXISTS (SELECT 1 FROM {FOOD_LOOKUP_JOBS_TABLE} WHERE id = ? AND status = ?)""",
+                (*data.values(), job["food_eaten_id"], job["food_item"], job["weight"], job["id"], RUNNING),
+            )
+            if cursor.rowcount == 0:
+                logging.info(f"Dropping the nutrition lookup of {job['food_item']}, its entry was edited or deleted")
+                return
+            cursor.execute(
+                f"UPDATE {FOOD_LOOKUP_JOBS_TABLE} SET status = ?, last_error = NULL, updated_at = ? WHERE id = ?",
+                (DONE, now, job["id"]),
+            )
+            bump_data_version(cursor, "food_eaten")
+
+    def _finish_attempt(self, job: Dict[str, any], error: str, retryable: bool) -> None:
+        """Schedules the next attempt of a failed job or marks it as failed for good."""
+        now = time.time()
+        if retryable and job["attempts"] < self.max_attempts:
+            delay = min(self.retry_delay * 2 ** (job["attempts"] - 1), self.max_retry_delay)
+            status, next_attempt_at = PENDING, now + delay
+        else:
+            status, next_attempt_at = FAILED, now
+        with connection_manager.transaction(self.db_path) as cursor:
+            cursor.execute(
+                f"""UPDATE {FOOD_LOOKUP_JOBS_TABLE} SET status = ?, last_error = ?, next_attempt_at = ?, updated_at = ?
+                WHERE id = ? AND status = ?""",
+                (status, error, next_attempt_at, now, job["id"], RUNNING),
+            )
+            if cursor.rowcount == 0:
+                # ended because the entry was edited or deleted during the lookup
+                return
+        logging.warning(f"Nutrition lookup of {job['food_item']} failed ({error}), job is {status}")
+        if status == PENDING:
+            self._schedule(next_attempt_at - now)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stops the worker threads and the scheduled retries. Unfinished jobs stay in the database and are picked up by the next queue.
+
+        Args:
+            wait (bool): Whether to wait for the running lookups to finish.
+        """
+        with self._lock:
+            self._stopped = True
+            timers, self._timers = self._timers, set()
+        for timer in timers:
+            timer.cancel()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_food_lookup_queue: Optional[FoodLookupQueue] = None
+_food_lookup_queue_lock = threading.Lock()
+
+
+def get_food_lookup_queue(db_path: str = "data/bodyweight.db") -> FoodLookupQueue:
+    """Returns the process-wide lookup queue, starting it and resuming unfinished jobs on first use."""
+    global _food_lookup_queue
+    with _food_lookup_queue_lock:
+        if _food_lookup_queue is None:
+            _food_lookup_queue = FoodLookupQueue(db_path)
+        return _food_lookup_queue
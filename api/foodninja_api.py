@@ -1,36 +1,155 @@
 from dotenv import load_dotenv
 import os
-import requests
 import logging
+from typing import Dict, List, Optional
+from api.food_composition import FoodCompositionDatabase
+from api.nutrition_cache import NutritionCache, normalize_food_name
+from api.nutrition_client import NutritionApiClient
 from decorators import log_execution_time
+from instrumentation import registry
 
 load_dotenv()
 
 API_KEY = os.getenv("API_KEY")
-BASE_URL = "https://api.calorieninjas.com/v1/nutrition"
+# can point to a local stub server, e.g. for development without an API key
+BASE_URL = os.getenv("API_BASE_URL", "https://api.calorieninjas.com/v1/nutrition")
+NUTRITION_CACHE_DB = os.getenv("NUTRITION_CACHE_DB", "data/nutrition_cache.db")
+# filled with python -m api.food_composition import <dataset>, not used while the file does not exist
+FOOD_COMPOSITION_DB = os.getenv("FOOD_COMPOSITION_DB", "data/food_composition.db")
 
 if not API_KEY:
     logging.error("API_KEY not found in environment variables.")
 
+_nutrition_cache: Optional[NutritionCache] = None
+_api_client: Optional[NutritionApiClient] = None
+_food_composition: Optional[FoodCompositionDatabase] = None
+
+
+def get_api_client() -> NutritionApiClient:
+    """Returns the process-wide API client, so all requests share its connection pool, circuit breaker and counters."""
+    global _api_client
+    if _api_client is None:
+        _api_client = NutritionApiClient(BASE_URL, API_KEY)
+    return _api_client
+
+
+registry.register_collector(
+    "nutrition_api",
+    "Counters of the nutrition API client, see NutritionApiClient.stats.",
+    lambda: get_api_client().stats(),
+    counters=("requests", "successes", "errors", "retries", "rejected_by_circuit_breaker"),
+)
+
+
+def get_nutrition_cache() -> NutritionCache:
+    """Returns the process-wide nutrition cache, creating it on first use."""
+    global _nutrition_cache
+    if _nutrition_cache is None:
+        _nutrition_cache = NutritionCache(NUTRITION_CACHE_DB)
+    return _nutrition_cache
+
+
+def get_food_composition() -> Optional[FoodCompositionDatabase]:
+    """Returns the process-wide local food composition database, or None if no dataset has been imported."""
+    global _food_composition
+    if _food_composition is None and os.path.exists(FOOD_COMPOSITION_DB):
+        _food_composition = FoodCompositionDatabase(FOOD_COMPOSITION_DB)
+    return _food_composition
+
+
+def _lookup_offline(food_item: str) -> Optional[Dict[str, any]]:
+    """Looks a food up in the nutrition cache and then in the local food composition database."""
+    item = get_nutrition_cache().get(food_item)
+    if item is not None:
+        logging.info(f"Nutrition cache hit for {food_item}")
+        return item
+    food_composition = get_food_composition()
+    if food_composition is not None:
+        item = food_composition.lookup(food_item)
+        if item is not None:
+            logging.info(f"Food composition database matched {food_item} to {item['name']}")
+    return item
+
+
+def _scale_to_100g(item: Dict[str, any]) -> Dict[str, any]:
+    """Scales the values of one API item to a serving of 100 g, which process_nutrition_data expects."""
+    serving_size_g = float(item.get("serving_size_g") or 100.0)
+    if serving_size_g == 100.0:
+        return item
+    return {
+        key: value if key == "name" else float(value) * 100.0 / serving_size_g
+        for key, value in item.items()
+    }
+
+
 @log_execution_time
 def get_food_info_from_api(food_item, weight):
-    headers = {
-        "X-Api-Key": API_KEY,
-    }
-    params = {
-        "query": f"{food_item} {weight}",
-    }
-    try:
-        response = requests.get(BASE_URL, headers=headers, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            logging.info(f"Foodninja API returned:\n{data} for {params}")
-            return data
+    """Gets the nutrition values of a food per 100 g, from the local cache or food composition database if possible and from the API otherwise.
+
+    Args:
+        food_item (str): The name of the food.
+        weight (float): The eaten weight in grams. It is not part of the lookup, process_nutrition_data scales the values to it.
+
+    Returns:
+        dict: The API response with the values per 100 g in "items", or None if the API call failed.
+    """
+    item = _lookup_offline(food_item)
+    if item is not None:
+        return {"items": [item]}
+    nutrition_data = get_api_client().lookup(f"{food_item} 100g")
+    if nutrition_data and nutrition_data.get("items"):
+        item = _scale_to_100g(nutrition_data["items"][0])
+        get_nutrition_cache().put(food_item, item)
+        return {"items": [item]}
+    return nutrition_data
+
+
+def _match_items(food_names: List[str], items: List[Dict[str, any]]) -> Dict[str, Optional[Dict[str, any]]]:
+    """Assigns the items of a multi-item API response to the queried food names.
+
+    The API returns the items in query order but silently drops foods it does not know,
+    so items are matched by position only if none are missing and by name otherwise.
+    """
+    if len(items) == len(food_names):
+        return dict(zip(food_names, items))
+    matches = {}
+    remaining = list(items)
+    for food_name in food_names:
+        match = next(
+            (item for item in remaining if item["name"].lower() in food_name or food_name in item["name"].lower()),
+            None,
+        )
+        if match is not None:
+            remaining.remove(match)
+        matches[food_name] = match
+    return matches
+
+
+@log_execution_time
+def get_meal_info_from_api(food_items: List[str]) -> Dict[str, Optional[Dict[str, any]]]:
+    """Gets the nutrition values per 100 g of all foods of a meal. Foods missing in the cache and the food composition database are fetched with a single API call.
+
+    Args:
+        food_items (list): The names of the foods.
+
+    Returns:
+        dict: The values per 100 g in the format of one CalorieNinjas item for each normalized food name, None for foods the API did not recognize.
+    """
+    cache = get_nutrition_cache()
+    results = {}
+    misses = []
+    for food_name in dict.fromkeys(normalize_food_name(food_item) for food_item in food_items):
+        item = _lookup_offline(food_name)
+        if item is None:
+            misses.append(food_name)
         else:
-            error_message = f"Problem with FoodNinja API at https://api-ninjas.com/api/nutrition. Error: {response.status_code} - {response.text}"
-            logging.error(error_message)
-            return None
-    except requests.exceptions.RequestException as e:
-        error_message = ("Problem with FoodNinja API at https://api-ninjas.com/api/nutrition")
-        logging.error(error_message)
-        return None
+            results[food_name] = item
+    if misses:
+        nutrition_data = get_api_client().lookup(" and ".join(f"{food_name} 100g" for food_name in misses))
+        items = nutrition_data.get("items", []) if nutrition_data else []
+        for food_name, item in _match_items(misses, items).items():
+            if item is not None:
+                item = _scale_to_100g(item)
+                cache.put(food_name, item)
+            results[food_name] = item
+    return results
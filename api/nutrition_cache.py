@@ -0,0 +1,94 @@
+import json
+import re
+import time
+from typing import Dict, Optional
+
+from data_tools.data_manager import connection_manager
+from instrumentation import CACHE_LOOKUPS
+
+
+def normalize_food_name(food_item: str) -> str:
+    """Normalizes a food name so that "Oats", " oats " and "OATS" share one cache entry.
+
+    Args:
+        food_item (str): The food name as entered by the user.
+
+    Returns:
+        str: The lower-case name with collapsed whitespace.
+    """
+    return re.sub(r"\s+", " ", food_item).strip().lower()
+
+
+class NutritionCache:
+    """A persistent cache of nutrition values per 100 g, keyed on the normalized food name.
+
+    Entries expire after ttl_seconds. When more than max_entries are stored, the least recently used ones are evicted.
+
+    Args:
+        db_path (str): The path to the SQLite3 database file holding the cache.
+        ttl_seconds (float): How long an entry stays valid after it was fetched.
+        max_entries (int): The maximum number of foods kept in the cache.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = 30 * 24 * 3600, max_entries: int = 5000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        with connection_manager.transaction(self.db_path) as cursor:
+            cursor.execute(
+                """CREATE TABLE IF NOT EXISTS nutrition_cache (
+                    name TEXT PRIMARY KEY,
+                    item TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )"""
+            )
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_nutrition_cache_last_used ON nutrition_cache (last_used)")
+
+    def get(self, food_item: str) -> Optional[Dict[str, any]]:
+        """Looks up the nutrition values of a food and marks the entry as recently used.
+
+        Args:
+            food_item (str): The food name, normalized before the lookup.
+
+        Returns:
+            dict: The nutrition values per 100 g in the format of one CalorieNinjas item, or None if missing or expired.
+        """
+        name = normalize_food_name(food_item)
+        now = time.time()
+        with connection_manager.transaction(self.db_path) as cursor:
+            row = cursor.execute(
+                "SELECT item, fetched_at FROM nutrition_cache WHERE name = ?", (name,)
+            ).fetchone()
+            if row is None:
+                CACHE_LOOKUPS.inc(cache="nutrition", result="miss")
+                return None
+            item, fetched_at = row
+            if now - fetched_at > self.ttl_seconds:
+                cursor.execute("DELETE FROM nutrition_cache WHERE name = ?", (name,))
+                CACHE_LOOKUPS.inc(cache="nutrition", result="expired")
+                return None
+            cursor.execute("UPDATE nutrition_cache SET last_used = ? WHERE name = ?", (now, name))
+        CACHE_LOOKUPS.inc(cache="nutrition", result="hit")
+        return json.loads(item)
+
+    def put(self, food_item: str, item: Dict[str, any]) -> None:
+        """Stores the nutrition values of a food and evicts the least recently used entries above max_entries.
+
+        Args:
+            food_item (str): The food name, normalized before storing.
+            item (dict): The nutrition values per 100 g in the format of one CalorieNinjas item.
+        """
+        now = time.time()
+        with connection_manager.transaction(self.db_path) as cursor:
+            cursor.execute(
+                """INSERT INTO nutrition_cache (name, item, fetched_at, last_used) VALUES (?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET item = excluded.item, fetched_at = excluded.fetched_at, last_used = excluded.last_used""",
+                (normalize_food_name(food_item), json.dumps(item), now, now),
+            )
+            cursor.execute(
+                """DELETE FROM nutrition_cache WHERE name IN (
+                    SELECT name FROM nutrition_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
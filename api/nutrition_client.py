@@ -0,0 +1,199 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import Retrying, retry_if_exception_type, stop_after_attempt, wait_exponential
+
+from instrumentation import NUTRITION_API_LATENCY
+
+
+class _RetryableError(Exception):
+    """Raised for responses and network problems that are worth another attempt."""
+
+
+class CircuitBreaker:
+    """Fails fast while a remote service is down.
+
+    After failure_threshold consecutive failures the circuit opens and all calls are rejected.
+    Once reset_timeout seconds have passed a single trial call is let through: success closes the circuit again, failure reopens it.
+
+    Args:
+        failure_threshold (int): The number of consecutive failures that opens the circuit.
+        reset_timeout (float): The number of seconds to wait before a trial call.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Returns whether a call may go through now, turning an expired open circuit half open."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """Closes the circuit after a successful call."""
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_client_error(self) -> None:
+        """Ends a call the service answered with a client error. It is reachable, so only a trial call closes the circuit."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self._failures = 0
+
+    def record_failure(self) -> None:
+        """Counts a failed call and opens the circuit when the threshold is reached or a trial call failed."""
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class NutritionApiClient:
+    """A client for the CalorieNinjas nutrition API with a keep-alive connection pool, timeouts, retries and a circuit breaker.
+
+    Server errors, rate limiting, timeouts and connection problems are retried with exponential backoff, and a lookup
+    failing with them counts towards the circuit breaker. Other client errors and unparsable responses are neither
+    retried nor counted, they say nothing about the availability of the service.
+
+    Args:
+        base_url (str): The URL of the nutrition endpoint.
+        api_key (str): The key sent in the X-Api-Key header.
+        connect_timeout (float): Seconds to wait for the connection to be established.
+        read_timeout (float): Seconds to wait for the response.
+        max_attempts (int): The maximum number of attempts per lookup, including the first one.
+        backoff_max (float): The maximum number of seconds to wait between two attempts.
+        pool_size (int): The maximum number of kept-alive connections.
+        circuit_breaker (CircuitBreaker, optional): The breaker to use, a default one if not provided.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: Optional[str],
+        connect_timeout: float = 3.05,
+        read_timeout: float = 10.0,
+        max_attempts: int = 3,
+        backoff_max: float = 4.0,
+        pool_size: int = 10,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_attempts = max_attempts
+        self.backoff_max = backoff_max
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.session = requests.Session()
+        self.session.headers["X-Api-Key"] = api_key or ""
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._counters = {
+            "requests": 0,
+            "successes": 0,
+            "errors": 0,
+            "retries": 0,
+            "rejected_by_circuit_breaker": 0,
+            "latency_seconds_total": 0.0,
+            "latency_seconds_max": 0.0,
+        }
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def _record_latency(self, seconds: float) -> None:
+        with self._lock:
+            self._counters["latency_seconds_total"] += seconds
+            self._counters["latency_seconds_max"] = max(self._counters["latency_seconds_max"], seconds)
+        NUTRITION_API_LATENCY.observe(seconds)
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the request, error and latency counters together with the circuit breaker state.
+
+        Returns:
+            dict: A snapshot of the counters. latency_seconds_total covers every single HTTP attempt.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+        stats["circuit_state"] = self.circuit_breaker.state
+        return stats
+
+    def _get(self, query: str) -> Dict[str, any]:
+        """Makes one HTTP attempt and raises _RetryableError for failures worth retrying."""
+        self._count("requests")
+        start = time.perf_counter()
+        try:
+            response = self.session.get(self.base_url, params={"query": query}, timeout=self.timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            raise _RetryableError(str(e)) from e
+        finally:
+            self._record_latency(time.perf_counter() - start)
+        if response.status_code == 429 or response.status_code >= 500:
+            raise _RetryableError(f"{response.status_code} - {response.text}")
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(f"{response.status_code} - {response.text}")
+        return response.json()
+
+    def _before_retry(self, retry_state) -> None:
+        self._count("retries")
+        logging.warning(f"Retrying nutrition API call after: {retry_state.outcome.exception()}")
+
+    def lookup(self, query: str) -> Optional[Dict[str, any]]:
+        """Queries the nutrition API.
+
+        Args:
+            query (str): The query, e.g. "oats 100g".
+
+        Returns:
+            dict: The parsed JSON response, or None if the lookup failed or the circuit breaker is open.
+        """
+        if not self.circuit_breaker.allow_request():
+            self._count("rejected_by_circuit_breaker")
+            logging.error(f"Nutrition API circuit breaker is open, skipping lookup of {query}")
+            return None
+        retrying = Retrying(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait_exponential(multiplier=0.5, max=self.backoff_max),
+            retry=retry_if_exception_type(_RetryableError),
+            before_sleep=self._before_retry,
+            reraise=True,
+        )
+        try:
+            data = retrying(self._get, query)
+        except _RetryableError as e:
+            self._count("errors")
+            self.circuit_breaker.record_failure()
+            logging.error(f"Problem with FoodNinja API at https://api-ninjas.com/api/nutrition. Error: {e}")
+            return None
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # the service answered, e.g. 400 for a query it cannot parse, which is no failure of the service
+            self._count("errors")
+            self.circuit_breaker.record_client_error()
+            logging.error(f"FoodNinja API rejected the lookup of {query}. Error: {e}")
+            return None
+        self._count("successes")
+        self.circuit_breaker.record_success()
+        logging.info(f"Foodninja API returned:\n{data} for {query}")
+        return data
@@ -0,0 +1,181 @@
+// Clientside callbacks of the dashboard charts, see weightloss_dashboard.py.
+// The server sends every table once as one row per day, columns as arrays, and again only when its data changed.
+// Filtering by date and grouping by week or month happen here, so changing the filters never reaches the server.
+// Periods and averages follow data_tools/aggregation_queries.py: periods are labeled with their first day,
+// weeks start on Monday, and weekly and monthly calories are averaged over the days with entries.
+
+(function () {
+    var TIME_OF_DAY_CATEGORIES = ["2-12", "12-17", "17-22", "22-2"];
+
+    function periodStart(day, timeFrame) {
+        if (timeFrame === "monthly") {
+            return day.slice(0, 8) + "01";
+        }
+        if (timeFrame === "weekly") {
+            var date = new Date(day + "T00:00:00Z");
+            date.setUTCDate(date.getUTCDate() - (date.getUTCDay() + 6) % 7);
+            return date.toISOString().slice(0, 10);
+        }
+        return day;
+    }
+
+    // Returns the rows between the start and end day, both inclusive, grouped by period in date order.
+    // Each group holds the period label and the row indices, the days being "YYYY-MM-DD" strings sorted ascending.
+    function groupRows(days, startDate, endDate, timeFrame) {
+        var start = startDate ? startDate.slice(0, 10) : null;
+        var end = endDate ? endDate.slice(0, 10) : null;
+        var groups = [];
+        var current = null;
+        for (var i = 0; i < days.length; i++) {
+            if ((start && days[i] < start) || (end && days[i] > end)) {
+                continue;
+            }
+            var period = periodStart(days[i], timeFrame);
+            if (current === null || current.period !== period) {
+                current = {period: period, rows: []};
+                groups.push(current);
+            }
+            current.rows.push(i);
+        }
+        return groups;
+    }
+
+    function sum(values, rows) {
+        var total = 0;
+        for (var i = 0; i < rows.length; i++) {
+            total += values[rows[i]] || 0;
+        }
+        return total;
+    }
+
+    // The layout all charts share, margin being null for the default margins of the template.
+    function layout(template, margin, extra) {
+        var base = {
+            template: template,
+            plot_bgcolor: "rgba(0,0,0,0)",
+            paper_bgcolor: "rgba(0,0,0,0)",
+            xaxis: {title: {text: ""}, showline: false, zeroline: false},
+            yaxis: {title: {text: ""}, showline: false, zeroline: false}
+        };
+        if (margin) {
+            base.margin = margin;
+        }
+        return Object.assign(base, extra || {});
+    }
+
+    function emptyFigure(template) {
+        return {data: [], layout: layout(template, {l: 20, r: 20, t: 20, b: 20})};
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        charts: {
+            // The calories per time of day with their total above each bar, and the share of each macronutrient.
+            nutrition: function (data, startDate, endDate, timeFrame, template) {
+                if (!data) {
+                    return [emptyFigure(template), emptyFigure(template)];
+                }
+                var groups = groupRows(data.date, startDate, endDate, timeFrame);
+                var periods = groups.map(function (group) { return group.period; });
+                var calories = {};
+                var totals = periods.map(function () { return 0; });
+                TIME_OF_DAY_CATEGORIES.forEach(function (category) {
+                    calories[category] = groups.map(function (group, index) {
+                        // one row per day with entries, so the number of rows is the number of days
+                        var value = sum(data[category], group.rows) / group.rows.length;
+                        totals[index] += value;
+                        return value;
+                    });
+                });
+                var caloriesFigure = {
+                    data: TIME_OF_DAY_CATEGORIES.map(function (category) {
+                        return {type: "bar", name: category, x: periods, y: calories[category]};
+                    }).concat([{
+                        type: "scatter",
+                        mode: "text",
+                        x: periods,
+                        y: totals,
+                        text: totals.map(function (total) { return (Math.round(total * 10) / 10).toFixed(1); }),
+                        showlegend: false
+                    }]),
+                    layout: layout(template, {l: 20, r: 20, t: 20, b: 60}, {barmode: "stack"})
+                };
+
+                var macros = {carbs: [], fats: [], proteins: []};
+                groups.forEach(function (group) {
+                    var grams = {};
+                    var total = 0;
+                    Object.keys(macros).forEach(function (macro) {
+                        grams[macro] = sum(data[macro], group.rows);
+                        total += grams[macro];
+                    });
+                    Object.keys(macros).forEach(function (macro) {
+                        macros[macro].push(total ? grams[macro] / total * 100 : null);
+                    });
+                });
+                var macrosFigure = {
+                    data: [["Carbs", "carbs"], ["Fats", "fats"], ["Proteins", "proteins"]].map(function (trace) {
+                        return {type: "bar", name: trace[0], x: periods, y: macros[trace[1]]};
+                    }),
+                    layout: layout(template, {l: 20, r: 20, t: 20, b: 60}, {barmode: "stack"})
+                };
+                return [caloriesFigure, macrosFigure];
+            },
+
+            // The bodyweight of every day, or its mean per week or month.
+            bodyweight: function (data, startDate, endDate, timeFrame, template) {
+                if (!data) {
+                    return emptyFigure(template);
+                }
+                var groups = groupRows(data.date, startDate, endDate, timeFrame);
+                var x = [];
+                var y = [];
+                groups.forEach(function (group) {
+                    if (timeFrame === "weekly" || timeFrame === "monthly") {
+                        x.push(group.period);
+                        y.push(sum(data.bodyweight, group.rows) / group.rows.length);
+                    } else {
+                        group.rows.forEach(function (row) {
+                            x.push(data.date[row]);
+                            y.push(data.bodyweight[row]);
+                        });
+                    }
+                });
+                return {
+                    data: [{
+                        type: "scatter",
+                        mode: "lines",
+                        x: x,
+                        y: y,
+                        line: {color: "#636efa"},
+                        hovertemplate: "date=%{x}<br>bodyweight=%{y}<extra></extra>",
+                        showlegend: false
+                    }],
+                    layout: layout(template, {l: 20, r: 20, t: 20, b: 0})
+                };
+            },
+
+            // The cycling duration per day, or the mean duration of a session per week or month.
+            cycling: function (data, startDate, endDate, timeFrame, template) {
+                if (!data) {
+                    return emptyFigure(template);
+                }
+                var groups = groupRows(data.date, startDate, endDate, timeFrame);
+                var grouped = timeFrame === "weekly" || timeFrame === "monthly";
+                return {
+                    data: [{
+                        type: "bar",
+                        x: groups.map(function (group) { return group.period; }),
+                        y: groups.map(function (group) {
+                            var duration = sum(data.duration, group.rows);
+                            return grouped ? duration / sum(data.sessions, group.rows) : duration;
+                        }),
+                        marker: {color: "#636efa"},
+                        hovertemplate: "date=%{x}<br>duration=%{y}<extra></extra>",
+                        showlegend: false
+                    }],
+                    layout: layout(template, null, {barmode: "relative"})
+                };
+            }
+        }
+    });
+})();
@@ -0,0 +1,36 @@
+// Live updates of the dashboard, see the /events route in routes.py and weightloss_dashboard.py.
+// The server pushes the data version of each table over Server-Sent Events when a write to it is committed,
+// instead of every open tab polling for them. Dash 2.12 cannot set a property from outside a callback, so a pushed
+// version is handed over by clicking a hidden button, whose clientside callback moves it into the version stores.
+
+(function () {
+    var versions = {};
+
+    function connect() {
+        var source = new EventSource("/events");
+        source.onmessage = function (event) {
+            Object.assign(versions, JSON.parse(event.data));
+            var signal = document.getElementById("data-change-signal");
+            if (signal) {
+                signal.click();
+            }
+        };
+        // the browser reconnects on its own after network errors, and the first event then brings all versions again
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        live: {
+            // The pushed version of each table that differs from the one in its store, no_update for the others.
+            changedVersions: function (tables, current) {
+                return tables.map(function (table, index) {
+                    var version = versions[table];
+                    return version === undefined || version === current[index] ? window.dash_clientside.no_update : version;
+                });
+            }
+        }
+    });
+
+    if (window.EventSource) {
+        connect();
+    }
+})();
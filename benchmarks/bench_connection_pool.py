@@ -0,0 +1,68 @@
+"""Compares connect-per-call reads with the pooled connections of data_tools.data_manager.
+
+Run from the repository root:
+    python -m benchmarks.bench_connection_pool --rows 100000 --iterations 200
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Callable
+
+import pandas as pd
+
+from benchmarks.synthetic_data import create_synthetic_database
+from data_tools.data_manager import DataReader, connection_manager
+
+QUERIES = {
+    "bodyweight": "SELECT * FROM bodyweight ORDER BY date DESC",
+    "cycling_data": "SELECT * FROM cycling_data ORDER BY timestamp DESC",
+    "single_food_entry": "SELECT * FROM food_eaten WHERE id = 1 LIMIT 1",
+    "daily_macros": """SELECT
+            date(timestamp, '-2 hours') as date,
+            SUM(carbohydrates_total_g) as carbs,
+            SUM(fat_total_g) as fats,
+            SUM(protein_g) as proteins
+            FROM food_eaten
+            GROUP BY date(timestamp)""",
+    "food_eaten": "SELECT * FROM food_eaten ORDER BY timestamp DESC",
+}
+
+
+def time_calls(func: Callable[[], object], iterations: int) -> float:
+    """Returns the mean wall time of func in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000, help="number of synthetic food_eaten rows")
+    parser.add_argument("--iterations", type=int, default=100, help="calls per query and strategy")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bodyweight.db")
+        create_synthetic_database(db_path, food_rows=args.rows)
+        reader = DataReader(db_path)
+
+        def connect_per_call(query: str) -> pd.DataFrame:
+            conn = sqlite3.connect(db_path)
+            df = pd.read_sql_query(query, conn)
+            conn.close()
+            return df
+
+        print(f"{'query':<20}{'connect/call ms':>18}{'pooled ms':>12}{'speedup':>10}")
+        for name, query in QUERIES.items():
+            iterations = max(1, args.iterations // 20) if name == "food_eaten" else args.iterations
+            baseline = time_calls(lambda: connect_per_call(query), iterations)
+            pooled = time_calls(lambda: reader.sql_reader.read_data(query), iterations)
+            print(f"{name:<20}{baseline:>18.3f}{pooled:>12.3f}{baseline / pooled:>9.2f}x")
+        connection_manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Measures the daily data sent to the dashboards and the time to build the charts from it, on histories of 1 to 10 years.
+
+For every table the size of the JSON the daily store callback sends and the time to load and serialize it are
+reported. The charts are built in the browser by assets/dashboard_charts.js, which is timed with Node.js for every
+time frame over the whole history, the most expensive filter. Without node on the PATH only the server side is measured.
+
+Run from the repository root:
+    python -m benchmarks.bench_dashboard_payload --years 1 3 10
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.synthetic_data import create_synthetic_database
+from data_tools.data_manager import connection_manager
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHARTS_SCRIPT = os.path.join(REPO_ROOT, "assets", "dashboard_charts.js")
+MEALS_PER_DAY = 6
+TIME_FRAMES = ("daily", "weekly", "monthly")
+# runs the chart functions the way Dash calls them, on the payload file written by measure_clientside
+NODE_RUNNER = """
+const fs = require("fs");
+const vm = require("vm");
+const [script, payloadPath, repeat] = process.argv.slice(2);
+global.window = {};
+vm.runInThisContext(fs.readFileSync(script, "utf8"));
+const {stores, template, cases} = JSON.parse(fs.readFileSync(payloadPath, "utf8"));
+const results = cases.map(([table, functionName, timeFrame]) => {
+    const build = window.dash_clientside.charts[functionName];
+    // the first calls run before the JIT compiled the functions
+    for (let i = 0; i < 20; i++) {
+        build(stores[table], null, null, timeFrame, template);
+    }
+    let best = Infinity;
+    for (let i = 0; i < Number(repeat); i++) {
+        const start = process.hrtime.bigint();
+        build(stores[table], null, null, timeFrame, template);
+        best = Math.min(best, Number(process.hrtime.bigint() - start) / 1e6);
+    }
+    return best;
+});
+console.log(JSON.stringify(results));
+"""
+
+
+def measure_server(table: str, repeat: int) -> tuple:
+    """Returns the daily data of a table, the size of its JSON in bytes and the fastest load and serialization in seconds."""
+    from weightloss_dashboard import load_daily_data
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = load_daily_data(table)
+        payload = json.dumps(data)
+        best = min(best, time.perf_counter() - start)
+    return data, len(payload), best
+
+
+def measure_clientside(node: str, stores: Dict[str, dict], tmp_dir: str, repeat: int) -> List[float]:
+    """Times every chart function on every time frame in Node.js.
+
+    Returns:
+        list: The fastest build in milliseconds per table and time frame, in the order of CHART_CALLBACKS and TIME_FRAMES.
+    """
+    from charts.charts_plotly import chart_template
+    from weightloss_dashboard import CHART_CALLBACKS
+
+    cases = [(table, function_name, time_frame) for table, (function_name, _) in CHART_CALLBACKS.items() for time_frame in TIME_FRAMES]
+    payload_path = os.path.join(tmp_dir, "stores.json")
+    runner_path = os.path.join(tmp_dir, "run_charts.js")
+    with open(payload_path, "w") as f:
+        json.dump({"stores": stores, "template": chart_template(), "cases": cases}, f)
+    with open(runner_path, "w") as f:
+        f.write(NODE_RUNNER)
+    output = subprocess.run(
+        [node, runner_path, CHARTS_SCRIPT, payload_path, str(repeat)], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def run_years(years: int, tmp_dir: str, node: Optional[str], repeat: int) -> None:
+    directory = os.path.join(tmp_dir, f"{years}y")
+    # the database path is fixed in the dashboard, so each history runs in its own working directory
+    os.makedirs(os.path.join(directory, "data"))
+    create_synthetic_database(
+        os.path.join(directory, "data", "bodyweight.db"), food_rows=years * 365 * MEALS_PER_DAY, meals_per_day=MEALS_PER_DAY
+    )
+    previous_directory = os.getcwd()
+    os.chdir(directory)
+    # the pooled connections of the previous history point to another file under the same relative path
+    connection_manager.close_all()
+    try:
+        from weightloss_dashboard import CHART_CALLBACKS
+
+        stores = {}
+        rows = []
+        for table in CHART_CALLBACKS:
+            stores[table], payload_bytes, seconds = measure_server(table, repeat)
+            rows.append((table, len(stores[table]["date"]), payload_bytes, seconds))
+        client_ms = measure_clientside(node, stores, directory, repeat) if node else None
+        for index, (table, days, payload_bytes, seconds) in enumerate(rows):
+            line = f"{years:>5}  {table:<14}{days:>7}{payload_bytes / 1024:>10.1f} KiB{seconds * 1000:>12.1f} ms"
+            if client_ms is not None:
+                line += "".join(f"{ms:>12.2f} ms" for ms in client_ms[index * len(TIME_FRAMES):(index + 1) * len(TIME_FRAMES)])
+            print(line)
+    finally:
+        connection_manager.close_all()
+        os.chdir(previous_directory)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 3, 10], help="lengths of the synthetic histories")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement, the fastest one is reported")
+    parser.add_argument("--node", default=shutil.which("node"), help="the Node.js executable timing the clientside build")
+    args = parser.parse_args()
+    # the histories run in other working directories, where the repository is no longer importable by a relative path
+    sys.path.insert(0, REPO_ROOT)
+
+    header = f"{'years':>5}  {'table':<14}{'days':>7}{'payload':>14}{'load + json':>15}"
+    if args.node:
+        header += "".join(f"{f'{time_frame} build':>15}" for time_frame in TIME_FRAMES)
+    else:
+        print("node was not found, only the server side is measured")
+    print(header)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for years in args.years:
+            run_years(years, tmp_dir, args.node, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
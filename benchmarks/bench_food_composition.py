@@ -0,0 +1,113 @@
+"""Measures the match quality and latency of the local food composition database on a synthetic dataset.
+
+Queries are derived from the imported names: exact, with different case and spacing, with one typo and with swapped words.
+Names that are not in the dataset check that unknown foods are not matched to something else.
+
+Run from the repository root:
+    python -m benchmarks.bench_food_composition --foods 5000 --queries 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+from api.food_composition import NUTRIENT_COLUMNS, FoodCompositionDatabase
+
+BASE_FOODS = [
+    "apple", "banana", "orange", "pear", "grape", "strawberry", "blueberry", "mango", "pineapple", "peach",
+    "rice", "oats", "pasta", "bread", "quinoa", "barley", "couscous", "potato", "sweet potato", "corn",
+    "chicken breast", "chicken thigh", "beef steak", "ground beef", "pork chop", "turkey breast", "ham", "bacon",
+    "salmon", "tuna", "cod", "shrimp", "egg", "tofu", "lentils", "chickpeas", "black beans", "kidney beans",
+    "milk", "yogurt", "cheddar cheese", "mozzarella", "cottage cheese", "butter", "olive oil", "peanut butter",
+    "almonds", "walnuts", "cashews", "broccoli", "spinach", "carrot", "tomato", "cucumber", "onion", "pepper",
+]
+PREPARATIONS = ["", "raw", "boiled", "fried", "grilled", "baked", "steamed", "roasted", "dried", "canned", "frozen"]
+VARIANTS = ["", "organic", "low fat", "whole", "sliced", "smoked", "salted", "unsalted", "fresh", "light"]
+UNKNOWN_FOODS = ["dragon fruit jam", "kangaroo jerky", "seaweed crisps", "jackfruit curry", "matcha latte", "kimchi"]
+
+
+def synthetic_names(count: int, rng: random.Random) -> List[str]:
+    names = {" ".join(part for part in (variant, preparation, food) if part)
+             for food in BASE_FOODS for preparation in PREPARATIONS for variant in VARIANTS}
+    names = sorted(names)
+    rng.shuffle(names)
+    return names[:count]
+
+
+def with_typo(name: str, rng: random.Random) -> str:
+    position = rng.randrange(1, len(name) - 1)
+    operation = rng.choice(("delete", "substitute", "transpose"))
+    if operation == "delete":
+        return name[:position] + name[position + 1:]
+    if operation == "substitute":
+        return name[:position] + rng.choice("abcdefghijklmnopqrstuvwxyz") + name[position + 1:]
+    return name[:position - 1] + name[position] + name[position - 1] + name[position + 1:]
+
+
+def with_swapped_words(name: str, rng: random.Random) -> str:
+    words = name.split()
+    rng.shuffle(words)
+    return " ".join(words)
+
+
+QUERY_KINDS: Dict[str, Callable[[str, random.Random], str]] = {
+    "exact": lambda name, rng: name,
+    "case/spacing": lambda name, rng: "  " + name.upper().replace(" ", "  ") + " ",
+    "one typo": with_typo,
+    "swapped words": with_swapped_words,
+}
+
+
+def percentile(values: List[float], share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--foods", type=int, default=5000, help="number of foods in the dataset (at most the synthetic name space)")
+    parser.add_argument("--queries", type=int, default=2000, help="number of queries per kind")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    names = synthetic_names(args.foods, rng)
+    records = [{"name": name, **{column: rng.uniform(0, 100) for column in NUTRIENT_COLUMNS}} for name in names]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = FoodCompositionDatabase(os.path.join(tmp_dir, "food_composition.db"))
+        start = time.perf_counter()
+        database.import_records(records, source="synthetic")
+        print(f"imported {len(records)} foods in {time.perf_counter() - start:.2f} s\n")
+
+        print(f"{'queries':<15}{'correct':>9}{'wrong':>8}{'missed':>8}{'p50':>10}{'p99':>10}")
+        samples: List[Tuple[str, List[Tuple[str, str]]]] = [
+            (kind, [(make(name, rng), name) for name in rng.choices(names, k=args.queries)])
+            for kind, make in QUERY_KINDS.items()
+        ]
+        samples.append(("unknown foods", [(name, None) for name in UNKNOWN_FOODS]))
+        for kind, queries in samples:
+            correct = wrong = missed = 0
+            latencies = []
+            for query, expected in queries:
+                start = time.perf_counter()
+                item = database.lookup(query)
+                latencies.append(time.perf_counter() - start)
+                if item is None:
+                    missed += 1
+                elif item["name"] == expected:
+                    correct += 1
+                else:
+                    wrong += 1
+            total = len(queries)
+            print(
+                f"{kind:<15}{correct / total:>9.1%}{wrong / total:>8.1%}{missed / total:>8.1%}"
+                f"{percentile(latencies, 0.5) * 1e3:>8.3f}ms{percentile(latencies, 0.99) * 1e3:>8.3f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
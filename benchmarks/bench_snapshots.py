@@ -0,0 +1,103 @@
+"""Compares reading and parsing a whole table from SQLite with the columnar snapshots of data_tools.snapshots.
+
+Run from the repository root:
+    python -m benchmarks.bench_snapshots --days 10000 --iterations 20
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
+import pandas as pd
+
+from benchmarks.synthetic_data import create_synthetic_database
+from data_tools import snapshots
+from data_tools.data_manager import SQLite3Writer, connection_manager
+from data_tools.snapshots import TableSnapshot, parse_table
+
+
+def time_calls(func: Callable[[], object], iterations: int) -> float:
+    """Returns the mean wall time of func in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=10_000, help="days of synthetic history, one bodyweight entry each")
+    parser.add_argument("--iterations", type=int, default=10, help="calls per strategy")
+    parser.add_argument("--table", default="bodyweight", choices=list(snapshots.SNAPSHOT_COLUMNS))
+    args = parser.parse_args()
+    if snapshots.pa is None:
+        print("pyarrow is not installed, the snapshots are kept in memory only and the file load is skipped\n")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bodyweight.db")
+        # one food entry per day, the snapshot tables hold at most a few rows per day. datetime64[ns] ends in 2262
+        create_synthetic_database(db_path, food_rows=args.days, meals_per_day=1)
+        snapshot_dir = os.path.join(tmp_dir, "snapshots")
+        writer = SQLite3Writer(db_path)
+
+        def read_sql() -> pd.DataFrame:
+            with connection_manager.connection(db_path) as conn:
+                return parse_table(args.table, pd.read_sql_query(f"SELECT * FROM {args.table}", conn))
+
+        def read_snapshot(snapshot: TableSnapshot) -> pd.DataFrame:
+            with connection_manager.connection(db_path) as conn:
+                return snapshot.read(conn)
+
+        builds = iter(range(args.iterations))
+
+        def build() -> pd.DataFrame:
+            # a new directory each time, so the file of the previous build is not loaded
+            return read_snapshot(TableSnapshot(db_path, args.table, os.path.join(tmp_dir, f"build-{next(builds)}")))
+
+        warm = TableSnapshot(db_path, args.table, snapshot_dir)
+        read_snapshot(warm)
+        rows = len(read_sql())
+        time_column = snapshots.SNAPSHOT_COLUMNS[args.table][0]
+        with sqlite3.connect(db_path) as conn:
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({args.table})") if row[1] != "id"]
+            oldest = dict(zip(columns, conn.execute(f"SELECT {', '.join(columns)} FROM {args.table} LIMIT 1").fetchone()))
+            last_time = conn.execute(f"SELECT MAX({time_column}) FROM {args.table}").fetchone()[0]
+        entries = iter(range(1, args.iterations + 1))
+
+        def newest() -> dict:
+            # entries made now are newer than all of the history
+            later = datetime.fromisoformat(last_time) + timedelta(days=next(entries))
+            return {**oldest, time_column: later.isoformat(timespec="seconds")[:len(last_time)]}
+
+        def refresh_after_insert(row: dict) -> pd.DataFrame:
+            writer.create_data(args.table, row)
+            return read_snapshot(warm)
+
+        timings = {
+            "pd.read_sql_query + parse": time_calls(read_sql, args.iterations),
+            "snapshot, first build + write": time_calls(build, args.iterations),
+            "snapshot, unchanged": time_calls(lambda: read_snapshot(warm), args.iterations),
+            "snapshot, after 1 new entry": time_calls(lambda: refresh_after_insert(newest()), args.iterations),
+            "snapshot, after 1 backdated": time_calls(lambda: refresh_after_insert(oldest), args.iterations),
+        }
+        if snapshots.pa is not None:
+            timings["snapshot, new process (mmap)"] = time_calls(
+                lambda: read_snapshot(TableSnapshot(db_path, args.table, snapshot_dir)), args.iterations
+            )
+            size = os.path.getsize(os.path.join(snapshot_dir, f"{args.table}.arrow"))
+            print(f"{args.table}: {rows} rows, snapshot file {size / 2 ** 20:.1f} MiB\n")
+        else:
+            print(f"{args.table}: {rows} rows\n")
+
+        baseline = timings["pd.read_sql_query + parse"]
+        print(f"{'strategy':<32}{'mean':>12}{'speedup':>10}")
+        for name, timing in timings.items():
+            print(f"{name:<32}{timing:>10.2f}ms{baseline / timing:>9.1f}x")
+        connection_manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
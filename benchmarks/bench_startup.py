@@ -0,0 +1,47 @@
+"""Measures the cold import time of weightloss_dashboard in fresh interpreter processes.
+
+The import runs in a temporary working directory holding a synthetic data/bodyweight.db,
+so a regression that reads the database at import time shows up as growing with --rows.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup --rows 100000 --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic_data import create_synthetic_database
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import weightloss_dashboard; print(time.perf_counter() - start)"
+
+
+def time_cold_import(cwd: str) -> float:
+    """Imports weightloss_dashboard in a new interpreter and returns the import time in seconds."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])))
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=cwd, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000, help="number of synthetic food_eaten rows")
+    parser.add_argument("--runs", type=int, default=5, help="number of fresh interpreter runs")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.makedirs(os.path.join(tmp_dir, "data"))
+        create_synthetic_database(os.path.join(tmp_dir, "data", "bodyweight.db"), food_rows=args.rows)
+        timings = [time_cold_import(tmp_dir) for _ in range(args.runs)]
+
+    print(f"cold import of weightloss_dashboard with {args.rows} food rows, {args.runs} runs")
+    print(f"median {statistics.median(timings):.3f} s, min {min(timings):.3f} s, max {max(timings):.3f} s")
+
+
+if __name__ == "__main__":
+    main()
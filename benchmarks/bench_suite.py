@@ -0,0 +1,294 @@
+"""Times the readers, the processing functions and the Dash callbacks on synthetic histories of growing size.
+
+For every size a bodyweight.db with that many food_eaten rows, one bodyweight entry per day and a cycling
+session every third day is generated. Every case runs --repeat times, reporting the median and minimum wall
+time, and once more under tracemalloc for the peak memory allocated by Python, pandas and numpy (SQLite's own
+page cache is not included).
+
+Results can be saved as a baseline and later runs compared with it. The comparison exits with status 1 if a case got
+slower or needs more memory than the baseline allows, so it can gate a change. Baselines are machine specific,
+compare runs of the same machine only.
+
+Run from the repository root:
+    python -m benchmarks.bench_suite --sizes 10000 100000 1000000 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_suite --sizes 10000 100000 1000000 --compare benchmarks/baseline.json
+Generating the 1M row database takes a while, --data-dir keeps the databases for the next run.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from benchmarks.synthetic_data import create_synthetic_database
+from data_tools.data_manager import DataReader, connection_manager
+from data_tools.data_processing import filter_data_by_date, process_nutrition_data
+from data_tools.snapshots import TableSnapshot
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join("data", "bodyweight.db")
+# the database path is fixed in the dashboard, so each size runs in its own working directory
+SIZE_DIRECTORY = "synthetic-{rows}"
+NUTRITION_ITEM = {
+    "items": [{
+        "name": "oats", "calories": 389.0, "serving_size_g": 100.0, "fat_total_g": 6.9, "fat_saturated_g": 1.2,
+        "protein_g": 16.9, "sodium_mg": 2.0, "potassium_mg": 429.0, "cholesterol_mg": 0.0,
+        "carbohydrates_total_g": 66.3, "fiber_g": 10.6, "sugar_g": 0.0,
+    }]
+}
+# process_nutrition_data handles one food per call, so a batch of calls is timed
+PROCESS_BATCH = 1000
+
+
+class Case:
+    """One measured operation.
+
+    Args:
+        name (str): The name in the report and the baseline.
+        run (Callable): The operation.
+        setup (Callable, optional): Runs before every repetition without being timed, e.g. to empty a cache.
+    """
+
+    def __init__(self, name: str, run: Callable[[], object], setup: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.run = run
+        self.setup = setup or (lambda: None)
+
+
+def build_cases(tmp_dir: str) -> List[Case]:
+    """Builds the cases for the database in the current working directory.
+
+    Args:
+        tmp_dir (str): A directory for files the cases write, e.g. snapshots.
+
+    Returns:
+        list: The cases in report order.
+    """
+    import weightloss_dashboard  # imported late, it opens app.log in the working directory
+
+    reader = DataReader(DB_PATH)
+    food = reader.read_food_eaten_data()
+    food["timestamp"] = pd.to_datetime(food["timestamp"], format="ISO8601")
+    food = food.assign(date=food["timestamp"].dt.floor("D"))
+    last_day = food["date"].max()
+    client = weightloss_dashboard.app.test_client()
+    tables = list(weightloss_dashboard.CHART_CALLBACKS)
+    update_daily_stores = {
+        "output": f"..{'...'.join(f'{table}-daily-store.data' for table in tables)}..",
+        "outputs": [{"id": f"{table}-daily-store", "property": "data"} for table in tables],
+        "inputs": [{"id": f"{table}-version-store", "property": "data", "value": 0} for table in tables],
+        "changedPropIds": [f"{table}-version-store.data" for table in tables],
+    }
+    snapshot_builds = iter(range(1_000_000))
+
+    def build_snapshot() -> pd.DataFrame:
+        # a new directory each time, so nothing of the previous build is loaded
+        snapshot = TableSnapshot(DB_PATH, "bodyweight", os.path.join(tmp_dir, f"build-{next(snapshot_builds)}"))
+        with connection_manager.connection(DB_PATH) as conn:
+            return snapshot.read(conn)
+
+    def post_callback(body: dict) -> None:
+        response = client.post("/dashboard/_dash-update-component", json=body)
+        if response.status_code != 200:
+            raise RuntimeError(f"callback failed with status {response.status_code}")
+
+    cases = [
+        Case("DataReader.read_food_eaten_data", reader.read_food_eaten_data),
+        Case("DataReader.read_bodyweight_data", reader.read_bodyweight_data),
+        Case("DataReader.read_cycling_data", reader.read_cycling_data),
+        Case("DataReader.read_food_eaten_page", lambda: reader.read_food_eaten_page(limit=51)),
+    ]
+    for time_frame in ("daily", "weekly", "monthly"):
+        # the grouping by week and month runs in SQL, it replaced the pandas group_data_by_time_frame
+        cases.append(Case(
+            f"DataReader.read_nutrition_by_time_frame {time_frame}",
+            lambda time_frame=time_frame: reader.read_nutrition_by_time_frame(time_frame=time_frame),
+        ))
+        cases.append(Case(
+            f"DataReader.read_cycling_by_time_frame {time_frame}",
+            lambda time_frame=time_frame: reader.read_cycling_by_time_frame(time_frame=time_frame),
+        ))
+    cases += [
+        Case("TableSnapshot.read bodyweight, first build", build_snapshot),
+        Case("DataReader.read_table_snapshot bodyweight, unchanged", lambda: reader.read_table_snapshot("bodyweight")),
+        Case(
+            f"process_nutrition_data x{PROCESS_BATCH}",
+            lambda: [process_nutrition_data(150, NUTRITION_ITEM, "2024-01-01T12:00:00") for _ in range(PROCESS_BATCH)],
+        ),
+        Case(
+            "filter_data_by_date, last 90 days of food_eaten",
+            lambda: filter_data_by_date(food, last_day - pd.Timedelta(days=89), last_day),
+        ),
+        Case("filter_data_by_date, all of food_eaten", lambda: filter_data_by_date(food, None, None)),
+    ]
+    for table in tables:
+        cases.append(Case(
+            f"load_daily_data {table}",
+            lambda table=table: weightloss_dashboard.load_daily_data(table),
+        ))
+    cases.append(Case(
+        "callback update_daily_stores, all tables, end to end",
+        lambda: post_callback(update_daily_stores),
+        setup=weightloss_dashboard.daily_data_cache.clear,
+    ))
+    cases.append(Case(
+        "callback update_daily_stores, all tables, cached",
+        lambda: post_callback(update_daily_stores),
+    ))
+    return cases
+
+
+def measure(case: Case, repeat: int) -> Dict[str, float]:
+    """Times a case and measures its peak memory in a separate run, as tracemalloc slows the code down.
+
+    Returns:
+        dict: The median and minimum seconds and the peak MiB allocated on top of what was allocated before.
+    """
+    timings = []
+    for _ in range(repeat):
+        case.setup()
+        start = time.perf_counter()
+        case.run()
+        timings.append(time.perf_counter() - start)
+    case.setup()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        case.run()
+        peak = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return {"median_s": statistics.median(timings), "min_s": min(timings), "peak_mib": peak / 2 ** 20}
+
+
+def run_size(rows: int, data_dir: str, repeat: int, only: Optional[str]) -> Dict[str, Dict[str, float]]:
+    """Generates the database of one size if it does not exist yet and measures all cases on it.
+
+    Returns:
+        dict: The measurements per case name.
+    """
+    directory = os.path.join(data_dir, SIZE_DIRECTORY.format(rows=rows))
+    db_path = os.path.join(directory, DB_PATH)
+    if not os.path.exists(db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        start = time.perf_counter()
+        # more entries per day for large sizes, a real history is a few decades long and datetime64 ends in 2262
+        create_synthetic_database(db_path, food_rows=rows, meals_per_day=max(6, rows // 10_000))
+        print(f"generated {db_path} in {time.perf_counter() - start:.1f} s")
+
+    print(f"\n{rows} food_eaten rows\n{'case':<58}{'median':>13}{'min':>13}{'peak':>13}")
+    previous_directory = os.getcwd()
+    os.chdir(directory)
+    # the pooled connections of the previous size point to another file under the same relative path
+    connection_manager.close_all()
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            results = {}
+            for case in build_cases(tmp_dir):
+                if only and only not in case.name:
+                    continue
+                results[case.name] = measure(case, repeat)
+                result = results[case.name]
+                print(
+                    f"{case.name:<58}{result['median_s'] * 1000:>11.2f}ms{result['min_s'] * 1000:>11.2f}ms"
+                    f"{result['peak_mib']:>10.1f}MiB"
+                )
+            return results
+    finally:
+        connection_manager.close_all()
+        os.chdir(previous_directory)
+
+
+def compare(results: dict, baseline: dict, tolerance: float, memory_tolerance: float, noise_floor: float) -> List[str]:
+    """Compares the results with a baseline and prints the ratio of every case present in both.
+
+    Args:
+        results (dict): The results of this run, measurements per case name per size.
+        baseline (dict): The saved results of an earlier run, in the same format.
+        tolerance (float): The allowed relative increase of the median time, e.g. 0.25 for 25 %.
+        memory_tolerance (float): The allowed relative increase of the peak memory.
+        noise_floor (float): Time increases below this many seconds never count, timer noise dominates them.
+
+    Returns:
+        list: A description of every regression, empty if there is none.
+    """
+    regressions = []
+    print(f"\n{'case':<58}{'rows':>9}{'baseline':>12}{'now':>12}{'ratio':>8}{'memory':>8}")
+    for size, cases in results.items():
+        for name, result in cases.items():
+            before = baseline.get(size, {}).get(name)
+            if before is None:
+                continue
+            ratio = result["median_s"] / before["median_s"] if before["median_s"] else 1.0
+            memory_ratio = result["peak_mib"] / before["peak_mib"] if before["peak_mib"] > 0.01 else 1.0
+            status = ""
+            if ratio > 1 + tolerance and result["median_s"] - before["median_s"] > noise_floor:
+                status = "SLOWER"
+                regressions.append(f"{name} at {size} rows: {ratio:.2f}x the baseline time")
+            if memory_ratio > 1 + memory_tolerance and result["peak_mib"] - before["peak_mib"] > 1:
+                status += " MORE MEMORY"
+                regressions.append(f"{name} at {size} rows: {memory_ratio:.2f}x the baseline peak memory")
+            print(
+                f"{name:<58}{size:>9}{before['median_s'] * 1000:>10.2f}ms{result['median_s'] * 1000:>10.2f}ms"
+                f"{ratio:>7.2f}x{memory_ratio:>7.2f}x {status}"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000], help="numbers of food_eaten rows")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    parser.add_argument("--data-dir", help="keeps the generated databases here instead of in a temporary directory")
+    parser.add_argument("--only", help="runs only the cases whose name contains this text")
+    parser.add_argument("--save-baseline", metavar="PATH", help="writes the results to a baseline file")
+    parser.add_argument("--compare", metavar="PATH", help="compares the results with a baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative increase of the median time")
+    parser.add_argument("--memory-tolerance", type=float, default=0.25, help="allowed relative increase of the peak memory")
+    parser.add_argument("--noise-floor-ms", type=float, default=1.0, help="time increases below this never count")
+    args = parser.parse_args()
+    # the cases run in other working directories, where the repository is no longer importable by a relative path
+    sys.path.insert(0, REPO_ROOT)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = os.path.abspath(args.data_dir or tmp_dir)
+        results = {}
+        for rows in args.sizes:
+            results[str(rows)] = run_size(rows, data_dir, args.repeat, args.only)
+
+    if args.save_baseline:
+        baseline = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "machine": platform.platform(),
+            "results": results,
+        }
+        if os.path.dirname(args.save_baseline):
+            os.makedirs(os.path.dirname(args.save_baseline), exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"\nbaseline written to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(
+            results, baseline["results"], args.tolerance, args.memory_tolerance, args.noise_floor_ms / 1000
+        )
+        if regressions:
+            print("\nregressions:\n" + "\n".join(f"  {regression}" for regression in regressions))
+            sys.exit(1)
+        print("\nno regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""Simulates many open dashboard tabs and concurrent writers to find out how many viewers one instance can serve.
+
+Every tab loads the dashboard, opens the /events stream and, like assets/live_updates.js does, fires the
+update_daily_stores callback through /dashboard/_dash-update-component for the tables named in each event.
+With --reload-interval every tab additionally requests all daily data at that rate, as a page reload would.
+Writers submit food entries and bodyweight on /, cycling sessions on /add_cycling_data and edits on /modify_food.
+The nutrition API is replaced by the local stub of api/fake_nutrition_api.
+
+By default the app runs in this process on a threaded development server, in a temporary directory with a
+synthetic database. SQLite lock errors are then counted from the log of the server, including the ones of the
+background nutrition lookups. With --url a running local server is tested instead, start it with API_BASE_URL
+pointing to the stub; lock errors then only show up as server errors.
+
+Run from the repository root:
+    python -m benchmarks.load_test --tabs 50 --writers 4 --duration 30
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --rows 10000 --tabs 20
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from api.fake_nutrition_api import FOODS, start_fake_api
+from benchmarks.synthetic_data import create_synthetic_database
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TABLES = ["food_eaten", "bodyweight", "cycling_data"]
+FOOD_NAMES = sorted(FOODS)
+
+
+class Recorder:
+    """Collects the latency and outcome of every request, by kind of request."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.server_errors = 0
+        self.events = 0
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, seconds: float, ok: bool, status: Optional[int] = None) -> None:
+        with self._lock:
+            self.latencies.setdefault(kind, []).append(seconds)
+            if not ok:
+                self.errors[kind] = self.errors.get(kind, 0) + 1
+            if status is not None and status >= 500:
+                self.server_errors += 1
+
+    def count_event(self) -> None:
+        with self._lock:
+            self.events += 1
+
+    def timed(self, kind: str, request: Callable[[], requests.Response]) -> Optional[requests.Response]:
+        """Sends a request and records its latency. Redirects count as success, the forms answer with them."""
+        start = time.perf_counter()
+        try:
+            response = request()
+        except requests.RequestException:
+            self.record(kind, time.perf_counter() - start, ok=False)
+            return None
+        self.record(kind, time.perf_counter() - start, ok=response.status_code < 400, status=response.status_code)
+        return response
+
+
+class LockErrorCounter(logging.Handler):
+    """Counts the log records of the in-process server that mention a locked SQLite database."""
+
+    def __init__(self):
+        super().__init__(level=logging.WARNING)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        text = record.getMessage()
+        if record.exc_info and record.exc_info[1] is not None:
+            text += str(record.exc_info[1])
+        if "database is locked" in text or "database table is locked" in text:
+            self.count += 1
+
+
+def start_app(rows: int, api_latency: float, work_dir: str) -> Tuple[str, LockErrorCounter, Callable[[], None]]:
+    """Starts the app with a synthetic database and the fake nutrition API on a threaded server in the background.
+
+    Args:
+        rows (int): The number of synthetic food_eaten rows.
+        api_latency (float): Seconds the fake API waits before every response.
+        work_dir (str): The working directory of the app, holding data/bodyweight.db.
+
+    Returns:
+        tuple: The base URL of the app, the lock error counter and a function stopping the servers.
+    """
+    os.makedirs(os.path.join(work_dir, "data"))
+    create_synthetic_database(os.path.join(work_dir, "data", "bodyweight.db"), food_rows=rows)
+    api_server, api_url = start_fake_api(latency=api_latency)
+    os.environ["API_BASE_URL"] = api_url
+    os.environ.setdefault("API_KEY", "load-test")
+    os.chdir(work_dir)
+    sys.path.insert(0, REPO_ROOT)  # the working directory no longer is the repository root
+    from werkzeug.serving import make_server
+
+    import weightloss_dashboard  # imported after API_BASE_URL is set, it is read at import
+
+    lock_errors = LockErrorCounter()
+    logging.getLogger().addHandler(lock_errors)
+    server = make_server("127.0.0.1", 0, weightloss_dashboard.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def stop() -> None:
+        server.shutdown()
+        api_server.shutdown()
+
+    return f"http://127.0.0.1:{server.server_port}", lock_errors, stop
+
+
+def iter_events(response: requests.Response) -> Iterator[Dict[str, int]]:
+    """Parses a Server-Sent Events stream into the JSON objects of its data lines, skipping comments and retry hints."""
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data:"):
+            yield json.loads(line[len("data:"):])
+
+
+def update_daily_stores_body(versions: Dict[str, int], changed: List[str]) -> dict:
+    """Builds the request the Dash renderer sends when the version stores of the changed tables were updated."""
+    return {
+        "output": f"..{'...'.join(f'{table}-daily-store.data' for table in TABLES)}..",
+        "outputs": [{"id": f"{table}-daily-store", "property": "data"} for table in TABLES],
+        "inputs": [{"id": f"{table}-version-store", "property": "data", "value": versions.get(table)} for table in TABLES],
+        "changedPropIds": [f"{table}-version-store.data" for table in changed],
+    }
+
+
+class Tab:
+    """One open dashboard, running in its own thread until stop is set.
+
+    Args:
+        base_url (str): The URL of the app.
+        recorder (Recorder): Where the requests are recorded.
+        stop (threading.Event): Set when the test is over.
+        reload_interval (float): Seconds between requests for all daily data, 0 to only follow the events.
+    """
+
+    def __init__(self, base_url: str, recorder: Recorder, stop: threading.Event, reload_interval: float):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.stop = stop
+        self.reload_interval = reload_interval
+        self.session = requests.Session()
+        self.versions: Dict[str, int] = {}
+        self._stream: Optional[requests.Response] = None
+        self._lock = threading.Lock()
+
+    def fetch_daily_data(self, kind: str, changed: List[str]) -> None:
+        with self._lock:
+            body = update_daily_stores_body(self.versions, changed)
+        self.recorder.timed(kind, lambda: self.session.post(f"{self.base_url}/dashboard/_dash-update-component", json=body))
+
+    def follow_events(self) -> None:
+        self.recorder.timed("GET /dashboard/", lambda: self.session.get(f"{self.base_url}/dashboard/"))
+        self.recorder.timed("GET /dashboard/_dash-layout", lambda: self.session.get(f"{self.base_url}/dashboard/_dash-layout"))
+        while not self.stop.is_set():
+            try:
+                with requests.get(f"{self.base_url}/events", stream=True, timeout=(5, None)) as stream:
+                    self._stream = stream
+                    for event in iter_events(stream):
+                        self.recorder.count_event()
+                        with self._lock:
+                            changed = [table for table in TABLES if table in event and self.versions.get(table) != event[table]]
+                            self.versions.update({table: event[table] for table in changed})
+                        if changed:
+                            self.fetch_daily_data("callback update_daily_stores, on event", changed)
+                        if self.stop.is_set():
+                            return
+            except (requests.RequestException, AttributeError, ValueError):
+                # the stream is closed from outside when the test ends
+                if not self.stop.is_set():
+                    self.recorder.record("GET /events", 0.0, ok=False)
+                    time.sleep(1)
+
+    def reload(self) -> None:
+        while not self.stop.wait(self.reload_interval * random.uniform(0.5, 1.5)):
+            if self.versions:
+                self.fetch_daily_data("callback update_daily_stores, reload", TABLES)
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.close()
+
+    def threads(self) -> List[threading.Thread]:
+        targets = [self.follow_events] + ([self.reload] if self.reload_interval else [])
+        return [threading.Thread(target=target, daemon=True) for target in targets]
+
+
+def run_writer(base_url: str, recorder: Recorder, stop: threading.Event, interval: float, max_food_id: int, seed: int) -> None:
+    """Submits random writes through the forms of the app until stop is set.
+
+    Args:
+        base_url (str): The URL of the app.
+        recorder (Recorder): Where the requests are recorded.
+        stop (threading.Event): Set when the test is over.
+        interval (float): Seconds between two writes of this writer, 0 for as fast as possible.
+        max_food_id (int): The largest food_eaten id to edit.
+        seed (int): The seed of the random choices.
+    """
+    rnd = random.Random(seed)
+    session = requests.Session()
+    while not stop.is_set():
+        now = datetime.now() - timedelta(minutes=rnd.randint(0, 7 * 24 * 60))
+        timestamp = now.strftime("%Y-%m-%dT%H:%M")
+        action = rnd.choices(["food", "bodyweight", "cycling", "modify_food"], weights=[5, 2, 1, 2])[0]
+        if action == "food":
+            form = {"timestamp": timestamp, "food_item": rnd.choice(FOOD_NAMES), "weight": str(rnd.randint(20, 400))}
+            recorder.timed("POST / food", lambda: session.post(f"{base_url}/", data=form, allow_redirects=False))
+        elif action == "bodyweight":
+            form = {"date": now.strftime("%Y-%m-%d"), "bodyweight": f"{rnd.uniform(70, 90):.1f}"}
+            recorder.timed("POST / bodyweight", lambda: session.post(f"{base_url}/", data=form, allow_redirects=False))
+        elif action == "cycling":
+            form = {
+                "cycling-timestamp": timestamp,
+                "calories": str(rnd.randint(200, 900)),
+                "duration": str(rnd.randint(20, 120)),
+                "name_of_session": "ride",
+            }
+            recorder.timed("POST /add_cycling_data", lambda: session.post(f"{base_url}/add_cycling_data", data=form, allow_redirects=False))
+        else:
+            food_id = rnd.randint(1, max_food_id)
+            form = {"timestamp": timestamp, "name": rnd.choice(FOOD_NAMES), "serving_size_g": str(rnd.randint(20, 400))}
+            recorder.timed(
+                "POST /modify_food", lambda: session.post(f"{base_url}/modify_food/{food_id}", data=form, allow_redirects=False)
+            )
+        if interval:
+            stop.wait(interval * rnd.uniform(0.5, 1.5))
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Returns the value below which the share q of the values lies."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def report(recorder: Recorder, duration: float, lock_errors: Optional[LockErrorCounter]) -> None:
+    """Prints latency percentiles and throughput per kind of request, and the error counts."""
+    print(f"\n{'request':<46}{'count':>8}{'errors':>8}{'p50':>11}{'p99':>11}{'req/s':>9}")
+    everything = []
+    for kind, latencies in sorted(recorder.latencies.items()):
+        everything += latencies
+        print(
+            f"{kind:<46}{len(latencies):>8}{recorder.errors.get(kind, 0):>8}"
+            f"{percentile(latencies, 0.5) * 1000:>9.1f}ms{percentile(latencies, 0.99) * 1000:>9.1f}ms"
+            f"{len(latencies) / duration:>9.1f}"
+        )
+    if everything:
+        print(
+            f"{'all':<46}{len(everything):>8}{sum(recorder.errors.values()):>8}"
+            f"{statistics.median(everything) * 1000:>9.1f}ms{percentile(everything, 0.99) * 1000:>9.1f}ms"
+            f"{len(everything) / duration:>9.1f}"
+        )
+    print(f"\nevents received by all tabs: {recorder.events}")
+    print(f"server errors (5xx): {recorder.server_errors}")
+    if lock_errors is not None:
+        print(f"SQLite lock errors logged by the server: {lock_errors.count}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="tests a running server instead of starting one in this process")
+    parser.add_argument("--tabs", type=int, default=20, help="number of open dashboard tabs")
+    parser.add_argument("--writers", type=int, default=2, help="number of concurrent writers")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--write-interval", type=float, default=1.0, help="mean seconds between writes per writer, 0 for no pause")
+    parser.add_argument("--reload-interval", type=float, default=0, help="mean seconds between full reloads per tab, 0 for none")
+    parser.add_argument("--rows", type=int, default=10_000, help="food_eaten rows of the synthetic database, or of the tested one")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="seconds the fake nutrition API takes per request")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        lock_errors = None
+        stop_app = None
+        base_url = args.url.rstrip("/") if args.url else None
+        if base_url is None:
+            base_url, lock_errors, stop_app = start_app(args.rows, args.api_latency, tmp_dir)
+        print(f"{args.tabs} tabs, {args.writers} writers, {args.duration:g} s against {base_url}")
+
+        recorder = Recorder()
+        stop = threading.Event()
+        tabs = [Tab(base_url, recorder, stop, args.reload_interval) for _ in range(args.tabs)]
+        threads = [thread for tab in tabs for thread in tab.threads()]
+        threads += [
+            threading.Thread(
+                target=run_writer,
+                args=(base_url, recorder, stop, args.write_interval, args.rows, seed),
+                daemon=True,
+            )
+            for seed in range(args.writers)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        stop.wait(args.duration)
+        stop.set()
+        for tab in tabs:
+            tab.close()
+        # a tab waiting for the next event may only notice the end with the next heartbeat, it is not waited for
+        deadline = time.monotonic() + 5
+        for thread in threads:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        duration = time.perf_counter() - start
+
+        report(recorder, duration, lock_errors)
+        if stop_app is not None:
+            stop_app()
+            os.chdir(REPO_ROOT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+from data_tools.data_processing import NORMALIZED_TIMESTAMP_FORMAT
+from data_tools.migrations import migrate
+
+FOOD_EATEN_COLUMNS = [
+    "timestamp",
+    "name",
+    "calories",
+    "serving_size_g",
+    "fat_total_g",
+    "fat_saturated_g",
+    "protein_g",
+    "sodium_mg",
+    "potassium_mg",
+    "cholesterol_mg",
+    "carbohydrates_total_g",
+    "fiber_g",
+    "sugar_g",
+]
+
+FOOD_NAMES = ["oats", "banana", "rice", "chicken breast", "apple", "bread", "egg", "yogurt", "pasta", "salmon"]
+
+
+def create_synthetic_database(
+    db_path: str, food_rows: int = 10_000, meals_per_day: int = 6, seed: int = 0
+) -> None:
+    """Creates a bodyweight.db-like database filled with realistic random entries.
+
+    The history is as long as needed to hold food_rows entries at meals_per_day entries per day,
+    with one bodyweight entry per day and a cycling session every third day.
+
+    Args:
+        db_path (str): The path of the database file to create.
+        food_rows (int): The number of food_eaten rows to generate.
+        meals_per_day (int): The average number of food entries per day.
+        seed (int): The seed of the random generator, so runs are comparable.
+    """
+    rnd = random.Random(seed)
+    days = max(1, food_rows // meals_per_day)
+    start = datetime(2020, 1, 1)
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE IF NOT EXISTS bodyweight (id INTEGER PRIMARY KEY, date TEXT, bodyweight REAL)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS food_eaten (id INTEGER PRIMARY KEY, "
+        + ", ".join(f"{col} {'TEXT' if col in ('timestamp', 'name') else 'REAL'}" for col in FOOD_EATEN_COLUMNS)
+        + ")"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS cycling_data (id INTEGER PRIMARY KEY, timestamp TEXT, "
+        "calories INTEGER, duration INTEGER, name_of_session TEXT)"
+    )
+
+    def food_row(i: int) -> tuple:
+        t = start + timedelta(days=i * days // food_rows, minutes=rnd.randint(7 * 60, 25 * 60))
+        weight = rnd.randint(20, 400)
+        return (
+            t.strftime(NORMALIZED_TIMESTAMP_FORMAT),
+            rnd.choice(FOOD_NAMES),
+            weight * rnd.uniform(0.5, 4.0),
+            weight,
+            weight * rnd.uniform(0, 0.2),
+            weight * rnd.uniform(0, 0.05),
+            weight * rnd.uniform(0, 0.3),
+            weight * rnd.uniform(0, 5),
+            weight * rnd.uniform(0, 5),
+            weight * rnd.uniform(0, 1),
+            weight * rnd.uniform(0, 0.7),
+            weight * rnd.uniform(0, 0.1),
+            weight * rnd.uniform(0, 0.3),
+        )
+
+    placeholders = ", ".join(["?"] * len(FOOD_EATEN_COLUMNS))
+    conn.executemany(
+        f"INSERT INTO food_eaten ({', '.join(FOOD_EATEN_COLUMNS)}) VALUES ({placeholders})",
+        (food_row(i) for i in range(food_rows)),
+    )
+    conn.executemany(
+        "INSERT INTO bodyweight (date, bodyweight) VALUES (?, ?)",
+        (((start + timedelta(days=d)).strftime("%Y-%m-%d"), round(95 - d * 0.01 + rnd.uniform(-1, 1), 1)) for d in range(days)),
+    )
+    conn.executemany(
+        "INSERT INTO cycling_data (timestamp, calories, duration, name_of_session) VALUES (?, ?, ?, ?)",
+        (
+            ((start + timedelta(days=d, hours=18)).strftime(NORMALIZED_TIMESTAMP_FORMAT), rnd.randint(200, 900), rnd.randint(20, 120), "ride")
+            for d in range(0, days, 3)
+        ),
+    )
+    conn.commit()
+    conn.close()
+    # indexes, triggers and rollups are created in bulk after the rows are in
+    migrate(db_path)
@@ -1,78 +1,24 @@
+from functools import lru_cache
 from dash import dcc, html
 import dash_bootstrap_components as dbc
-import plotly.express as px
-from data_tools.data_manager import DataReader
-import pandas as pd
-from typing import Optional
 from decorators import log_execution_time
 
-data_reader = DataReader("data/bodyweight.db")
-bodyweight_data = data_reader.read_bodyweight_data()
-fig = px.line(bodyweight_data, x="date", y="bodyweight")
-fig.update_layout(yaxis=dict(range=[0, None]))
+VERSIONED_TABLES = ("food_eaten", "bodyweight", "cycling_data")
 
+# importing this module must not read the database or build figures, the dashboard callbacks fill the charts on page load
+# plotly.express is imported inside the functions, as it is only needed once a figure is built
 
-@log_execution_time
-def create_stacked_bar_chart():
-    df = data_reader.read_daily_macros()
-    df['total'] = df['carbs'] + df['fats'] + df['proteins']
-    df['carbs'] = df['carbs'] / df['total'] * 100
-    df['fats'] = df['fats'] / df['total'] * 100
-    df['proteins'] = df['proteins'] / df['total'] * 100
-    df_melted = df.melt(id_vars='date', value_vars=['carbs', 'fats', 'proteins'], var_name='category', value_name='percentage')
-    return px.bar(df_melted, x='date', y='percentage', color='category', title='Daily Macronutrient Distribution', labels={'percentage': 'Percentage (%)'})
 
+@lru_cache(maxsize=1)
+def chart_template() -> dict:
+    """Returns the default Plotly template as JSON, sent once per page load instead of inside every figure."""
+    import plotly.io as pio
 
-@log_execution_time
-def preprocess_cycling_data():
-    data_reader = DataReader(db_name="data/bodyweight.db")
-    cycling_data = data_reader.read_cycling_data()
-    return cycling_data
-
-
-@log_execution_time
-def create_cycling_chart(start_date: Optional[str] = None, end_date: Optional[str] = None, time_frame: str = "daily"):
-    df = preprocess_cycling_data()
-    df['timestamp'] = pd.to_datetime(df['timestamp'], format="%Y-%m-%dT%H:%M")
-    start_date = pd.to_datetime(start_date) if start_date else None
-    end_date = pd.to_datetime(end_date) if end_date else None
-    if start_date:
-        df = df[df['timestamp'] >= start_date]
-    if end_date:
-        df = df[df['timestamp'] <= end_date]
-
-    if time_frame == "weekly":
-        df['week_start'] = df['timestamp'].dt.to_period('W').dt.start_time
-        grouped_data = df.groupby('week_start')['duration'].mean().reset_index()
-        grouped_data['timestamp'] = grouped_data['week_start']
-    elif time_frame == "monthly":
-        grouped_data = df.groupby(df['timestamp'].dt.to_period('M'))['duration'].mean().reset_index()
-        grouped_data['timestamp'] = grouped_data['timestamp'].dt.to_timestamp()
-    else:
-        grouped_data = df
-
-    fig = px.bar(grouped_data, x="timestamp", y="duration")
-    fig.update_layout(
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        xaxis=dict(
-            title="",
-            showline=False
-        ),
-        yaxis=dict(
-            title="",
-            showline=False
-        )
-    )
-    return fig
-
-
-fig_cycling = create_cycling_chart()
+    return pio.templates[pio.templates.default].to_plotly_json()
 
 
 @log_execution_time
 def create_layout():
-    fig_macronutrients = create_stacked_bar_chart()
     layout = html.Div(
         [
             dbc.Container(
@@ -111,7 +57,7 @@ def create_layout():
                     html.Div(
                         [
                             html.H4("Weight Over Time"),
-                            dcc.Graph(id="weight-line-chart", figure=fig),
+                            dcc.Graph(id="weight-line-chart"),
                         ],
                         style={
                             "width": "50%",
@@ -123,7 +69,7 @@ def create_layout():
                     html.Div(
                         [
                             html.H4("Share of Macronutrients per day"),
-                            dcc.Graph(id='macronutrients-stacked-bar-chart', figure=fig_macronutrients),
+                            dcc.Graph(id='macronutrients-stacked-bar-chart'),
                         ],
                         style={
                             "width": "50%",
@@ -135,7 +81,7 @@ def create_layout():
                     html.Div(
                         [
                             html.H4("Cycling Duration per Day"),
-                            dcc.Graph(id='cycling-line-chart', figure=fig_cycling),
+                            dcc.Graph(id='cycling-line-chart'),
                         ],
                         style={
                             "width": "50%",
@@ -147,11 +93,13 @@ def create_layout():
                
                 ]
             ),
-            dcc.Interval(
-                id="interval-component",
-                interval=1 * 1000,  # in milliseconds
-                n_intervals=0,
-            ),
+            # clicked by assets/live_updates.js when the server pushes new data versions, nothing is polled
+            html.Button(id="data-change-signal", n_clicks=0, style={"display": "none"}),
+            # the daily data of a table is sent again when its version changes
+            *[dcc.Store(id=f"{table}-version-store") for table in VERSIONED_TABLES],
+            # the charts are drawn from these in the browser, see assets/dashboard_charts.js
+            *[dcc.Store(id=f"{table}-daily-store") for table in VERSIONED_TABLES],
+            dcc.Store(id="chart-template-store", data=chart_template()),
         ]
     )
 
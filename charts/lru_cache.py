@@ -0,0 +1,92 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+
+class LRUCache:
+    """A thread-safe LRU cache of JSON data sent to the browser, e.g. the daily data of a table, with a bounded size.
+
+    Values are stored as the plain JSON structure Dash sends to the browser, so a hit can be returned by a callback
+    as is, without reading or processing the data again. The size of an entry is the length of its JSON text,
+    and the least recently used entries are evicted once max_bytes is exceeded.
+
+    Keys should contain the data version of the table the value is built from, so a write never serves stale data.
+
+    Args:
+        max_bytes (int): The maximum total size of the cached values, in bytes of JSON.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[dict, int]]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[dict]:
+        """Looks up a value and marks it as recently used.
+
+        Args:
+            key (Hashable): The cache key, e.g. (table, data version).
+
+        Returns:
+            dict: The stored value, or None if it is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: dict) -> dict:
+        """Serializes a value, stores it and evicts the least recently used values above max_bytes.
+
+        Args:
+            key (Hashable): The cache key.
+            value (dict): The JSON serializable data to store.
+
+        Returns:
+            dict: The stored copy of the value, to be returned by the callback.
+        """
+        serialized = json.dumps(value)
+        size = len(serialized)
+        # decoded once here, so the cached structure holds only plain JSON types and is safe to share between requests
+        value_json = json.loads(serialized)
+        if size > self.max_bytes:
+            return value_json
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value_json, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+        return value_json
+
+    def clear(self) -> None:
+        """Removes all values, the statistics are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the hit and miss counters together with the current size of the cache.
+
+        Returns:
+            dict: A snapshot of hits, misses, hit_rate, entries and bytes.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
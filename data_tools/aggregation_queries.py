@@ -0,0 +1,155 @@
+from typing import List, Optional, Tuple
+
+from data_tools.data_processing import TIME_OF_DAY_CATEGORIES
+
+
+def day_expression(timestamp_column: str) -> str:
+    """Builds the SQL expression mapping a timestamp to the day it counts towards.
+    Attention: Like in data_processing.time_of_day, the timeframe from 00:00-02:00 still counts as the previous day.
+
+    Args:
+        timestamp_column (str): The column holding the timestamp, e.g. "timestamp" or "NEW.timestamp" inside a trigger.
+
+    Returns:
+        str: The SQL expression of the day as "YYYY-MM-DD", NULL for missing or unparsable timestamps.
+    """
+    return f"date({timestamp_column}, '-2 hours')"
+
+
+def calendar_day_expression(timestamp_column: str) -> str:
+    """Builds the SQL expression mapping a timestamp to its calendar day, without the shift of day_expression.
+    Cycling sessions count towards the day they took place on.
+
+    Args:
+        timestamp_column (str): The column holding the timestamp, e.g. "timestamp" or "NEW.timestamp" inside a trigger.
+
+    Returns:
+        str: The SQL expression of the day as "YYYY-MM-DD", NULL for missing or unparsable timestamps.
+    """
+    return f"date({timestamp_column})"
+
+
+def time_of_day_expression(timestamp_column: str) -> str:
+    """Builds the SQL expression categorizing a timestamp like data_processing.time_of_day.
+
+    Args:
+        timestamp_column (str): The column holding the timestamp, e.g. "timestamp" or "NEW.timestamp" inside a trigger.
+
+    Returns:
+        str: The SQL expression of the time-of-day category, such as '2-12' or '17-22'.
+    """
+    hour = f"CAST(strftime('%H', {timestamp_column}) AS INTEGER)"
+    return f"""CASE
+            WHEN {hour} >= 2 AND {hour} < 12 THEN '2-12'
+            WHEN {hour} >= 12 AND {hour} < 17 THEN '12-17'
+            WHEN {hour} >= 17 AND {hour} < 22 THEN '17-22'
+            ELSE '22-2'
+        END"""
+
+
+# every period is labeled with its first day, weeks start on Monday
+PERIOD_EXPRESSIONS = {
+    "daily": "{day}",
+    "weekly": "date({day}, 'weekday 0', '-6 days')",
+    "monthly": "date({day}, 'start of month')",
+}
+
+
+def period_expression(time_frame: str, day_column: str = "date") -> str:
+    """Builds the SQL expression mapping a day to the first day of its daily, weekly or monthly period.
+
+    Args:
+        time_frame (str): The time frame to group by, being "daily", "weekly" or "monthly". Unknown values fall back to "daily".
+        day_column (str): The column holding the day as "YYYY-MM-DD".
+
+    Returns:
+        str: The SQL expression of the period start as "YYYY-MM-DD".
+    """
+    return PERIOD_EXPRESSIONS.get(time_frame, PERIOD_EXPRESSIONS["daily"]).format(day=day_column)
+
+
+def date_filter_clause(
+    start_date: Optional[str], end_date: Optional[str], day_column: str = "date"
+) -> Tuple[str, List[str]]:
+    """Builds a WHERE clause keeping only the days between the given start and end dates, both inclusive.
+
+    Args:
+        start_date (str, optional): The first day to keep, as "YYYY-MM-DD". If not provided, no filtering is done on the start date.
+        end_date (str, optional): The last day to keep, as "YYYY-MM-DD". If not provided, no filtering is done on the end date.
+        day_column (str): The column holding the day to filter on.
+
+    Returns:
+        tuple: The clause (empty if there is nothing to filter) and its parameters.
+    """
+    conditions = []
+    params = []
+    if start_date:
+        conditions.append(f"{day_column} >= ?")
+        params.append(start_date[:10])
+    if end_date:
+        conditions.append(f"{day_column} <= ?")
+        params.append(end_date[:10])
+    clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return clause, params
+
+
+def build_nutrition_query(
+    start_date: Optional[str], end_date: Optional[str], time_frame: str
+) -> Tuple[str, List[str]]:
+    """Builds the query for everything the nutrition charts show, from the daily_nutrition rollup in a single pass.
+
+    The calories are split by time of day and, for weekly and monthly periods, averaged over the days with data.
+    The grams of carbohydrates, fats and proteins are summed up per period.
+
+    Args:
+        start_date (str, optional): The first day to include, as "YYYY-MM-DD".
+        end_date (str, optional): The last day to include, as "YYYY-MM-DD".
+        time_frame (str): The time frame to group by, being "daily", "weekly" or "monthly".
+
+    Returns:
+        tuple: The query, returning the column date, one calories column per time-of-day category and the columns carbs, fats and proteins, and its parameters.
+    """
+    where, params = date_filter_clause(start_date, end_date)
+    calories_columns = ",\n            ".join(
+        f"COALESCE(SUM(CASE WHEN time_of_day = '{category}' THEN calories END), 0) * 1.0 / COUNT(DISTINCT day) AS \"{category}\""
+        for category in TIME_OF_DAY_CATEGORIES
+    )
+    query = f"""SELECT
+            date,
+            {calories_columns},
+            SUM(carbs) AS carbs,
+            SUM(fats) AS fats,
+            SUM(proteins) AS proteins
+        FROM (
+            SELECT date AS day, {period_expression(time_frame)} AS date, time_of_day, calories, carbs, fats, proteins
+            FROM daily_nutrition
+            {where}
+        )
+        GROUP BY date
+        ORDER BY date"""
+    return query, params
+
+
+def build_cycling_query(
+    start_date: Optional[str], end_date: Optional[str], time_frame: str
+) -> Tuple[str, List[str]]:
+    """Builds the query for the cycling duration and number of sessions summed up per period from the daily_cycling rollup.
+
+    Args:
+        start_date (str, optional): The first day to include, as "YYYY-MM-DD".
+        end_date (str, optional): The last day to include, as "YYYY-MM-DD".
+        time_frame (str): The time frame to group by, being "daily", "weekly" or "monthly".
+
+    Returns:
+        tuple: The query, returning the columns date, duration and sessions, and its parameters.
+    """
+    where, params = date_filter_clause(start_date, end_date)
+    query = f"""SELECT
+            {period_expression(time_frame)} AS date,
+            SUM(duration) AS duration,
+            SUM(sessions) AS sessions
+        FROM daily_cycling
+        {where}
+        GROUP BY 1
+        ORDER BY 1"""
+    return query, params
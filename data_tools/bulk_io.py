@@ -0,0 +1,341 @@
+"""Imports and exports the tracked tables as CSV, JSON Lines or JSON, streaming in chunks.
+
+Run from the repository root:
+    python -m data_tools.bulk_io import food_eaten history.csv
+    python -m data_tools.bulk_io export bodyweight bodyweight.jsonl
+    python -m data_tools.bulk_io export cycling_data -        # CSV to stdout
+"""
+import argparse
+import csv
+import io
+import json
+import re
+import sqlite3
+import sys
+import time
+from datetime import date
+from typing import Callable, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+from data_tools.data_manager import SQLite3Writer, connection_manager, ensure_schema
+from data_tools.data_processing import normalize_timestamp
+from data_tools.migrations import TABLE_SCHEMAS
+
+BULK_TABLES = ("food_eaten", "bodyweight", "cycling_data")
+# the column every row needs, the rollups and the charts are keyed on it
+REQUIRED_COLUMNS = {"food_eaten": "timestamp", "bodyweight": "date", "cycling_data": "timestamp"}
+
+_NORMALIZED_TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}$")
+
+
+class ValidationError(ValueError):
+    """Raised for a row that cannot be imported."""
+
+
+def _convert_timestamp(value: str) -> str:
+    normalized = normalize_timestamp(value)
+    if not isinstance(normalized, str) or not _NORMALIZED_TIMESTAMP.match(normalized):
+        raise ValueError(f"not a timestamp: {value!r}")
+    return normalized
+
+
+def _convert_date(value: str) -> str:
+    return date.fromisoformat(value[:10]).isoformat()
+
+
+def _converter(column: str, column_type: str) -> Callable[[any], any]:
+    if column == "timestamp":
+        return _convert_timestamp
+    if column == "date":
+        return _convert_date
+    if column_type.startswith("INTEGER"):
+        return lambda value: int(float(value))
+    if column_type.startswith("REAL"):
+        return float
+    return str
+
+
+def build_validator(table_name: str, keep_ids: bool = False) -> Callable[[Dict[str, any]], Dict[str, any]]:
+    """Builds the function checking and converting one input row of a table.
+
+    Args:
+        table_name (str): The table the rows are imported into, one of BULK_TABLES.
+        keep_ids (bool): Whether an id column in the input is kept instead of ignored.
+
+    Returns:
+        Callable: Takes a row as read from the file and returns it with typed, normalized values.
+        Empty values become NULL. It raises ValidationError for unknown columns, values of the wrong type or a missing required column.
+    """
+    converters = {
+        column: _converter(column, column_type)
+        for column, column_type in TABLE_SCHEMAS[table_name].items()
+        if keep_ids or column != "id"
+    }
+    required = REQUIRED_COLUMNS[table_name]
+    # the rows of a file share their columns, so the converters are looked up once per set of columns
+    plans: Dict[Tuple[str, ...], List[Tuple[str, Callable]]] = {}
+
+    def plan(columns: Tuple[str, ...]) -> List[Tuple[str, Callable]]:
+        unknown = [column for column in columns if column not in converters and column != "id"]
+        if unknown:
+            raise ValidationError(f"unknown column {unknown[0]!r}")
+        return [(column, converters[column]) for column in columns if column in converters]
+
+    def validate(row: Dict[str, any]) -> Dict[str, any]:
+        columns = tuple(row)
+        column_plan = plans.get(columns)
+        if column_plan is None:
+            column_plan = plans[columns] = plan(columns)
+        validated = {}
+        for column, converter in column_plan:
+            value = row[column]
+            if value is None or value == "":
+                validated[column] = None
+                continue
+            try:
+                validated[column] = converter(value)
+            except (TypeError, ValueError) as e:
+                raise ValidationError(f"invalid {column}: {e}") from e
+        if validated.get(required) is None:
+            raise ValidationError(f"missing {required}")
+        return validated
+
+    return validate
+
+
+def read_rows(source: IO[str], file_format: str) -> Iterator[Dict[str, any]]:
+    """Reads rows one by one from an open file.
+
+    Args:
+        source (IO[str]): The open file.
+        file_format (str): "csv" with a header row, "jsonl" with one object per line, or "json" with a list of objects.
+            A JSON list is read completely before the first row is returned, the other formats are streamed.
+
+    Returns:
+        Iterator[dict]: The rows as read, with the column names as keys.
+    """
+    if file_format == "csv":
+        yield from csv.DictReader(source)
+    elif file_format == "jsonl":
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        yield from json.load(source)
+
+
+def _chunks(rows: Iterable, chunk_size: int) -> Iterator[List]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_rows(
+    db_path: str,
+    table_name: str,
+    rows: Iterable[Dict[str, any]],
+    chunk_size: int = 50_000,
+    keep_ids: bool = False,
+    strict: bool = False,
+    max_reported_errors: int = 20,
+) -> Dict[str, any]:
+    """Validates rows and inserts them in chunks, each chunk with one executemany call in one transaction.
+
+    Args:
+        db_path (str): The path to the SQLite3 database file.
+        table_name (str): The table to import into, one of BULK_TABLES.
+        rows (Iterable[dict]): The rows, e.g. from read_rows. They are consumed lazily, so the input can be larger than the memory.
+        chunk_size (int): The number of rows per transaction.
+        keep_ids (bool): Whether an id column in the input is inserted too, e.g. to restore an export into an empty table.
+        strict (bool): Whether an invalid row or a taken id aborts the import instead of being skipped. Chunks inserted before stay.
+        max_reported_errors (int): The number of invalid rows whose error is reported.
+
+    Returns:
+        dict: The number of imported and skipped rows, the number of rows rejected because their chunk held an id
+            that is already taken, and the errors of the first skipped and rejected rows as (row number, message).
+    """
+    if table_name not in BULK_TABLES:
+        raise ValueError(f"{table_name} is not one of {', '.join(BULK_TABLES)}")
+    writer = SQLite3Writer(db_path)
+    validate = build_validator(table_name, keep_ids)
+    result = {"imported": 0, "skipped": 0, "rejected": 0, "errors": []}
+
+    def report(row_number: int, error: str) -> None:
+        if len(result["errors"]) < max_reported_errors:
+            result["errors"].append((row_number, error))
+
+    def validated_rows() -> Iterator[Tuple[int, Dict[str, any]]]:
+        for row_number, row in enumerate(rows, start=1):
+            try:
+                yield row_number, validate(row)
+            except ValidationError as e:
+                if strict:
+                    raise ValidationError(f"row {row_number}: {e}") from e
+                result["skipped"] += 1
+                report(row_number, str(e))
+
+    for chunk in _chunks(validated_rows(), chunk_size):
+        try:
+            writer.create_many_data(table_name, [row for _, row in chunk])
+        except sqlite3.IntegrityError as e:
+            # the transaction of the chunk was rolled back, the chunks before and after it are imported
+            conflicts = _taken_ids(db_path, table_name, chunk)
+            first_row, last_row = chunk[0][0], chunk[-1][0]
+            if strict:
+                rows_of = f"row {conflicts[0][0]}" if conflicts else f"rows {first_row}-{last_row}"
+                raise ValidationError(f"{rows_of}: {e}") from e
+            result["rejected"] += len(chunk)
+            for row_number, row_id in conflicts:
+                report(row_number, f"id {row_id} is already taken, rows {first_row}-{last_row} were not imported")
+            if not conflicts:
+                report(first_row, f"{e}, rows {first_row}-{last_row} were not imported")
+            continue
+        result["imported"] += len(chunk)
+    return result
+
+
+def _taken_ids(db_path: str, table_name: str, chunk: List[Tuple[int, Dict[str, any]]]) -> List[Tuple[int, int]]:
+    """Finds the rows of a chunk whose id is taken by a row of the table or by an earlier row of the chunk.
+
+    Returns:
+        list: The row number and id of every such row.
+    """
+    ids = [row["id"] for _, row in chunk if row.get("id") is not None]
+    if not ids:
+        return []
+    with connection_manager.connection(db_path) as conn:
+        # one parameter for all ids, a chunk may have more rows than SQLite allows parameters
+        taken = {row_id for row_id, in conn.execute(
+            f"SELECT id FROM {table_name} WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(ids),)
+        )}
+    conflicts = []
+    for row_number, row in chunk:
+        row_id = row.get("id")
+        if row_id is None:
+            continue
+        if row_id in taken:
+            conflicts.append((row_number, row_id))
+        taken.add(row_id)
+    return conflicts
+
+
+def export_rows(
+    db_path: str, table_name: str, target: IO[str], file_format: str, chunk_size: int = 50_000
+) -> int:
+    """Writes all rows of a table ordered by id, fetching chunk_size rows at a time so the table never has to fit into memory.
+
+    Args:
+        db_path (str): The path to the SQLite3 database file.
+        table_name (str): The table to export, one of BULK_TABLES.
+        target (IO[str]): The open file to write to.
+        file_format (str): "csv", "jsonl" or "json", see read_rows.
+        chunk_size (int): The number of rows fetched at a time.
+
+    Returns:
+        int: The number of exported rows.
+    """
+    if table_name not in BULK_TABLES:
+        raise ValueError(f"{table_name} is not one of {', '.join(BULK_TABLES)}")
+    ensure_schema(db_path)
+    exported = 0
+    with connection_manager.connection(db_path) as conn:
+        cursor = conn.execute(f"SELECT * FROM {table_name} ORDER BY id")
+        columns = [description[0] for description in cursor.description]
+        if file_format == "csv":
+            writer = csv.writer(target)
+            writer.writerow(columns)
+        elif file_format == "json":
+            target.write("[")
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            if file_format == "csv":
+                writer.writerows(chunk)
+            else:
+                separator = ",\n" if file_format == "json" else "\n"
+                lines = (json.dumps(dict(zip(columns, row))) for row in chunk)
+                if file_format == "json" and exported:
+                    target.write(separator)
+                target.write(separator.join(lines))
+                if file_format == "jsonl":
+                    target.write("\n")
+            exported += len(chunk)
+        if file_format == "json":
+            target.write("]\n")
+    return exported
+
+
+def detect_format(path: str, file_format: Optional[str]) -> str:
+    """Returns the given format or the one matching the file extension, CSV by default."""
+    if file_format:
+        return file_format
+    for extension, detected in ((".jsonl", "jsonl"), (".ndjson", "jsonl"), (".json", "json")):
+        if path.lower().endswith(extension):
+            return detected
+    return "csv"
+
+
+def _open(path: str, mode: str) -> Tuple[IO[str], bool]:
+    if path == "-":
+        stream = sys.stdin if "r" in mode else sys.stdout
+        return io.TextIOWrapper(stream.buffer, encoding="utf-8", newline=""), False
+    return open(path, mode, encoding="utf-8", newline=""), True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="data/bodyweight.db")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="import rows into a table")
+    import_parser.add_argument("table", choices=BULK_TABLES)
+    import_parser.add_argument("path", help="the file to read, - for stdin")
+    import_parser.add_argument("--format", choices=("csv", "jsonl", "json"), help="defaults to the file extension")
+    import_parser.add_argument("--keep-ids", action="store_true", help="insert the id column of the input too")
+    import_parser.add_argument("--strict", action="store_true", help="abort on the first invalid row")
+    export_parser = subparsers.add_parser("export", help="export all rows of a table")
+    export_parser.add_argument("table", choices=BULK_TABLES)
+    export_parser.add_argument("path", help="the file to write, - for stdout")
+    export_parser.add_argument("--format", choices=("csv", "jsonl", "json"), help="defaults to the file extension")
+    args = parser.parse_args()
+
+    file_format = detect_format(args.path, args.format)
+    start = time.perf_counter()
+    if args.command == "import":
+        source, close = _open(args.path, "r")
+        try:
+            result = import_rows(
+                args.db, args.table, read_rows(source, file_format), args.chunk_size, args.keep_ids, args.strict
+            )
+        except ValidationError as e:
+            parser.exit(1, f"{args.table}: import aborted at {e}, the chunks before it were imported\n")
+        finally:
+            if close:
+                source.close()
+        print(
+            f"{args.table}: {result['imported']} rows imported, {result['skipped']} skipped, "
+            f"{result['rejected']} rejected in {time.perf_counter() - start:.1f} s",
+            file=sys.stderr,
+        )
+        for row_number, error in result["errors"]:
+            print(f"  row {row_number}: {error}", file=sys.stderr)
+        if result["rejected"]:
+            sys.exit(1)
+    else:
+        target, close = _open(args.path, "w")
+        try:
+            exported = export_rows(args.db, args.table, target, file_format, args.chunk_size)
+        finally:
+            target.flush()
+            if close:
+                target.close()
+        print(f"{args.table}: {exported} rows exported in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+
+class DataChangeBroker:
+    """Tells waiting threads, e.g. the event streams of open dashboards, about writes committed in this process.
+
+    Writes publish the new data versions of the tables they changed once their transaction is committed.
+    Waiting threads sleep until something is published, so open dashboards cost nothing while no data changes.
+    Writes of other processes, e.g. the bulk import, are picked up by sync at most once per max_age.
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, Dict[str, int]] = {}
+        self._sequence = 0
+        self._last_sync: Dict[str, float] = {}
+        self._condition = threading.Condition()
+
+    def publish(self, db_path: str, versions: Dict[str, int]) -> None:
+        """Records the data versions of committed writes and wakes up all waiting threads if one of them is new.
+
+        Args:
+            db_path (str): The path to the SQLite3 database file that was written to.
+            versions (dict): The data version of each table that was written to.
+        """
+        with self._condition:
+            current = self._versions.setdefault(db_path, {})
+            # versions only grow, a late publish of an older commit must not go back
+            changed = {table: version for table, version in versions.items() if version > current.get(table, 0)}
+            if not changed:
+                return
+            current.update(changed)
+            self._sequence += 1
+            self._condition.notify_all()
+
+    def versions(self, db_path: str) -> Tuple[int, Dict[str, int]]:
+        """Returns the sequence number of the last publish, to wait for the next one, and the known data versions.
+
+        Args:
+            db_path (str): The path to the SQLite3 database file.
+
+        Returns:
+            tuple: The sequence number and the data version of each table written to since the process started.
+        """
+        with self._condition:
+            return self._sequence, dict(self._versions.get(db_path, {}))
+
+    def wait(self, db_path: str, sequence: int, timeout: Optional[float] = None) -> Tuple[int, Dict[str, int]]:
+        """Blocks until something is published after the given sequence number, or until the timeout passed.
+
+        Args:
+            db_path (str): The path to the SQLite3 database file.
+            sequence (int): The sequence number returned by the previous call, or by versions.
+            timeout (float, optional): The maximum number of seconds to wait.
+
+        Returns:
+            tuple: As returned by versions. The sequence number is unchanged if the wait timed out.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._sequence != sequence, timeout)
+            return self._sequence, dict(self._versions.get(db_path, {}))
+
+    def sync(self, db_path: str, read_versions: Callable[[], Dict[str, int]], max_age: float) -> None:
+        """Publishes the data versions stored in the database, unless another thread did so within max_age seconds.
+
+        Args:
+            db_path (str): The path to the SQLite3 database file.
+            read_versions (Callable): Reads the data version of each table from the database.
+            max_age (float): The minimum number of seconds between two reads of the database.
+        """
+        now = time.monotonic()
+        with self._condition:
+            if now - self._last_sync.get(db_path, float("-inf")) < max_age:
+                return
+            self._last_sync[db_path] = now
+        self.publish(db_path, read_versions())
+
+
+data_changes = DataChangeBroker()
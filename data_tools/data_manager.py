@@ -1,7 +1,184 @@
 import pandas as pd
 import sqlite3
-from typing import Dict
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from data_tools.aggregation_queries import build_cycling_query, build_nutrition_query
+from data_tools.change_events import data_changes
+from data_tools.data_processing import normalize_timestamp
+from data_tools.migrations import DATA_VERSION_TABLE, FOOD_LOOKUP_JOBS_TABLE, LATEST_VERSION, apply_migrations
+from data_tools.rollups import bulk_insert
+from data_tools.snapshots import get_table_snapshot
 from decorators import log_execution_time
+from instrumentation import DB_ROWS_READ
+
+# inserts of at least this many rows suspend the per-row triggers of the daily summaries
+BULK_INSERT_ROWS = 1000
+
+
+class SQLiteConnectionManager:
+    """A process-wide pool of reusable SQLite3 connections shared by all readers and writers.
+
+    A connection is checked out by exactly one thread at a time and handed back to the pool afterwards,
+    so the Flask request threads (one per request with the development server) reuse the same
+    connections instead of opening and tuning a new one for every query.
+
+    Args:
+        max_idle (int): The maximum number of idle connections kept per database file.
+        busy_timeout_ms (int): How long a connection waits on a locked database before giving up.
+        cache_size_kib (int): The page cache size per connection in KiB.
+        mmap_size (int): The number of bytes of the database file to memory-map.
+    """
+
+    def __init__(
+        self,
+        max_idle: int = 8,
+        busy_timeout_ms: int = 5000,
+        cache_size_kib: int = 16384,
+        mmap_size: int = 256 * 1024 * 1024,
+    ):
+        self.max_idle = max_idle
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self._idle: Dict[str, List[sqlite3.Connection]] = {}
+        # the data versions bumped by the running transaction of each connection, published once it is committed
+        self._uncommitted: Dict[int, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _connect(self, db_path: str) -> sqlite3.Connection:
+        """Opens a new connection and applies the WAL and cache settings.
+
+        Args:
+            db_path (str): The path to the SQLite3 database file.
+
+        Returns:
+            sqlite3.Connection: The tuned connection.
+        """
+        conn = sqlite3.connect(
+            db_path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False
+        )
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kib)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        return conn
+
+    def _release(self, db_path: str, conn: sqlite3.Connection) -> None:
+        """Hands a connection back to the pool, or closes it if the pool is full.
+
+        Args:
+            db_path (str): The path to the SQLite3 database file.
+            conn (sqlite3.Connection): The connection to release.
+        """
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            idle = self._idle.setdefault(db_path, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self, db_path: str) -> Iterator[sqlite3.Connection]:
+        """Checks out a connection for the calling thread. Uncommitted work is rolled back on release.
+
+        Args:
+            db_path (str): The path to the SQLite3 database file.
+
+        Yields:
+            sqlite3.Connection: A connection nobody else uses until it is released.
+        """
+        with self._lock:
+            idle = self._idle.get(db_path)
+            conn = idle.pop() if idle else None
+        if conn is None:
+            conn = self._connect(db_path)
+        try:
+            yield conn
+        finally:
+            self._release(db_path, conn)
+
+    @contextmanager
+    def transaction(self, db_path: str) -> Iterator[sqlite3.Cursor]:
+        """Checks out a connection and commits everything executed on the yielded cursor, or rolls it back on error.
+        The data versions bumped in the transaction are published to data_changes after the commit.
+
+        Args:
+            db_path (str): The path to the SQLite3 database file.
+
+        Yields:
+            sqlite3.Cursor: The cursor to run the statements of the transaction with.
+        """
+        with self.connection(db_path) as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+                conn.commit()
+            finally:
+                versions = self._uncommitted.pop(id(conn), None)
+        if versions:
+            data_changes.publish(db_path, versions)
+
+    def record_version(self, conn: sqlite3.Connection, table_name: str, version: int) -> None:
+        """Remembers a data version bumped in the running transaction of a connection, to publish it after the commit.
+
+        Args:
+            conn (sqlite3.Connection): The connection running the transaction.
+            table_name (str): The name of the table that was written to.
+            version (int): Its new data version.
+        """
+        self._uncommitted.setdefault(id(conn), {})[table_name] = version
+
+    def close_all(self) -> None:
+        """Closes all idle connections, e.g. before the database file is replaced."""
+        with self._lock:
+            idle_connections = [conn for idle in self._idle.values() for conn in idle]
+            self._idle.clear()
+        for conn in idle_connections:
+            conn.close()
+
+
+connection_manager = SQLiteConnectionManager()
+
+_migrated_databases = set()
+_migration_lock = threading.Lock()
+
+
+def ensure_schema(db_path: str) -> None:
+    """Makes sure the database is migrated to the latest schema version, once per process and database file.
+
+    Args:
+        db_path (str): The path to the SQLite3 database file.
+    """
+    if db_path in _migrated_databases:
+        return
+    with _migration_lock:
+        if db_path in _migrated_databases:
+            return
+        with connection_manager.connection(db_path) as conn:
+            if apply_migrations(conn) >= LATEST_VERSION:
+                _migrated_databases.add(db_path)
+
+
+def bump_data_version(cursor: sqlite3.Cursor, table_name: str) -> None:
+    """Increments the change counter of the given table. Must run inside the transaction of the write it belongs to.
+    Writes that bypass the SQLite3Writer have to call it too, otherwise the dashboard does not notice them.
+    Inside connection_manager.transaction the open dashboards are told right after the commit, otherwise on their next sync.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor of the running write transaction.
+        table_name (str): The name of the table that was written to.
+    """
+    version = cursor.execute(
+        f"INSERT INTO {DATA_VERSION_TABLE} (table_name, version) VALUES (?, 1) "
+        "ON CONFLICT(table_name) DO UPDATE SET version = version + 1 RETURNING version",
+        (table_name,),
+    ).fetchone()[0]
+    connection_manager.record_version(cursor.connection, table_name, version)
+
 
 class _SQLite3Reader:
     """A private class to read data from an SQLite3 database.
@@ -13,21 +190,100 @@ class _SQLite3Reader:
     def __init__(self, db_path: str):
         self.db_path = db_path
 
-    def read_data(self, query: str):
+    def read_data(self, query: str, params: Tuple = ()):
         """Reads data from the database using a custom SQL query.
 
         Args:
             query (str): The SQL query to execute.
+            params (tuple, optional): The parameters to bind to the query.
 
         Returns:
             pd.DataFrame: The result of the query as a DataFrame.
         """
-        conn = sqlite3.connect(self.db_path)
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        with connection_manager.connection(self.db_path) as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        DB_ROWS_READ.observe(len(df), method="read_data")
         return df
 
-    def read_single_data(self, id: int, table: str):
+    def read_rows(self, query: str, params: Tuple = ()) -> List[Tuple]:
+        """Reads plain rows from the database without building a DataFrame.
+
+        Args:
+            query (str): The SQL query to execute.
+            params (tuple, optional): The parameters to bind to the query.
+
+        Returns:
+            list: The result rows as tuples.
+        """
+        with connection_manager.connection(self.db_path) as conn:
+            rows = conn.execute(query, params).fetchall()
+        DB_ROWS_READ.observe(len(rows), method="read_rows")
+        return rows
+
+    def read_records(self, query: str, params: Tuple = ()) -> List[sqlite3.Row]:
+        """Reads rows as records that can be accessed by column name, for routes that show single entries or a page of them.
+        Building a DataFrame costs far more than the query itself for a handful of rows, so DataFrames are left to the analytics.
+
+        Args:
+            query (str): The SQL query to execute.
+            params (tuple, optional): The parameters to bind to the query.
+
+        Returns:
+            list: The result rows as sqlite3.Row records, e.g. row["name"] or dict(row).
+        """
+        with connection_manager.connection(self.db_path) as conn:
+            # set on the cursor only, the pooled connection keeps returning tuples
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            rows = cursor.execute(query, params).fetchall()
+        DB_ROWS_READ.observe(len(rows), method="read_records")
+        return rows
+
+    def read_page(
+        self,
+        table: str,
+        sort_column: str,
+        conditions: Sequence[str] = (),
+        params: Sequence = (),
+        limit: int = 50,
+        ascending: bool = False,
+        after: Optional[Tuple[str, int]] = None,
+        before: Optional[Tuple[str, int]] = None,
+    ) -> List[sqlite3.Row]:
+        """Reads one page of a table ordered by (sort_column, id) using keyset pagination.
+        Instead of an OFFSET, the page continues from the key of a row already shown, so reading a page deep in the history costs as much as reading the first one.
+
+        Args:
+            table (str): The name of the table to read from.
+            sort_column (str): The indexed column to order by.
+            conditions (list, optional): SQL conditions that all rows must meet, e.g. "date >= ?".
+            params (list, optional): The parameters to bind to the conditions.
+            limit (int): The maximum number of rows to read.
+            ascending (bool): Whether the page is ordered oldest first instead of newest first.
+            after (tuple, optional): The (sort value, id) of the last row of the previous page, to read the rows following it.
+            before (tuple, optional): The (sort value, id) of the first row of the next page, to read the rows preceding it.
+
+        Returns:
+            list: The rows of the page as sqlite3.Row records, in display order.
+        """
+        conditions = list(conditions)
+        params = list(params)
+        if after is not None:
+            conditions.append(f"({sort_column}, id) {'>' if ascending else '<'} (?, ?)")
+            params.extend(after)
+        if before is not None:
+            conditions.append(f"({sort_column}, id) {'<' if ascending else '>'} (?, ?)")
+            params.extend(before)
+        # the rows preceding a key are read backwards from it and reversed afterwards
+        order = "ASC" if ascending != (before is not None) else "DESC"
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"SELECT * FROM {table} {where} ORDER BY {sort_column} {order}, id {order} LIMIT ?"
+        rows = self.read_records(query, tuple(params) + (limit,))
+        if before is not None:
+            rows.reverse()
+        return rows
+
+    def read_single_data(self, id: int, table: str) -> Optional[sqlite3.Row]:
         """Reads a single row from the specified table using the given ID.
 
         Args:
@@ -35,13 +291,10 @@ class _SQLite3Reader:
             table (str): The name of the table to read from.
 
         Returns:
-            pd.DataFrame: The result of the query as a DataFrame.
+            sqlite3.Row: The row as a record, or None if there is no row with this ID.
         """
-        conn = sqlite3.connect(self.db_path)
-        query = f"SELECT * FROM {table} WHERE id = {id} LIMIT 1"
-        df = pd.read_sql(query, conn)
-        conn.close()
-        return df
+        rows = self.read_records(f"SELECT * FROM {table} WHERE id = ? LIMIT 1", (id,))
+        return rows[0] if rows else None
 
 
 class DataReaderInterface:
@@ -63,22 +316,136 @@ class DataReaderInterface:
         """
         pass
 
-    def read_single_bodyweight_entry(self, id: int) -> pd.DataFrame:
+    def read_food_eaten_page(
+        self,
+        limit: int = 50,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        search: Optional[str] = None,
+        ascending: bool = False,
+        after: Optional[Tuple[str, int]] = None,
+        before: Optional[Tuple[str, int]] = None,
+    ) -> List[sqlite3.Row]:
+        """Reads one page of food eaten entries ordered by timestamp.
+
+        Args:
+            limit (int): The maximum number of entries to read.
+            start_date (str, optional): The first day to include, as "YYYY-MM-DD".
+            end_date (str, optional): The last day to include, as "YYYY-MM-DD".
+            search (str, optional): A part of the food name to search for, case-insensitive.
+            ascending (bool): Whether the page is ordered oldest first instead of newest first.
+            after (tuple, optional): The (timestamp, id) of the last entry of the previous page.
+            before (tuple, optional): The (timestamp, id) of the first entry of the next page.
+
+        Returns:
+            list: The entries of the page as sqlite3.Row records, in display order.
+        """
+        pass
+
+    def read_bodyweight_page(
+        self,
+        limit: int = 50,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        ascending: bool = False,
+        after: Optional[Tuple[str, int]] = None,
+        before: Optional[Tuple[str, int]] = None,
+    ) -> List[sqlite3.Row]:
+        """Reads one page of bodyweight entries ordered by date.
+
+        Args:
+            limit (int): The maximum number of entries to read.
+            start_date (str, optional): The first day to include, as "YYYY-MM-DD".
+            end_date (str, optional): The last day to include, as "YYYY-MM-DD".
+            ascending (bool): Whether the page is ordered oldest first instead of newest first.
+            after (tuple, optional): The (date, id) of the last entry of the previous page.
+            before (tuple, optional): The (date, id) of the first entry of the next page.
+
+        Returns:
+            list: The entries of the page as sqlite3.Row records, in display order.
+        """
+        pass
+
+    def read_food_lookup_jobs(self, food_eaten_ids: Sequence[int]) -> Dict[int, sqlite3.Row]:
+        """Reads the unfinished background nutrition lookups of the given food eaten entries.
+
+        Args:
+            food_eaten_ids (list): The IDs of the food eaten entries, e.g. the ones shown on a page.
+
+        Returns:
+            dict: The pending, running or failed lookup job of each entry that has one, keyed on the food eaten ID.
+        """
+        pass
+
+    def read_single_bodyweight_entry(self, id: int) -> Optional[sqlite3.Row]:
         """Reads a single bodyweight entry.
 
         Args:
             id (int): The ID of the bodyweight entry to read.
 
         Returns:
-            pd.DataFrame: The bodyweight entry as a DataFrame.
+            sqlite3.Row: The bodyweight entry as a record, or None if it does not exist.
+        """
+        pass
+
+    def read_single_food_entry(self, id: int) -> Optional[sqlite3.Row]:
+        """Reads a single food eaten entry.
+
+        Args:
+            id (int): The ID of the food eaten entry to read.
+
+        Returns:
+            sqlite3.Row: The food eaten entry as a record, or None if it does not exist.
+        """
+        pass
+
+    def read_nutrition_by_time_frame(
+        self, start_date: Optional[str] = None, end_date: Optional[str] = None, time_frame: str = "daily"
+    ) -> pd.DataFrame:
+        """Reads the calories split by time of day and the grams of each macronutrient per day, week or month, with one query. The aggregation runs in the database.
+
+        Args:
+            start_date (str, optional): The first day to include, as "YYYY-MM-DD".
+            end_date (str, optional): The last day to include, as "YYYY-MM-DD".
+            time_frame (str): The time frame to group by, being "daily", "weekly" or "monthly". Weekly and monthly calories are averaged over the days with data.
+
+        Returns:
+            pd.DataFrame: One row per period start, with one calories column per time-of-day category ("2-12", "12-17", "17-22", "22-2") and the summed up columns carbs, fats and proteins.
+        """
+        pass
+
+    def read_cycling_by_time_frame(
+        self, start_date: Optional[str] = None, end_date: Optional[str] = None, time_frame: str = "daily"
+    ) -> pd.DataFrame:
+        """Reads the cycling duration per day, or the mean duration of a session per week or month. The aggregation runs in the database.
+
+        Args:
+            start_date (str, optional): The first day to include, as "YYYY-MM-DD".
+            end_date (str, optional): The last day to include, as "YYYY-MM-DD".
+            time_frame (str): The time frame to group by, being "daily", "weekly" or "monthly".
+
+        Returns:
+            pd.DataFrame: One row per period start with the columns date, duration and sessions.
+        """
+        pass
+
+    def read_table_snapshot(self, table_name: str) -> pd.DataFrame:
+        """Reads a whole table for analytics, typed and without parsing the rows again on every call.
+
+        Args:
+            table_name (str): The table to read, being "bodyweight".
+
+        Returns:
+            pd.DataFrame: The rows newest first, with the timestamp or date as datetime64, categorical names and float64 values.
+                The frame is shared with later reads, so values must not be modified in place.
         """
         pass
 
-    def read_daily_macros(self) -> pd.DataFrame:
-        """Reads the daily sum of grams for each macronutritient (fats, carbohydrates, proteins).
-        
+    def read_data_versions(self) -> Dict[str, int]:
+        """Reads the change counter of every table that has been written to through the SQLite3Writer.
+
         Returns:
-        pd.DataFrame: The sum of daily macronutritients.
+            dict: A mapping of table name to its current version.
         """
         pass
 
@@ -91,6 +458,7 @@ class DataReader(DataReaderInterface):
     """
 
     def __init__(self, db_name: str):
+        ensure_schema(db_name)
         self.sql_reader = _SQLite3Reader(db_name)
 
     @log_execution_time
@@ -104,29 +472,108 @@ class DataReader(DataReaderInterface):
         return self.sql_reader.read_data(query)
 
     @log_execution_time
-    def read_single_bodyweight_entry(self, id: int) -> pd.DataFrame:
-        return self.sql_reader.read_single_data(id=id, table="bodyweight")
+    def read_food_eaten_page(
+        self,
+        limit: int = 50,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        search: Optional[str] = None,
+        ascending: bool = False,
+        after: Optional[Tuple[str, int]] = None,
+        before: Optional[Tuple[str, int]] = None,
+    ) -> List[sqlite3.Row]:
+        conditions, params = [], []
+        if start_date:
+            conditions.append("timestamp >= ?")
+            params.append(start_date[:10])
+        if end_date:
+            conditions.append("timestamp < date(?, '+1 day')")
+            params.append(end_date[:10])
+        if search:
+            escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            conditions.append("name LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        return self.sql_reader.read_page(
+            "food_eaten", "timestamp", conditions, params, limit, ascending, after, before
+        )
 
     @log_execution_time
-    def read_single_food_entry(self, id: int) -> pd.DataFrame:
-        return self.sql_reader.read_single_data(id=id, table="food_eaten")
+    def read_bodyweight_page(
+        self,
+        limit: int = 50,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        ascending: bool = False,
+        after: Optional[Tuple[str, int]] = None,
+        before: Optional[Tuple[str, int]] = None,
+    ) -> List[sqlite3.Row]:
+        conditions, params = [], []
+        if start_date:
+            conditions.append("date >= ?")
+            params.append(start_date[:10])
+        if end_date:
+            conditions.append("date <= ?")
+            params.append(end_date[:10])
+        return self.sql_reader.read_page(
+            "bodyweight", "date", conditions, params, limit, ascending, after, before
+        )
 
     @log_execution_time
-    def read_daily_macros(self):
-        query = """SELECT
-            date(timestamp, '-2 hours') as date,
-            SUM(carbohydrates_total_g) as carbs,
-            SUM(fat_total_g) as fats,
-            SUM(protein_g) as proteins
-            FROM food_eaten
-            GROUP BY date(timestamp)"""
-        return self.sql_reader.read_data(query)
+    def read_food_lookup_jobs(self, food_eaten_ids: Sequence[int]) -> Dict[int, sqlite3.Row]:
+        if not food_eaten_ids:
+            return {}
+        placeholders = ", ".join(["?"] * len(food_eaten_ids))
+        query = f"SELECT * FROM {FOOD_LOOKUP_JOBS_TABLE} WHERE food_eaten_id IN ({placeholders}) AND status != 'done'"
+        return {row["food_eaten_id"]: row for row in self.sql_reader.read_records(query, tuple(food_eaten_ids))}
+
+    @log_execution_time
+    def read_single_bodyweight_entry(self, id: int) -> Optional[sqlite3.Row]:
+        return self.sql_reader.read_single_data(id=id, table="bodyweight")
+
+    @log_execution_time
+    def read_single_food_entry(self, id: int) -> Optional[sqlite3.Row]:
+        return self.sql_reader.read_single_data(id=id, table="food_eaten")
 
     @log_execution_time
     def read_cycling_data(self) -> pd.DataFrame:
         query = "SELECT * FROM cycling_data ORDER BY timestamp DESC"
         return self.sql_reader.read_data(query)
 
+    @log_execution_time
+    def read_nutrition_by_time_frame(
+        self, start_date: Optional[str] = None, end_date: Optional[str] = None, time_frame: str = "daily"
+    ) -> pd.DataFrame:
+        query, params = build_nutrition_query(start_date, end_date, time_frame)
+        df = self.sql_reader.read_data(query, tuple(params))
+        df["date"] = pd.to_datetime(df["date"])
+        return df.set_index("date")
+
+    @log_execution_time
+    def read_cycling_by_time_frame(
+        self, start_date: Optional[str] = None, end_date: Optional[str] = None, time_frame: str = "daily"
+    ) -> pd.DataFrame:
+        query, params = build_cycling_query(start_date, end_date, time_frame)
+        df = self.sql_reader.read_data(query, tuple(params))
+        df["date"] = pd.to_datetime(df["date"])
+        if time_frame in ("weekly", "monthly"):
+            df["duration"] = df["duration"] / df["sessions"]
+        return df[["date", "duration", "sessions"]]
+
+    @log_execution_time
+    def read_table_snapshot(self, table_name: str) -> pd.DataFrame:
+        snapshot = get_table_snapshot(self.sql_reader.db_path, table_name)
+        with connection_manager.connection(self.sql_reader.db_path) as conn:
+            return snapshot.read(conn)
+
+    def read_data_versions(self) -> Dict[str, int]:
+        query = f"SELECT table_name, version FROM {DATA_VERSION_TABLE}"
+        try:
+            rows = self.sql_reader.read_rows(query)
+        except sqlite3.OperationalError:
+            # nothing has been written through the SQLite3Writer yet
+            return {}
+        return {table_name: version for table_name, version in rows}
+
 
 class SQLite3Writer:
     """A class to write data to an SQLite3 database.
@@ -136,8 +583,16 @@ class SQLite3Writer:
     """
 
     def __init__(self, db_path: str):
+        ensure_schema(db_path)
         self.db_path = db_path
 
+    @staticmethod
+    def _normalize(data: Dict[str, any]) -> Dict[str, any]:
+        """Brings a timestamp in the data into the sortable form all stored timestamps share."""
+        if data.get("timestamp"):
+            data = {**data, "timestamp": normalize_timestamp(data["timestamp"])}
+        return data
+
     @log_execution_time
     def create_data(self, table_name: str, data: Dict[str, any]) -> None:
         """Inserts a new row into the specified table.
@@ -149,14 +604,41 @@ class SQLite3Writer:
         Returns:
             None
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        data = self._normalize(data)
         columns = ", ".join(data.keys())
         placeholders = ", ".join(["?"] * len(data))
         query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
-        cursor.execute(query, tuple(data.values()))
-        conn.commit()
-        conn.close()
+        with connection_manager.transaction(self.db_path) as cursor:
+            cursor.execute(query, tuple(data.values()))
+            bump_data_version(cursor, table_name)
+
+    @log_execution_time
+    def create_many_data(self, table_name: str, rows: List[Dict[str, any]]) -> None:
+        """Inserts several rows into the specified table in a single transaction.
+
+        Args:
+            table_name (str): The name of the table to insert into.
+            rows (list): The dictionaries containing the data to insert. Columns missing in a row are inserted as NULL.
+                From BULK_INSERT_ROWS rows without ids on, the daily summaries are updated once instead of per row.
+
+        Returns:
+            None
+        """
+        if not rows:
+            return
+        rows = [self._normalize(data) for data in rows]
+        column_names = list(dict.fromkeys(column for data in rows for column in data))
+        columns = ", ".join(column_names)
+        placeholders = ", ".join(["?"] * len(column_names))
+        query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
+        values = [tuple(data.get(column) for column in column_names) for data in rows]
+        with connection_manager.transaction(self.db_path) as cursor:
+            if len(rows) >= BULK_INSERT_ROWS and "id" not in column_names:
+                with bulk_insert(cursor, table_name):
+                    cursor.executemany(query, values)
+            else:
+                cursor.executemany(query, values)
+            bump_data_version(cursor, table_name)
 
     @log_execution_time
     def update_data(self, table_name: str, data: Dict[str, any], row_id: int) -> None:
@@ -170,15 +652,14 @@ class SQLite3Writer:
         Returns:
             None
         """
+        data = self._normalize(data)
         set_assignments = [f"{column} = ?" for column in data.keys()]
         set_clause = ", ".join(set_assignments)
         query = f"UPDATE {table_name} SET {set_clause} WHERE id = ?"
         values = list(data.values()) + [row_id]
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(query, values)
-        conn.commit()
-        conn.close()
+        with connection_manager.transaction(self.db_path) as cursor:
+            cursor.execute(query, values)
+            bump_data_version(cursor, table_name)
 
     @log_execution_time
     def delete_data(self, table_name: str, row_id: int) -> None:
@@ -191,9 +672,7 @@ class SQLite3Writer:
         Returns:
             None
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         query = f"DELETE FROM {table_name} WHERE id = ?"
-        cursor.execute(query, (row_id,))
-        conn.commit()
-        conn.close()
+        with connection_manager.transaction(self.db_path) as cursor:
+            cursor.execute(query, (row_id,))
+            bump_data_version(cursor, table_name)
@@ -1,9 +1,12 @@
 from datetime import datetime
 import pandas as pd
 import pytz
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 from decorators import log_execution_time
 
+TIME_OF_DAY_CATEGORIES = ["2-12", "12-17", "17-22", "22-2"]
+NORMALIZED_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
 
 @log_execution_time
 def process_nutrition_data(
@@ -34,6 +37,52 @@ def process_nutrition_data(
     return data
 
 
+def parse_meal_items(meal_items: str) -> List[Tuple[str, float]]:
+    """Parses the foods of a meal entered as one "food item, weight in grams" pair per line.
+
+    Args:
+        meal_items (str): The text entered in the meal form.
+
+    Returns:
+        list: The (food item, weight) pairs. Empty lines and lines without a valid weight are skipped.
+    """
+    parsed = []
+    for line in meal_items.splitlines():
+        food_item, _, weight = line.rpartition(",")
+        try:
+            weight = float(weight)
+        except ValueError:
+            continue
+        if food_item.strip() and weight > 0:
+            parsed.append((food_item.strip(), weight))
+    return parsed
+
+
+def normalize_timestamp(timestamp: str) -> str:
+    """Converts a timestamp string into the fixed-width form "YYYY-MM-DDTHH:MM:SS" used in the database, like SQLite's strftime does.
+
+    Args:
+        timestamp (str): The timestamp to normalize, e.g. "2023-08-26T12:30" from a form or an ISO string with UTC offset.
+
+    Returns:
+        str: The normalized timestamp. Values with a UTC offset are converted to UTC, unparsable values are returned unchanged.
+    """
+    try:
+        # ISO strings, by far the most common input, parse much faster without pandas, which matters for bulk imports
+        parsed = datetime.fromisoformat(timestamp)
+    except (ValueError, TypeError):
+        try:
+            parsed = pd.Timestamp(timestamp)
+        except (ValueError, TypeError):
+            return timestamp
+        if parsed is pd.NaT:
+            return timestamp
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(pytz.utc).replace(tzinfo=None)
+    # the same as strftime(NORMALIZED_TIMESTAMP_FORMAT), several times faster
+    return parsed.isoformat(timespec="seconds")
+
+
 def time_of_day(t: datetime) -> str:
     """Categorizes the given time into a time-of-day category.
     Attention: The timeframe from 00:00-02:00 still counts as the previous day to align the definiton of a day with my sleeping/eating patterns.
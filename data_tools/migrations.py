@@ -0,0 +1,382 @@
+import argparse
+import sqlite3
+from typing import Callable, Dict, List, Tuple
+
+from data_tools.data_processing import NORMALIZED_TIMESTAMP_FORMAT
+from data_tools.rollups import create_rollup_tables, recreate_rollup
+
+DATA_VERSION_TABLE = "data_versions"
+CHANGE_LOG_TABLE = "food_eaten_changes"
+# the log of inserted, updated and deleted rows of each data table, dropped again for tables not read as snapshots
+CHANGE_LOG_TABLES = {
+    "food_eaten": CHANGE_LOG_TABLE,
+    "bodyweight": "bodyweight_changes",
+    "cycling_data": "cycling_data_changes",
+}
+FOOD_LOOKUP_JOBS_TABLE = "food_lookup_jobs"
+
+TABLE_SCHEMAS: Dict[str, Dict[str, str]] = {
+    "bodyweight": {
+        "id": "INTEGER PRIMARY KEY",
+        "date": "TEXT",
+        "bodyweight": "REAL",
+    },
+    "food_eaten": {
+        "id": "INTEGER PRIMARY KEY",
+        "timestamp": "TEXT",
+        "name": "TEXT",
+        "calories": "REAL",
+        "serving_size_g": "REAL",
+        "fat_total_g": "REAL",
+        "fat_saturated_g": "REAL",
+        "protein_g": "REAL",
+        "sodium_mg": "REAL",
+        "potassium_mg": "REAL",
+        "cholesterol_mg": "REAL",
+        "carbohydrates_total_g": "REAL",
+        "fiber_g": "REAL",
+        "sugar_g": "REAL",
+    },
+    "cycling_data": {
+        "id": "INTEGER PRIMARY KEY",
+        "timestamp": "TEXT",
+        "calories": "INTEGER",
+        "duration": "INTEGER",
+        "name_of_session": "TEXT",
+    },
+}
+
+
+def _has_integer_primary_key(cursor: sqlite3.Cursor, table_name: str) -> bool:
+    columns = cursor.execute(f"PRAGMA table_info({table_name})").fetchall()
+    return any(
+        name == "id" and col_type.upper() == "INTEGER" and pk == 1
+        for _, name, col_type, _, _, pk in columns
+    )
+
+
+def create_tables(cursor: sqlite3.Cursor) -> None:
+    """Creates the data tables with an INTEGER PRIMARY KEY id. Existing tables without one are rebuilt, keeping their rows and ids.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor of the running migration.
+    """
+    for table_name, columns in TABLE_SCHEMAS.items():
+        columns_definition = ", ".join(f"{col_name} {col_type}" for col_name, col_type in columns.items())
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+        ).fetchone()
+        if not exists:
+            cursor.execute(f"CREATE TABLE {table_name} ({columns_definition})")
+            continue
+        if _has_integer_primary_key(cursor, table_name):
+            continue
+        old_columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table_name})").fetchall()]
+        copied = [col_name for col_name in columns if col_name in old_columns and col_name != "id"]
+        # tables created without an id column use the implicit rowid the routes relied on
+        id_source = "id" if "id" in old_columns else "rowid"
+        cursor.execute(f"ALTER TABLE {table_name} RENAME TO {table_name}_old")
+        cursor.execute(f"CREATE TABLE {table_name} ({columns_definition})")
+        cursor.execute(
+            f"INSERT INTO {table_name} (id, {', '.join(copied)}) "
+            f"SELECT {id_source}, {', '.join(copied)} FROM {table_name}_old"
+        )
+        cursor.execute(f"DROP TABLE {table_name}_old")
+
+
+def create_indexes(cursor: sqlite3.Cursor) -> None:
+    """Creates the indexes used by the ordered and date-filtered reads.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor of the running migration.
+    """
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_food_eaten_timestamp ON food_eaten (timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bodyweight_date ON bodyweight (date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cycling_data_timestamp ON cycling_data (timestamp)")
+
+
+def normalize_timestamps(cursor: sqlite3.Cursor) -> None:
+    """Rewrites all timestamps to the fixed-width form "YYYY-MM-DDTHH:MM:SS", so they sort and range-compare as text.
+
+    Values with a UTC offset are converted to UTC, values that SQLite cannot parse are left untouched.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor of the running migration.
+    """
+    normalized = f"strftime('{NORMALIZED_TIMESTAMP_FORMAT}', timestamp)"
+    for table_name in ("food_eaten", "cycling_data"):
+        cursor.execute(
+            f"UPDATE {table_name} SET timestamp = {normalized} "
+            f"WHERE {normalized} IS NOT NULL AND timestamp != {normalized}"
+        )
+
+
+def create_data_version_table(cursor: sqlite3.Cursor) -> None:
+    """Creates the table holding one change counter per data table, if it does not exist yet.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor to execute the statement with.
+    """
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {DATA_VERSION_TABLE} "
+        "(table_name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)"
+    )
+
+
+def create_change_log(cursor: sqlite3.Cursor, table_name: str) -> None:
+    """Creates the change log of a table and the triggers filling it, if they do not exist yet.
+
+    Updates and deletes record the id of the affected row, no matter if they are made through the SQLite3Writer
+    or any other client. Inserts are logged since schema version 7, see create_insert_change_logs.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor to execute the statements with.
+        table_name (str): The logged table, one of CHANGE_LOG_TABLES.
+    """
+    log_table = CHANGE_LOG_TABLES[table_name]
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {log_table} "
+        "(seq INTEGER PRIMARY KEY AUTOINCREMENT, row_id INTEGER NOT NULL, operation TEXT NOT NULL)"
+    )
+    cursor.execute(
+        f"""CREATE TRIGGER IF NOT EXISTS {table_name}_log_update AFTER UPDATE ON {table_name}
+        BEGIN
+            INSERT INTO {log_table} (row_id, operation) VALUES (OLD.id, 'update');
+        END"""
+    )
+    cursor.execute(
+        f"""CREATE TRIGGER IF NOT EXISTS {table_name}_log_delete AFTER DELETE ON {table_name}
+        BEGIN
+            INSERT INTO {log_table} (row_id, operation) VALUES (OLD.id, 'delete');
+        END"""
+    )
+
+
+def create_food_eaten_change_log(cursor: sqlite3.Cursor) -> None:
+    """Creates the change log of the food_eaten table, see create_change_log.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor to execute the statements with.
+    """
+    create_change_log(cursor, "food_eaten")
+
+
+def create_remaining_change_logs(cursor: sqlite3.Cursor) -> None:
+    """Creates the change logs of the bodyweight and cycling_data tables, see create_change_log.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor to execute the statements with.
+    """
+    create_change_log(cursor, "bodyweight")
+    create_change_log(cursor, "cycling_data")
+
+
+def create_insert_change_logs(cursor: sqlite3.Cursor) -> None:
+    """Logs the inserts into all change logged tables as well.
+
+    The ids are INTEGER PRIMARY KEY without AUTOINCREMENT, so SQLite hands out the largest id again once its row is
+    deleted, and imports may keep ids below the largest one. Such rows cannot be found as new by their id alone.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor of the running migration.
+    """
+    for table_name, log_table in CHANGE_LOG_TABLES.items():
+        cursor.execute(
+            f"""CREATE TRIGGER IF NOT EXISTS {table_name}_log_insert AFTER INSERT ON {table_name}
+            BEGIN
+                INSERT INTO {log_table} (row_id, operation) VALUES (NEW.id, 'insert');
+            END"""
+        )
+
+
+def create_derived_tables(cursor: sqlite3.Cursor) -> None:
+    """Creates the data versions, the food_eaten change log and the daily rollups.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor of the running migration.
+    """
+    create_data_version_table(cursor)
+    create_food_eaten_change_log(cursor)
+    create_rollup_tables(cursor)
+
+
+def create_food_lookup_jobs_table(cursor: sqlite3.Cursor) -> None:
+    """Creates the table of the background nutrition lookups, one job per food eaten entry waiting for its values.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor of the running migration.
+    """
+    cursor.execute(
+        f"""CREATE TABLE IF NOT EXISTS {FOOD_LOOKUP_JOBS_TABLE} (
+            id INTEGER PRIMARY KEY,
+            food_eaten_id INTEGER NOT NULL,
+            food_item TEXT NOT NULL,
+            weight REAL NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            next_attempt_at REAL NOT NULL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )"""
+    )
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{FOOD_LOOKUP_JOBS_TABLE}_due ON {FOOD_LOOKUP_JOBS_TABLE} (status, next_attempt_at)"
+    )
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{FOOD_LOOKUP_JOBS_TABLE}_food_eaten_id ON {FOOD_LOOKUP_JOBS_TABLE} (food_eaten_id)"
+    )
+
+
+def key_daily_cycling_by_calendar_day(cursor: sqlite3.Cursor) -> None:
+    """Groups the daily_cycling rollup by the calendar day of the sessions, as the cycling charts did before the rollups.
+    Version 4 created it with the day of the nutrition charts, which counts 00:00-02:00 towards the previous day.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor of the running migration.
+    """
+    recreate_rollup(cursor, "daily_cycling")
+
+
+def create_food_lookup_job_triggers(cursor: sqlite3.Cursor) -> None:
+    """Ends the open lookup jobs of a food entry that is deleted or whose food or weight is edited, in the same transaction.
+
+    The lookup would otherwise overwrite the edit with the values of the food first entered, and a failed lookup
+    would keep offering a retry of the stale name. Edited entries have their jobs marked done, deleted ones lose them.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor of the running migration.
+    """
+    cursor.execute(
+        f"""CREATE TRIGGER IF NOT EXISTS food_eaten_end_lookup_on_update
+        AFTER UPDATE OF name, serving_size_g ON food_eaten
+        WHEN OLD.name IS NOT NEW.name OR OLD.serving_size_g IS NOT NEW.serving_size_g
+        BEGIN
+            UPDATE {FOOD_LOOKUP_JOBS_TABLE} SET status = 'done', last_error = NULL, updated_at = (julianday('now') - 2440587.5) * 86400.0
+            WHERE food_eaten_id = NEW.id AND status != 'done';
+        END"""
+    )
+    cursor.execute(
+        f"""CREATE TRIGGER IF NOT EXISTS food_eaten_end_lookup_on_delete AFTER DELETE ON food_eaten
+        BEGIN
+            DELETE FROM {FOOD_LOOKUP_JOBS_TABLE} WHERE food_eaten_id = OLD.id;
+        END"""
+    )
+
+
+def drop_change_log(cursor: sqlite3.Cursor, table_name: str) -> None:
+    """Drops the change log of a table and the triggers filling it, if they exist.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor to execute the statements with.
+        table_name (str): The logged table, one of CHANGE_LOG_TABLES.
+    """
+    for operation in ("insert", "update", "delete"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {table_name}_log_{operation}")
+    cursor.execute(f"DROP TABLE IF EXISTS {CHANGE_LOG_TABLES[table_name]}")
+
+
+def drop_food_eaten_change_log(cursor: sqlite3.Cursor) -> None:
+    """Drops the change log of the food_eaten table, see drop_change_log.
+    The dashboards aggregate food_eaten in SQL through the daily_nutrition rollup and never read a snapshot of it,
+    so nothing pruned the log and it grew with every food entry.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor of the running migration.
+    """
+    drop_change_log(cursor, "food_eaten")
+
+
+def drop_cycling_data_change_log(cursor: sqlite3.Cursor) -> None:
+    """Drops the change log of the cycling_data table, see drop_change_log.
+    The cycling charts are built from the daily_cycling rollup, only the bodyweight snapshot is read and prunes its log.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor of the running migration.
+    """
+    drop_change_log(cursor, "cycling_data")
+
+
+# (schema version, description, migration), never change or reorder released entries, only append new ones
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, "create tables with INTEGER PRIMARY KEY ids", create_tables),
+    (2, "index timestamps and dates", create_indexes),
+    (3, "normalize timestamps", normalize_timestamps),
+    (4, "create data versions, change log and daily rollups", create_derived_tables),
+    (5, "create background nutrition lookup jobs", create_food_lookup_jobs_table),
+    (6, "log changes of bodyweight and cycling data", create_remaining_change_logs),
+    (7, "log inserts, ids of deleted rows are used again", create_insert_change_logs),
+    (8, "group daily cycling by the calendar day", key_daily_cycling_by_calendar_day),
+    (9, "end the lookup jobs of edited and deleted food entries", create_food_lookup_job_triggers),
+    (10, "drop the food_eaten change log, no snapshot of it is read", drop_food_eaten_change_log),
+    (11, "drop the cycling_data change log, no snapshot of it is read", drop_cycling_data_change_log),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Reads the schema version recorded in the database file.
+
+    Args:
+        conn (sqlite3.Connection): The connection to the database.
+
+    Returns:
+        int: The version of the last applied migration, 0 for a database that was never migrated.
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(conn: sqlite3.Connection) -> int:
+    """Applies all migrations newer than the recorded schema version, each one in its own transaction.
+
+    Args:
+        conn (sqlite3.Connection): The connection to the database. It must not be inside a transaction.
+
+    Returns:
+        int: The schema version after migrating.
+    """
+    for version, _, migration in MIGRATIONS:
+        if get_schema_version(conn) >= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # another process may have migrated while we waited for the lock
+            if get_schema_version(conn) < version:
+                cursor = conn.cursor()
+                migration(cursor)
+                cursor.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return get_schema_version(conn)
+
+
+def migrate(db_path: str) -> int:
+    """Brings the database at the given path to the latest schema version.
+
+    Args:
+        db_path (str): The path to the SQLite3 database file.
+
+    Returns:
+        int: The schema version after migrating.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        return apply_migrations(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate a bodyweight.db to the latest schema version.")
+    parser.add_argument("db_path", nargs="?", default="data/bodyweight.db")
+    args = parser.parse_args()
+    conn = sqlite3.connect(args.db_path)
+    before = get_schema_version(conn)
+    conn.close()
+    after = migrate(args.db_path)
+    print(f"{args.db_path}: schema version {before} -> {after}")
+    for version, description, _ in MIGRATIONS:
+        print(f"  [{'x' if version <= after else ' '}] {version}: {description}")
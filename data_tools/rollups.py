@@ -0,0 +1,188 @@
+import sqlite3
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List
+
+from data_tools.aggregation_queries import calendar_day_expression, day_expression, time_of_day_expression
+
+
+class Rollup:
+    """Describes a per-day summary table that triggers keep in sync with its source table.
+
+    Args:
+        table (str): The name of the summary table.
+        source (str): The name of the table that is summarized.
+        keys (dict): The key columns of the summary table and the functions building their SQL expression from a timestamp column.
+        values (dict): The summed up columns of the summary table and the source column each one sums.
+        count_column (str): The column counting the source rows per key. Rows reaching zero are removed.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        source: str,
+        keys: Dict[str, Callable[[str], str]],
+        values: Dict[str, str],
+        count_column: str,
+    ):
+        self.table = table
+        self.source = source
+        self.keys = keys
+        self.values = values
+        self.count_column = count_column
+
+    def create_table_statement(self) -> str:
+        """Builds the statement creating the summary table."""
+        columns = [f"{key} TEXT NOT NULL" for key in self.keys]
+        columns += [f"{value} REAL NOT NULL DEFAULT 0" for value in self.values]
+        columns.append(f"{self.count_column} INTEGER NOT NULL DEFAULT 0")
+        return (
+            f"CREATE TABLE IF NOT EXISTS {self.table} ({', '.join(columns)}, "
+            f"PRIMARY KEY ({', '.join(self.keys)})) WITHOUT ROWID"
+        )
+
+    def _add_statement(self, row: str) -> str:
+        """Builds the statement adding one source row, referenced as NEW or OLD, to its summary row."""
+        timestamp = f"{row}.timestamp"
+        columns = list(self.keys) + list(self.values) + [self.count_column]
+        selected = [build(timestamp) for build in self.keys.values()]
+        selected += [f"COALESCE({row}.{source_column}, 0)" for source_column in self.values.values()]
+        selected.append("1")
+        updates = [f"{column} = {column} + excluded.{column}" for column in list(self.values) + [self.count_column]]
+        return f"""INSERT INTO {self.table} ({', '.join(columns)})
+            SELECT {', '.join(selected)} WHERE {day_expression(timestamp)} IS NOT NULL
+            ON CONFLICT ({', '.join(self.keys)}) DO UPDATE SET {', '.join(updates)};"""
+
+    def _remove_statements(self, row: str) -> str:
+        """Builds the statements subtracting one source row from its summary row and dropping emptied rows."""
+        timestamp = f"{row}.timestamp"
+        condition = " AND ".join(f"{key} = {build(timestamp)}" for key, build in self.keys.items())
+        updates = [f"{column} = {column} - COALESCE({row}.{source_column}, 0)" for column, source_column in self.values.items()]
+        updates.append(f"{self.count_column} = {self.count_column} - 1")
+        return f"""UPDATE {self.table} SET {', '.join(updates)} WHERE {condition};
+            DELETE FROM {self.table} WHERE {condition} AND {self.count_column} <= 0;"""
+
+    def create_trigger_statements(self) -> List[str]:
+        """Builds the statements creating the insert, update and delete triggers on the source table."""
+        return [
+            f"""CREATE TRIGGER IF NOT EXISTS {self.table}_on_insert AFTER INSERT ON {self.source}
+            BEGIN
+                {self._add_statement("NEW")}
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {self.table}_on_update AFTER UPDATE ON {self.source}
+            BEGIN
+                {self._remove_statements("OLD")}
+                {self._add_statement("NEW")}
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {self.table}_on_delete AFTER DELETE ON {self.source}
+            BEGIN
+                {self._remove_statements("OLD")}
+            END""",
+        ]
+
+    def add_new_rows_statement(self) -> str:
+        """Builds the statement adding the source rows with an id above a parameter to the summary table, grouped per key."""
+        key_expressions = [build("timestamp") for build in self.keys.values()]
+        columns = list(self.keys) + list(self.values) + [self.count_column]
+        sums = [f"SUM(COALESCE({source_column}, 0))" for source_column in self.values.values()]
+        updates = [f"{column} = {column} + excluded.{column}" for column in list(self.values) + [self.count_column]]
+        return f"""INSERT INTO {self.table} ({', '.join(columns)})
+            SELECT {', '.join(key_expressions + sums)}, COUNT(*)
+            FROM {self.source}
+            WHERE id > ? AND {day_expression("timestamp")} IS NOT NULL
+            GROUP BY {', '.join(str(position) for position in range(1, len(self.keys) + 1))}
+            ON CONFLICT ({', '.join(self.keys)}) DO UPDATE SET {', '.join(updates)}"""
+
+    def rebuild_statements(self) -> List[str]:
+        """Builds the statements recomputing the whole summary table from its source table."""
+        key_expressions = [build("timestamp") for build in self.keys.values()]
+        columns = list(self.keys) + list(self.values) + [self.count_column]
+        sums = [f"SUM(COALESCE({source_column}, 0))" for source_column in self.values.values()]
+        return [
+            f"DELETE FROM {self.table}",
+            f"""INSERT INTO {self.table} ({', '.join(columns)})
+            SELECT {', '.join(key_expressions + sums)}, COUNT(*)
+            FROM {self.source}
+            WHERE {day_expression("timestamp")} IS NOT NULL
+            GROUP BY {', '.join(str(position) for position in range(1, len(self.keys) + 1))}""",
+        ]
+
+
+ROLLUPS = [
+    Rollup(
+        table="daily_nutrition",
+        source="food_eaten",
+        keys={"date": day_expression, "time_of_day": time_of_day_expression},
+        values={
+            "calories": "calories",
+            "carbs": "carbohydrates_total_g",
+            "fats": "fat_total_g",
+            "proteins": "protein_g",
+        },
+        count_column="entries",
+    ),
+    Rollup(
+        table="daily_cycling",
+        source="cycling_data",
+        keys={"date": calendar_day_expression},
+        values={"duration": "duration", "calories": "calories"},
+        count_column="sessions",
+    ),
+]
+
+
+def create_rollup_tables(cursor: sqlite3.Cursor) -> None:
+    """Creates the daily summary tables and their triggers. Tables that did not exist yet are filled from their source table.
+
+    Must run inside a write transaction, so no write to a source table slips in between the initial fill and the triggers.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor of the running write transaction.
+    """
+    for rollup in ROLLUPS:
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (rollup.table,)
+        ).fetchone()
+        cursor.execute(rollup.create_table_statement())
+        for statement in rollup.create_trigger_statements():
+            cursor.execute(statement)
+        if not exists:
+            for statement in rollup.rebuild_statements():
+                cursor.execute(statement)
+
+
+def recreate_rollup(cursor: sqlite3.Cursor, table: str) -> None:
+    """Replaces the triggers of one daily summary table and recomputes it, after its keys or values changed.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor of the running write transaction.
+        table (str): The summary table, one of ROLLUPS.
+    """
+    rollup = next(rollup for rollup in ROLLUPS if rollup.table == table)
+    for event in ("insert", "update", "delete"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {table}_on_{event}")
+    for statement in rollup.create_trigger_statements() + rollup.rebuild_statements():
+        cursor.execute(statement)
+
+
+@contextmanager
+def bulk_insert(cursor: sqlite3.Cursor, source: str) -> Iterator[None]:
+    """Replaces the per-row insert triggers of the summaries of a table by one grouped update for many inserted rows.
+
+    The triggers are dropped and created again inside the running transaction, so other connections never see them missing.
+    Only for inserts that let SQLite assign the ids, the summaries are updated with the rows above the previous largest id.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor of the running write transaction.
+        source (str): The table the rows are inserted into.
+    """
+    rollups = [rollup for rollup in ROLLUPS if rollup.source == source]
+    if not rollups:
+        yield
+        return
+    last_id = cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {source}").fetchone()[0]
+    for rollup in rollups:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {rollup.table}_on_insert")
+    yield
+    for rollup in rollups:
+        cursor.execute(rollup.add_new_rows_statement(), (last_id,))
+        cursor.execute(rollup.create_trigger_statements()[0])
@@ -0,0 +1,256 @@
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from data_tools.migrations import CHANGE_LOG_TABLES
+from decorators import log_execution_time
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pinned in requirements.txt, without it every process reads and parses the whole tables again
+    logging.warning("pyarrow is not installed, the table snapshots are kept in memory only and rebuilt after a restart")
+    pa = None
+
+# the column parsed to datetime64 and the text columns stored as categoricals, per table. Only tables read as
+# snapshots keep a change log, as only reads prune it, see drop_change_log in data_tools.migrations
+SNAPSHOT_COLUMNS: Dict[str, Tuple[str, List[str]]] = {
+    "bodyweight": ("date", []),
+}
+# more changed rows than this are cheaper to apply by reading the whole table again
+MAX_CHANGED_ROWS = 10_000
+# change log entries kept behind the newest one a snapshot applied, older ones are deleted once twice as many piled up.
+# Snapshots of other processes that are further behind reload, as they would for that many changes anyway
+RETAINED_LOG_ENTRIES = MAX_CHANGED_ROWS
+# files written under other rules of applying the change log are not used, they are built again from the table
+SNAPSHOT_FORMAT = b"2"
+
+
+def parse_table(table_name: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Converts rows as read from SQLite into the dtypes the analytics work with.
+
+    Args:
+        table_name (str): The table the rows come from, one of SNAPSHOT_COLUMNS.
+        df (pd.DataFrame): The rows as returned by pd.read_sql_query.
+
+    Returns:
+        pd.DataFrame: The rows with a datetime64 time column, categorical names and float64 values, newest first.
+            Time values that cannot be parsed become NaT.
+    """
+    time_column, categorical_columns = SNAPSHOT_COLUMNS[table_name]
+    df[time_column] = pd.to_datetime(df[time_column], format="ISO8601", errors="coerce")
+    for column in categorical_columns:
+        df[column] = df[column].astype("category")
+    numeric_columns = df.columns.difference(["id", time_column, *categorical_columns])
+    df[numeric_columns] = df[numeric_columns].astype("float64")
+    return df.sort_values([time_column, "id"], ascending=False, ignore_index=True)
+
+
+class TableSnapshot:
+    """A typed, columnar copy of one table that is kept up to date incrementally and stored as an Arrow file.
+
+    A read first compares the largest id and the last change log entry of the table with the ones the snapshot was built from.
+    If something was written since, only the new rows (by id) and the rows the change log names at ids up to the
+    largest known one (updated, deleted, or inserted again under the id of a deleted row) are read from SQLite and
+    merged in, and the file is written again. A new process memory-maps the file instead of reading and parsing the
+    whole table. Without pyarrow installed, the snapshot lives in memory only. Applied change log entries are deleted
+    once enough piled up, see RETAINED_LOG_ENTRIES.
+
+    Args:
+        db_path (str): The path to the SQLite3 database file.
+        table_name (str): The table to copy, one of SNAPSHOT_COLUMNS.
+        directory (str): The directory of the Arrow file, named after the table.
+    """
+
+    def __init__(self, db_path: str, table_name: str, directory: str):
+        if table_name not in SNAPSHOT_COLUMNS:
+            raise ValueError(f"{table_name} is not one of {', '.join(SNAPSHOT_COLUMNS)}")
+        self.db_path = db_path
+        self.table_name = table_name
+        self.path = os.path.join(directory, f"{table_name}.arrow")
+        self._log_table = CHANGE_LOG_TABLES[table_name]
+        self._frame: Optional[pd.DataFrame] = None
+        self._last_id = 0
+        self._last_seq = 0
+        # the largest id and change log entry seen at the last refresh, to skip refreshes when nothing was written
+        self._state: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def _read_rows(self, conn: sqlite3.Connection, condition: str = "", params: Tuple = ()) -> pd.DataFrame:
+        return parse_table(self.table_name, pd.read_sql_query(f"SELECT * FROM {self.table_name} {condition}", conn, params=params))
+
+    def _load_file(self) -> None:
+        """Memory-maps the Arrow file of a previous run, if there is one that can be read."""
+        if pa is None or not os.path.exists(self.path):
+            return
+        try:
+            table = ipc.open_file(pa.memory_map(self.path, "r")).read_all()
+            metadata = table.schema.metadata or {}
+            if metadata.get(b"format") != SNAPSHOT_FORMAT:
+                logging.info(f"Rebuilding the snapshot {self.path} written by an older version")
+                return
+            self._frame = table.to_pandas()
+            self._last_id = int(metadata[b"last_id"])
+            self._last_seq = int(metadata[b"last_seq"])
+            self._state = (int(metadata[b"max_id"]), self._last_seq)
+        except (pa.ArrowException, OSError, KeyError, ValueError) as e:
+            logging.warning(f"Ignoring the unreadable snapshot {self.path}: {e}")
+            self._frame = None
+
+    def _write_file(self) -> None:
+        """Replaces the Arrow file atomically, so other processes never map a half written file."""
+        if pa is None:
+            return
+        table = pa.Table.from_pandas(self._frame, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b"format": SNAPSHOT_FORMAT,
+            b"last_id": str(self._last_id).encode(),
+            b"last_seq": str(self._last_seq).encode(),
+            b"max_id": str(self._state[0]).encode(),
+        })
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with pa.OSFile(temporary_path, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(temporary_path, self.path)
+        except OSError as e:
+            logging.warning(f"Could not write the snapshot {self.path}: {e}")
+
+    def _reload(self, conn: sqlite3.Connection) -> None:
+        # the change log position is read before the rows, so a write in between is applied again on the next refresh
+        self._last_seq = conn.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {self._log_table}").fetchone()[0]
+        self._frame = self._read_rows(conn)
+        self._last_id = self._max_id(self._frame)
+
+    def _refresh(self, conn: sqlite3.Connection) -> bool:
+        """Applies all writes since the last refresh to the frame.
+
+        Returns:
+            bool: Whether the frame changed.
+        """
+        state = conn.execute(
+            f"SELECT (SELECT COALESCE(MAX(id), 0) FROM {self.table_name}), "
+            f"(SELECT COALESCE(MAX(seq), 0) FROM {self._log_table})"
+        ).fetchone()
+        if self._frame is None:
+            self._load_file()
+        if self._frame is not None and state == self._state:
+            return False
+        oldest_seq = conn.execute(f"SELECT MIN(seq) FROM {self._log_table}").fetchone()[0]
+        if self._frame is None or state[1] < self._last_seq or (oldest_seq or 0) > self._last_seq + 1:
+            # no snapshot yet, one of a different database, or one older than the entries left in the change log
+            self._reload(conn)
+            self._state = state
+            return True
+
+        # rows above the largest known id are read as new rows, the log only matters for the ones the frame may hold,
+        # which includes inserts that reuse the id of a deleted row
+        changed_ids = [row_id for row_id, in conn.execute(
+            f"SELECT DISTINCT row_id FROM {self._log_table} WHERE seq > ? AND seq <= ? AND row_id <= ? "
+            f"ORDER BY row_id LIMIT ?",
+            (self._last_seq, state[1], self._last_id, MAX_CHANGED_ROWS + 1),
+        )]
+        if len(changed_ids) > MAX_CHANGED_ROWS:
+            self._reload(conn)
+            self._state = state
+            return True
+        new_rows = self._read_rows(conn, "WHERE id > ?", (self._last_id,))
+        changed_rows = None
+        if changed_ids:
+            placeholders = ", ".join(["?"] * len(changed_ids))
+            # rows that were deleted are simply not found again
+            changed_rows = self._read_rows(conn, f"WHERE id IN ({placeholders})", tuple(changed_ids))
+
+        self._last_seq = state[1]
+        self._state = state
+        if new_rows.empty and not changed_ids:
+            return False
+        frame = self._frame[~self._frame["id"].isin(changed_ids)] if changed_ids else self._frame
+        if not new_rows.empty:
+            self._last_id = max(self._last_id, int(new_rows["id"].max()))
+        self._frame = self._merge(frame, [part for part in (changed_rows, new_rows) if part is not None and not part.empty])
+        return True
+
+    def _prune_log(self, conn: sqlite3.Connection) -> None:
+        """Deletes the change log entries more than RETAINED_LOG_ENTRIES behind the ones this snapshot applied."""
+        oldest_seq = conn.execute(f"SELECT MIN(seq) FROM {self._log_table}").fetchone()[0]
+        if oldest_seq is None or self._last_seq - oldest_seq < 2 * RETAINED_LOG_ENTRIES:
+            return
+        try:
+            # the newest entries stay, so MAX(seq) never goes back and other snapshots do not take it for another database
+            conn.execute(f"DELETE FROM {self._log_table} WHERE seq <= ?", (self._last_seq - RETAINED_LOG_ENTRIES,))
+            conn.commit()
+        except sqlite3.OperationalError as e:  # e.g. locked by a long write, the next refresh tries again
+            conn.rollback()
+            logging.warning(f"Could not prune the change log {self._log_table}: {e}")
+
+    def _merge(self, frame: pd.DataFrame, parts: List[pd.DataFrame]) -> pd.DataFrame:
+        """Adds parsed rows to the sorted frame, keeping it sorted newest first."""
+        if not parts:
+            return frame
+        time_column, categorical_columns = SNAPSHOT_COLUMNS[self.table_name]
+        for column in categorical_columns:
+            # with the same categories everywhere, the concatenation keeps the codes instead of falling back to object
+            categories = frame[column].cat.categories
+            for part in parts:
+                categories = categories.append(part[column].cat.categories.difference(categories))
+            frame = frame.assign(**{column: frame[column].cat.set_categories(categories)})
+            parts = [part.assign(**{column: part[column].cat.set_categories(categories)}) for part in parts]
+        if len(parts) == 1 and parts[0]["id"].min() > self._max_id(frame):
+            new_rows = parts[0]
+            newest = frame[time_column].iloc[0] if len(frame) else None
+            if new_rows[time_column].notna().all() and (newest is None or new_rows[time_column].min() >= newest):
+                # entries are mostly added in time order, they simply go in front of the already sorted frame
+                return pd.concat([new_rows, frame], ignore_index=True)
+        frame = pd.concat([frame, *parts], ignore_index=True)
+        return frame.sort_values([time_column, "id"], ascending=False, ignore_index=True)
+
+    @staticmethod
+    def _max_id(frame: pd.DataFrame) -> int:
+        return int(frame["id"].max()) if len(frame) else 0
+
+    @log_execution_time
+    def read(self, conn: sqlite3.Connection) -> pd.DataFrame:
+        """Returns the up-to-date table, reading only what changed since the previous read.
+
+        Args:
+            conn (sqlite3.Connection): A connection to the database of the snapshot.
+
+        Returns:
+            pd.DataFrame: The table as parsed by parse_table. It shares its memory with the snapshot, so columns
+                may be replaced or added but values must not be modified in place.
+        """
+        with self._lock:
+            if self._refresh(conn):
+                # the file is written first, a restart from it must not need the pruned entries
+                self._write_file()
+                self._prune_log(conn)
+            return self._frame.copy(deep=False)
+
+
+_snapshots: Dict[Tuple[str, str], TableSnapshot] = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_table_snapshot(db_path: str, table_name: str) -> TableSnapshot:
+    """Returns the process-wide snapshot of a table, stored in a snapshots directory next to the database file.
+
+    Args:
+        db_path (str): The path to the SQLite3 database file.
+        table_name (str): The table, one of SNAPSHOT_COLUMNS.
+
+    Returns:
+        TableSnapshot: The snapshot, created on first use.
+    """
+    with _snapshots_lock:
+        key = (os.path.abspath(db_path), table_name)
+        if key not in _snapshots:
+            directory = os.path.join(os.path.dirname(key[0]), "snapshots")
+            _snapshots[key] = TableSnapshot(db_path, table_name, directory)
+        return _snapshots[key]
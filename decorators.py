@@ -0,0 +1,37 @@
+import functools
+import logging
+import time
+from typing import Callable
+
+from instrumentation import FUNCTION_DURATION, FUNCTION_ERRORS
+
+
+def log_execution_time(func: Callable) -> Callable:
+    """Measures every call of the wrapped function.
+
+    The wall time goes to the latency histogram of the function, which also counts its calls, and to the log.
+    Exceptions are counted per function and raised again. The function keeps its name and signature,
+    so the decorator can be applied below the Dash callback decorator.
+
+    Args:
+        func (Callable): The function to measure.
+
+    Returns:
+        Callable: The wrapped function.
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            FUNCTION_ERRORS.inc(function=name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            FUNCTION_DURATION.observe(elapsed, function=name)
+            logging.debug(f"{name} executed in {elapsed:.4f} seconds")
+
+    return wrapper
@@ -0,0 +1,260 @@
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# upper bounds of the histogram buckets, seconds for latencies and row counts for database reads
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROWS_BUCKETS = (0, 1, 10, 50, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count per combination of label values, e.g. the errors per function.
+
+    Args:
+        name (str): The metric name, without the registry prefix.
+        help (str): The description shown by Prometheus.
+        labels (tuple): The names of the labels every increment has to pass.
+    """
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, **labels: str) -> None:
+        """Adds value to the count of the given label values."""
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def values(self) -> Dict[LabelValues, float]:
+        """Returns a snapshot of the count per combination of label values."""
+        with self._lock:
+            return dict(self._values)
+
+    def render(self, prefix: str) -> Iterator[str]:
+        name = f"{prefix}{self.name}"
+        yield f"# HELP {name} {self.help}"
+        yield f"# TYPE {name} counter"
+        for key, value in sorted(self.values().items()):
+            yield f"{name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class _HistogramSeries:
+    """The bucket counts, sum and count of one combination of label values."""
+
+    def __init__(self, bucket_count: int):
+        self.counts = [0] * (bucket_count + 1)  # the last one counts the values above the largest bound
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """Counts observed values, e.g. latencies, in fixed buckets per combination of label values.
+
+    The memory used does not grow with the number of observations. Quantiles are estimated from the buckets
+    by linear interpolation, the same way Prometheus' histogram_quantile does.
+
+    Args:
+        name (str): The metric name, without the registry prefix.
+        help (str): The description shown by Prometheus.
+        buckets (tuple): The ascending upper bounds of the buckets.
+        labels (tuple): The names of the labels every observation has to pass.
+    """
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._series: Dict[LabelValues, _HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Counts one value for the given label values."""
+        key = tuple(str(labels[name]) for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(len(self.buckets))
+            series.counts[index] += 1
+            series.sum += value
+            series.count += 1
+
+    def _snapshot(self) -> Dict[LabelValues, Tuple[List[int], float, int]]:
+        with self._lock:
+            return {key: (list(series.counts), series.sum, series.count) for key, series in self._series.items()}
+
+    def _quantile(self, counts: List[int], count: int, q: float) -> float:
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    # above the largest bound nothing is known but the bound itself
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return 0.0
+
+    def summary(self, quantiles: Sequence[float] = (0.5, 0.95, 0.99)) -> Dict[LabelValues, Dict[str, float]]:
+        """Returns the count, sum, mean and estimated quantiles per combination of label values.
+
+        Args:
+            quantiles (tuple): The quantiles to estimate, e.g. 0.99 for p99.
+
+        Returns:
+            dict: For each combination of label values, count, sum, mean and p50, p95 and p99 (named after the quantiles).
+        """
+        summaries = {}
+        for key, (counts, total, count) in self._snapshot().items():
+            summary = {"count": count, "sum": total, "mean": total / count if count else 0.0}
+            for q in quantiles:
+                summary[f"p{round(q * 100):g}"] = self._quantile(counts, count, q)
+            summaries[key] = summary
+        return summaries
+
+    def render(self, prefix: str) -> Iterator[str]:
+        name = f"{prefix}{self.name}"
+        yield f"# HELP {name} {self.help}"
+        yield f"# TYPE {name} histogram"
+        for key, (counts, total, count) in sorted(self._snapshot().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                yield f"{name}_bucket{_format_labels(self.labels, key, le)} {cumulative}"
+            yield f"{name}_sum{_format_labels(self.labels, key)} {_format_value(total)}"
+            yield f"{name}_count{_format_labels(self.labels, key)} {count}"
+
+
+class MetricsRegistry:
+    """The process-wide collection of metrics, rendered in the Prometheus text format by the /metrics route.
+
+    Counters and histograms are updated where things happen. Components that already keep their own counters,
+    like the nutrition API client and the daily data cache, are registered as collectors instead: their stats() dict is
+    read at scrape time and every number in it becomes a gauge, every text an info metric with the text as label.
+    Numbers that only ever grow, the keys ending in _total and the ones registered as counters, become counters named *_total.
+
+    Args:
+        prefix (str): The prefix of all metric names.
+    """
+
+    def __init__(self, prefix: str = "weightloss_"):
+        self.prefix = prefix
+        self._metrics: Dict[str, object] = {}
+        self._collectors: Dict[str, Tuple[str, Callable[[], Dict[str, object]], Tuple[str, ...]]] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            # modules can be imported more than once, e.g. by the benchmarks, the first registration wins
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        """Returns the counter of the given name, creating it on first use."""
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = SECONDS_BUCKETS, labels: Sequence[str] = ()) -> Histogram:
+        """Returns the histogram of the given name, creating it on first use."""
+        return self._register(Histogram(name, help, buckets, labels))
+
+    def get(self, name: str) -> Optional[object]:
+        """Returns the counter or histogram of the given name, or None if it was never created."""
+        with self._lock:
+            return self._metrics.get(name)
+
+    def register_collector(
+        self, name: str, help: str, stats: Callable[[], Dict[str, object]], counters: Sequence[str] = ()
+    ) -> None:
+        """Exposes the stats() dict of a component, read at scrape time.
+
+        Args:
+            name (str): The prefix of the metrics, e.g. "nutrition_api" for nutrition_api_requests_total.
+            help (str): The description of the component.
+            stats (Callable): Returns the current values, e.g. LRUCache.stats.
+            counters (Sequence[str]): The keys of the values that only ever grow, besides the ones ending in _total.
+        """
+        with self._lock:
+            self._collectors[name] = (help, stats, tuple(counters))
+
+    def collect(self) -> Dict[str, Dict[str, object]]:
+        """Reads the stats of every registered collector. Collectors that fail are left out.
+
+        Returns:
+            dict: The stats dict per collector name.
+        """
+        with self._lock:
+            collectors = dict(self._collectors)
+        collected = {}
+        for name, (_, stats, _) in collectors.items():
+            try:
+                collected[name] = stats()
+            except Exception:  # a broken component must not break the scrape of all others
+                continue
+        return collected
+
+    def render_prometheus(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format, version 0.0.4."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = dict(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render(self.prefix))
+        for collector, stats in self.collect().items():
+            help, _, counters = collectors[collector]
+            for key, value in stats.items():
+                name = f"{self.prefix}{collector}_{key}"
+                if isinstance(value, (int, float)):
+                    metric_type = "gauge"
+                    if key in counters or key.endswith("_total"):
+                        metric_type = "counter"
+                        name = name if name.endswith("_total") else f"{name}_total"
+                    lines += [f"# HELP {name} {help}", f"# TYPE {name} {metric_type}", f"{name} {_format_value(value)}"]
+                elif isinstance(value, str):
+                    lines += [f"# HELP {name}_info {help}", f"# TYPE {name}_info gauge", f'{name}_info{{{key}="{_escape(value)}"}} 1']
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+FUNCTION_DURATION = registry.histogram(
+    "function_duration_seconds", "Wall time of the functions wrapped in log_execution_time.", labels=("function",)
+)
+FUNCTION_ERRORS = registry.counter(
+    "function_errors_total", "Exceptions raised by the functions wrapped in log_execution_time.", labels=("function",)
+)
+DB_ROWS_READ = registry.histogram(
+    "db_rows_read", "Rows returned per query by the DataReader.", buckets=ROWS_BUCKETS, labels=("method",)
+)
+NUTRITION_API_LATENCY = registry.histogram(
+    "nutrition_api_request_seconds", "Duration of every single HTTP attempt to the nutrition API."
+)
+CACHE_LOOKUPS = registry.counter(
+    "cache_lookups_total", "Lookups in the caches that are not registered as collectors, by result.", labels=("cache", "result")
+)
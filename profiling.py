@@ -0,0 +1,148 @@
+import collections
+import itertools
+import os
+import sys
+import threading
+import time
+from typing import Deque, Dict, List, Optional, Tuple
+
+from flask import Flask, Response, g, request
+
+# the profiler only runs when the app is started with PROFILING_ENABLED=1, and then only for requests asking for it
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED") == "1"
+SAMPLE_INTERVAL_SECONDS = 0.005
+# the profiles of the most recent profiled requests kept for the admin page
+MAX_PROFILES = 20
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename
+    if path.startswith(_ROOT):
+        path = os.path.relpath(path, _ROOT)
+    else:
+        path = os.path.basename(path)
+    return f"{path}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """Records where one thread spends its time by looking at its stack at a fixed interval from a background thread.
+
+    Unlike cProfile, the profiled code runs at full speed, only the sampling thread costs time, so it can be used on
+    single requests of the running app. Samples are kept as collapsed stacks, one line per distinct stack
+    from the outermost to the innermost frame, which flamegraph.pl and speedscope read directly.
+
+    Args:
+        thread_id (int): The ident of the thread to sample, the calling thread if not provided.
+        interval (float): The seconds between two samples.
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks: Dict[Tuple[str, ...], int] = collections.Counter()
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start = 0.0
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+
+    def start(self) -> None:
+        """Starts sampling in a background thread."""
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops sampling and waits for the background thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._start
+
+    def collapsed(self) -> str:
+        """Returns the samples in the collapsed stack format, "outer;inner count" per line."""
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common())
+
+    def hot_spots(self, limit: int = 20) -> List[Tuple[str, int, int]]:
+        """Returns the functions seen most often, as (function, samples on top of the stack, samples anywhere on the stack)."""
+        own = collections.Counter()
+        total = collections.Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for name in set(stack):
+                total[name] += count
+        return [(name, own[name], count) for name, count in total.most_common(limit)]
+
+
+class Profile:
+    """The samples of one profiled request."""
+
+    def __init__(self, id: int, method: str, path: str, profiler: SamplingProfiler):
+        self.id = id
+        self.method = method
+        self.path = path
+        self.profiler = profiler
+        self.samples = sum(profiler.stacks.values())
+
+
+_profiles: Deque[Profile] = collections.deque(maxlen=MAX_PROFILES)
+_profile_ids = itertools.count(1)
+
+
+def recent_profiles() -> List[Profile]:
+    """Returns the kept profiles, the most recent first."""
+    return list(reversed(_profiles))
+
+
+def get_profile(profile_id: int) -> Optional[Profile]:
+    """Returns the kept profile with the given id, or None if it was dropped or never existed."""
+    return next((profile for profile in list(_profiles) if profile.id == profile_id), None)
+
+
+def install_request_profiler(app: Flask) -> None:
+    """Profiles the requests that ask for it with a ?profile=1 query parameter or an X-Profile: 1 header.
+
+    Does nothing unless PROFILING_ENABLED is set. Dash callbacks are profiled with the header, e.g. added with the
+    browser's developer tools. The profile id is returned in the X-Profile-Id header and listed on /admin/metrics.
+
+    Args:
+        app (Flask): The app whose requests to profile.
+    """
+    if not PROFILING_ENABLED:
+        return
+
+    @app.before_request
+    def start_profiler() -> None:
+        if request.args.get("profile") == "1" or request.headers.get("X-Profile") == "1":
+            g.profiler = SamplingProfiler()
+            g.profiler.start()
+
+    @app.after_request
+    def stop_profiler(response: Response) -> Response:
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.stop()
+            profile = Profile(next(_profile_ids), request.method, request.path, profiler)
+            _profiles.append(profile)
+            response.headers["X-Profile-Id"] = str(profile.id)
+        return response
+
+    @app.teardown_request
+    def discard_profiler(_: Optional[BaseException]) -> None:
+        # after_request is skipped when the request failed
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.stop()
@@ -1,4 +1,5 @@
 from flask import (
+    abort,
     flash,
     Flask,
     redirect,
@@ -8,10 +9,121 @@ from flask import (
     url_for,
     session,
 )
-from api.foodninja_api import get_food_info_from_api
+from api.food_lookup_queue import get_food_lookup_queue
+from api.foodninja_api import get_food_info_from_api, get_meal_info_from_api
+from api.nutrition_cache import normalize_food_name
+from data_tools.change_events import data_changes
 from data_tools.data_manager import SQLite3Writer, DataReader
-from data_tools.data_processing import process_nutrition_data
-from typing import Dict, Optional
+from data_tools.data_processing import parse_meal_items, process_nutrition_data
+from data_tools.migrations import TABLE_SCHEMAS
+from instrumentation import CACHE_LOOKUPS, DB_ROWS_READ, FUNCTION_DURATION, FUNCTION_ERRORS, registry
+from profiling import PROFILING_ENABLED, get_profile, recent_profiles
+import functools
+import json
+import os
+import sqlite3
+from typing import Callable, Dict, Iterator, Optional
+
+PAGE_SIZE = 50
+# /metrics and the admin pages have no access control of their own, they are only served when the app is started
+# with ADMIN_ENDPOINTS_ENABLED=1, e.g. behind a proxy that restricts them
+ADMIN_ENDPOINTS_ENABLED = os.getenv("ADMIN_ENDPOINTS_ENABLED") == "1"
+# an idle event stream sends a comment this often, so closed tabs are noticed and proxies keep the connection open
+EVENT_HEARTBEAT_SECONDS = 30
+# how long the browser waits before reconnecting a broken event stream
+EVENT_RETRY_MS = 3000
+
+
+def _read_page(endpoint: str, read_page: Callable, sort_column: str, filters: Dict[str, str]) -> Dict[str, any]:
+    """Reads the page of a management table requested by the query string and builds the links to its neighbouring pages.
+
+    The query string holds the filters and at most one keyset cursor, "after"/"after_id" for the next page or "before"/"before_id" for the previous one.
+    One row more than shown is read to find out if there is a page beyond the requested one.
+
+    Args:
+        endpoint (str): The endpoint of the management page, used for the page links.
+        read_page (Callable): The DataReader method reading a page, e.g. DataReader.read_food_eaten_page.
+        sort_column (str): The column the page is ordered by.
+        filters (dict): The filters as keyword arguments of read_page, kept in the page links.
+
+    Returns:
+        dict: The entries of the page, the filters and the URLs of the previous and next page, None where there is none.
+    """
+    cursor = {}
+    for direction in ("after", "before"):
+        value, row_id = request.args.get(direction), request.args.get(f"{direction}_id", type=int)
+        if value and row_id is not None:
+            cursor[direction] = (value, row_id)
+            break
+    ascending = request.args.get("order") == "asc"
+    entries = read_page(limit=PAGE_SIZE + 1, ascending=ascending, **filters, **cursor)
+    has_more = len(entries) > PAGE_SIZE
+    if "before" in cursor:
+        entries = entries[-PAGE_SIZE:]
+        has_previous, has_next = has_more, True
+    else:
+        entries = entries[:PAGE_SIZE]
+        has_previous, has_next = "after" in cursor, has_more
+
+    link_args = {key: value for key, value in filters.items() if value}
+    if ascending:
+        link_args["order"] = "asc"
+
+    def link(direction: str, row: sqlite3.Row) -> str:
+        return url_for(endpoint, **link_args, **{direction: row[sort_column], f"{direction}_id": int(row["id"])})
+
+    return {
+        "entries": entries,
+        "filters": filters,
+        "order": "asc" if ascending else "desc",
+        "previous_url": link("before", entries[0]) if has_previous and len(entries) else None,
+        "next_url": link("after", entries[-1]) if has_next and len(entries) else None,
+    }
+
+
+def _data_version_events(db_path: str) -> Iterator[str]:
+    """Generates the Server-Sent Events of one dashboard: the data versions of all tables, then the changed ones after every write.
+
+    The stream sleeps until a write is committed in this process. Writes of other processes are found by reading the
+    data versions from the database, at most once per heartbeat interval for all streams together.
+
+    Args:
+        db_path (str): The path to the SQLite3 database file.
+
+    Yields:
+        str: The encoded events, each one a JSON object of table names and data versions, and heartbeat comments.
+    """
+    reader = DataReader(db_path)
+    sequence, _ = data_changes.versions(db_path)
+    # on (re)connect the versions are read from the database, writes of other processes may have been missed
+    data_changes.publish(db_path, reader.read_data_versions())
+    _, versions = data_changes.versions(db_path)
+    versions = {table: versions.get(table, 0) for table in TABLE_SCHEMAS}
+    sent: Dict[str, int] = {}
+    yield f"retry: {EVENT_RETRY_MS}\n\n"
+    while True:
+        changed = {table: version for table, version in versions.items() if sent.get(table) != version}
+        if changed:
+            sent.update(changed)
+            yield f"data: {json.dumps(changed)}\n\n"
+        new_sequence, versions = data_changes.wait(db_path, sequence, EVENT_HEARTBEAT_SECONDS)
+        if new_sequence == sequence:
+            yield ": heartbeat\n\n"
+            data_changes.sync(db_path, reader.read_data_versions, EVENT_HEARTBEAT_SECONDS)
+            new_sequence, versions = data_changes.versions(db_path)
+        sequence = new_sequence
+
+
+def _admin_endpoint(view: Callable) -> Callable:
+    """Answers the wrapped route with 404 Not Found unless ADMIN_ENDPOINTS_ENABLED is set."""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_ENDPOINTS_ENABLED:
+            abort(404)
+        return view(*args, **kwargs)
+
+    return wrapper
 
 
 def register_routes(app: Flask) -> None:
@@ -22,6 +134,78 @@ def register_routes(app: Flask) -> None:
         app (Flask): The Flask application to register the routes for.
     """
 
+    @app.context_processor
+    def admin_endpoints_enabled() -> Dict[str, bool]:
+        """Lets the navigation bar leave out the link to the admin pages when they are not served."""
+        return {"admin_endpoints_enabled": ADMIN_ENDPOINTS_ENABLED}
+
+    @app.route("/events", methods=["GET"])
+    def data_change_events() -> Response:
+        """
+        Pushes the data versions to an open dashboard as Server-Sent Events, see assets/live_updates.js.
+
+        Returns:
+            Response: The event stream, open until the browser closes it.
+        """
+        return Response(
+            _data_version_events("data/bodyweight.db"),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.route("/metrics", methods=["GET"])
+    @_admin_endpoint
+    def metrics() -> Response:
+        """
+        Exposes the metrics of this process for Prometheus to scrape.
+
+        Returns:
+            Response: The metrics in the Prometheus text format.
+        """
+        return Response(registry.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+    @app.route("/admin/metrics", methods=["GET"])
+    @_admin_endpoint
+    def admin_metrics() -> Response:
+        """
+        Shows the latency of the measured functions, the cache and API counters and the recent request profiles.
+
+        Returns:
+            Response: The rendered HTML template.
+        """
+        errors = {key[0]: count for key, count in FUNCTION_ERRORS.values().items()}
+        functions = sorted(
+            ({"name": key[0], "errors": errors.get(key[0], 0), **summary} for key, summary in FUNCTION_DURATION.summary().items()),
+            key=lambda function: function["sum"],
+            reverse=True,
+        )
+        return render_template(
+            "admin_metrics.html",
+            functions=functions,
+            rows_read=DB_ROWS_READ.summary(),
+            cache_lookups=CACHE_LOOKUPS.values(),
+            components=registry.collect(),
+            profiling_enabled=PROFILING_ENABLED,
+            profiles=recent_profiles(),
+        )
+
+    @app.route("/admin/profiles/<int:profile_id>", methods=["GET"])
+    @_admin_endpoint
+    def admin_profile(profile_id: int) -> Response:
+        """
+        Returns the samples of a profiled request as collapsed stacks, the input format of flamegraph.pl and speedscope.
+
+        Args:
+            profile_id (int): The id from the X-Profile-Id header or the admin page.
+
+        Returns:
+            Response: The collapsed stacks as plain text.
+        """
+        profile = get_profile(profile_id)
+        if profile is None:
+            abort(404)
+        return Response(profile.profiler.collapsed(), mimetype="text/plain")
+
     @app.route("/", methods=["GET", "POST"])
     def index() -> Response:
         """Handles the main index page, allowing users to input food or bodyweight data and also displays the dashboard used to investigate eating and weight patterns.
@@ -35,17 +219,16 @@ def register_routes(app: Flask) -> None:
                 timestamp = request.form.get("timestamp")
                 food_item = request.form.get("food_item")
                 weight = request.form.get("weight")
-                nutrition_data = get_food_info_from_api(food_item, weight)
-                if not nutrition_data or not nutrition_data["items"]:
+                try:
+                    weight = float(weight)
+                except (TypeError, ValueError):
+                    weight = None
+                if not food_item or weight is None:
                     flash("invalid entry!", "failure")
-                    session.pop("data_to_save", None)
-                if nutrition_data and nutrition_data["items"]:
-                    data = process_nutrition_data(weight, nutrition_data)
-                    data["timestamp"] = timestamp
-                    session["data_to_save"] = data
-                    sqlwriter = SQLite3Writer("data/bodyweight.db")
-                    sqlwriter.create_data("food_eaten", session["data_to_save"])
-                    flash("Data saved successfully!", "success")
+                else:
+                    # the nutrition values are looked up in the background, see manage_food for the status
+                    get_food_lookup_queue().submit(food_item, weight, timestamp)
+                    flash("Data saved successfully! The nutrition values are being looked up.", "success")
             elif "bodyweight" in request.form:
                 weight_data = {}
                 weight_data["date"] = request.form.get("date")
@@ -59,16 +242,69 @@ def register_routes(app: Flask) -> None:
             return redirect("/")
         return render_template("index.html", data=session.get("data_to_save"))
 
+    @app.route("/add_meal", methods=["POST"])
+    def add_meal() -> Response:
+        """Saves all foods of a meal at once. The nutrition data of all foods is requested with one API call and the entries are inserted in one transaction.
+
+        Returns:
+            Response: A redirect to the index page.
+        """
+        timestamp = request.form.get("meal-timestamp")
+        meal_items = parse_meal_items(request.form.get("meal_items", ""))
+        if not meal_items:
+            flash("invalid entry!", "failure")
+            return redirect("/")
+        nutrition_items = get_meal_info_from_api([food_item for food_item, _ in meal_items])
+        rows = []
+        unknown_items = []
+        for food_item, weight in meal_items:
+            item = nutrition_items.get(normalize_food_name(food_item))
+            if item is None:
+                unknown_items.append(food_item)
+                continue
+            rows.append(process_nutrition_data(weight, {"items": [item]}, timestamp=timestamp))
+        sqlwriter = SQLite3Writer("data/bodyweight.db")
+        sqlwriter.create_many_data("food_eaten", rows)
+        if rows:
+            flash(f"{len(rows)} food entries saved successfully!", "success")
+        if unknown_items:
+            flash(f"invalid entry: {', '.join(unknown_items)}", "failure")
+        return redirect("/")
+
     @app.route("/manage_food", methods=["GET"])
     def manage_food() -> Response:
-        """Displays the management page for food data where entries made on the index page can be edited or deleted.
+        """Displays one page of the food entries, where entries made on the index page can be edited or deleted.
+        The entries can be filtered by date range and food name and are ordered by timestamp, newest first unless order=asc is given.
+        Entries whose nutrition values are still being looked up show the status of the lookup, failed lookups can be retried.
 
         Returns:
             Response: The rendered HTML template for managing food data.
         """
         data_reader = DataReader("data/bodyweight.db")
-        food_data = data_reader.read_food_eaten_data()
-        return render_template("manage_food.html", food_data=food_data)
+        filters = {
+            "start_date": request.args.get("start_date", ""),
+            "end_date": request.args.get("end_date", ""),
+            "search": request.args.get("search", "").strip(),
+        }
+        page = _read_page("manage_food", data_reader.read_food_eaten_page, "timestamp", filters)
+        lookup_jobs = data_reader.read_food_lookup_jobs([entry["id"] for entry in page["entries"]])
+        return render_template("manage_food.html", page=page, lookup_jobs=lookup_jobs)
+
+    @app.route("/retry_food_lookup/<int:entry_id>", methods=["POST"])
+    def retry_food_lookup(entry_id: int) -> Response:
+        """Queues the failed nutrition lookup of a food entry again.
+
+        Args:
+            entry_id (int): The ID of the food entry whose lookup failed.
+
+        Returns:
+            Response: A redirect to the manage_food page.
+        """
+        if get_food_lookup_queue().retry(entry_id):
+            flash("Nutrition lookup queued again.", "success")
+        else:
+            flash("There is no failed lookup for this entry.", "failure")
+        return redirect(request.referrer or url_for("manage_food"))
 
     @app.route("/delete_food_eaten/<int:entry_id>", methods=["POST"])
     def delete_food_eaten(entry_id: int) -> Response:
@@ -97,8 +333,10 @@ def register_routes(app: Flask) -> None:
         """
         data_reader = DataReader("data/bodyweight.db")
         food_entry = data_reader.read_single_food_entry(id=id)
-        old_name = food_entry.iloc[0]["name"]
-        old_serving_size_g = food_entry.iloc[0]["serving_size_g"]
+        if food_entry is None:
+            abort(404)
+        old_name = food_entry["name"]
+        old_serving_size_g = food_entry["serving_size_g"]
 
         if request.method == "POST":
             food_data = {}
@@ -126,21 +364,22 @@ def register_routes(app: Flask) -> None:
             flash("Food entry updated successfully!", "success")
             return redirect(url_for("manage_food"))
 
-        food_entry_dict = food_entry.iloc[0].to_dict()
-        return render_template("modify_food.html", entry=food_entry_dict)
+        return render_template("modify_food.html", entry=dict(food_entry))
 
     @app.route("/manage", methods=["GET"])
     def manage_bodyweight() -> Response:
-        """Displays the management page for bodyweight data.
+        """Displays one page of the bodyweight entries, filtered by date range and ordered by date, newest first unless order=asc is given.
 
         Returns:
             Response: The rendered HTML template for managing bodyweight data.
         """
         data_reader = DataReader("data/bodyweight.db")
-        bodyweight_data = data_reader.read_bodyweight_data()
-        return render_template(
-            "manage_bodyweight.html", bodyweight_data=bodyweight_data
-        )
+        filters = {
+            "start_date": request.args.get("start_date", ""),
+            "end_date": request.args.get("end_date", ""),
+        }
+        page = _read_page("manage_bodyweight", data_reader.read_bodyweight_page, "date", filters)
+        return render_template("manage_bodyweight.html", page=page)
 
     @app.route("/delete_bodyweight/<int:entry_id>", methods=["POST"])
     def delete_bodyweight(entry_id: int) -> Response:
@@ -169,6 +408,8 @@ def register_routes(app: Flask) -> None:
         """
         data_reader = DataReader("data/bodyweight.db")
         bodyweight_entry = data_reader.read_single_bodyweight_entry(id=id)
+        if bodyweight_entry is None:
+            abort(404)
 
         if request.method == "POST":
             weight_data = {}
@@ -178,8 +419,7 @@ def register_routes(app: Flask) -> None:
             sql_writer.update_data("bodyweight", weight_data, id)
             flash("Bodyweight entry updated successfully!", "success")
             return redirect(url_for("manage_bodyweight"))
-        bodyweight_entry_dict = bodyweight_entry.iloc[0].to_dict()
-        return render_template("modify_bodyweight.html", entry=bodyweight_entry_dict)
+        return render_template("modify_bodyweight.html", entry=dict(bodyweight_entry))
     
     @app.route('/add_cycling_data', methods=['POST'])
     def add_cycling_data():
@@ -0,0 +1,11 @@
+import pytest
+
+from data_tools.data_manager import connection_manager
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """The path of a new database file, migrated on first use. Its pooled connections are closed afterwards."""
+    path = str(tmp_path / "bodyweight.db")
+    yield path
+    connection_manager.close_all()
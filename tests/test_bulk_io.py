@@ -0,0 +1,47 @@
+import sys
+
+import pytest
+
+from data_tools import bulk_io
+from data_tools.bulk_io import ValidationError, import_rows
+from data_tools.data_manager import connection_manager
+
+
+def bodyweight_rows(ids):
+    return [{"id": str(row_id), "date": f"2024-01-{row_id:02d}", "bodyweight": "80.0"} for row_id in ids]
+
+
+def read_ids(db_path):
+    with connection_manager.connection(db_path) as conn:
+        return [row_id for row_id, in conn.execute("SELECT id FROM bodyweight ORDER BY id")]
+
+
+def test_chunk_with_a_taken_id_is_rolled_back_and_reported(db_path):
+    assert import_rows(db_path, "bodyweight", bodyweight_rows([1, 2]), keep_ids=True)["imported"] == 2
+
+    result = import_rows(db_path, "bodyweight", bodyweight_rows([3, 4, 2, 5, 6, 6, 7]), chunk_size=2, keep_ids=True)
+    assert (result["imported"], result["rejected"], result["skipped"]) == (3, 4, 0)
+    assert result["errors"] == [
+        (3, "id 2 is already taken, rows 3-4 were not imported"),
+        (6, "id 6 is already taken, rows 5-6 were not imported"),
+    ]
+    assert read_ids(db_path) == [1, 2, 3, 4, 7]
+
+
+def test_taken_id_aborts_a_strict_import(db_path):
+    import_rows(db_path, "bodyweight", bodyweight_rows([1]), keep_ids=True)
+    with pytest.raises(ValidationError, match="row 2: UNIQUE constraint failed"):
+        import_rows(db_path, "bodyweight", bodyweight_rows([2, 1, 3]), chunk_size=2, keep_ids=True, strict=True)
+    assert read_ids(db_path) == [1]
+
+
+def test_cli_exits_with_an_error_when_rows_were_rejected(db_path, tmp_path, monkeypatch, capsys):
+    path = tmp_path / "bodyweight.csv"
+    path.write_text("id,date,bodyweight\n1,2024-01-01,80.0\n1,2024-01-02,79.5\n")
+    monkeypatch.setattr(sys, "argv", ["bulk_io", "--db", db_path, "import", "bodyweight", str(path), "--keep-ids"])
+    with pytest.raises(SystemExit) as exit_info:
+        bulk_io.main()
+    assert exit_info.value.code == 1
+    errors = capsys.readouterr().err
+    assert "0 rows imported, 0 skipped, 2 rejected" in errors
+    assert "row 2: id 1 is already taken" in errors
@@ -0,0 +1,21 @@
+import pytest
+
+from api.food_composition import FoodCompositionDatabase
+
+
+def test_imported_values_are_scaled_to_100g(db_path):
+    database = FoodCompositionDatabase(db_path)
+    records = [
+        # an item of a CalorieNinjas response, for the serving that was asked for
+        {"name": "oats", "serving_size_g": 50.0, "calories": 194.5, "protein_g": 8.45},
+        # a dataset row without a serving size, per 100 g
+        {"name": "rice", "calories": "130", "protein_g": "2.7"},
+        {"name": "air", "serving_size_g": 0, "calories": 0},
+    ]
+    assert database.import_records(records) == 2
+
+    oats = database.lookup("oats")
+    assert (oats["serving_size_g"], oats["calories"], oats["protein_g"]) == (100.0, pytest.approx(389.0), pytest.approx(16.9))
+    rice = database.lookup("rice")
+    assert (rice["calories"], rice["protein_g"]) == (130.0, 2.7)
+    assert database.lookup("air") is None
@@ -0,0 +1,179 @@
+import threading
+import time
+
+import pytest
+
+from api import fake_nutrition_api, foodninja_api
+from api.fake_nutrition_api import start_fake_api
+from api.food_lookup_queue import DONE, FAILED, PENDING, RUNNING, FoodLookupQueue
+from api.nutrition_cache import NutritionCache
+from api.nutrition_client import CircuitBreaker, NutritionApiClient
+from data_tools.data_manager import SQLite3Writer, connection_manager, ensure_schema
+from data_tools.migrations import FOOD_LOOKUP_JOBS_TABLE
+
+
+@pytest.fixture
+def fake_api(tmp_path, monkeypatch):
+    """Points the lookups at the fake API, without the nutrition cache and food composition database of the app."""
+    server, url = start_fake_api()
+    client = NutritionApiClient(url, "test-key", max_attempts=1, circuit_breaker=CircuitBreaker(failure_threshold=100))
+    monkeypatch.setattr(foodninja_api, "_api_client", client)
+    monkeypatch.setattr(foodninja_api, "_nutrition_cache", NutritionCache(str(tmp_path / "nutrition_cache.db")))
+    monkeypatch.setattr(foodninja_api, "_food_composition", None)
+    monkeypatch.setattr(foodninja_api, "FOOD_COMPOSITION_DB", str(tmp_path / "missing.db"))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_queue(db_path):
+    queues = []
+
+    def make_queue(**kwargs):
+        kwargs.setdefault("retry_delay", 0.05)
+        queues.append(FoodLookupQueue(db_path, **kwargs))
+        return queues[-1]
+
+    yield make_queue
+    for queue in queues:
+        queue.shutdown()
+
+
+def read_job(db_path, food_eaten_id):
+    with connection_manager.connection(db_path) as conn:
+        return conn.execute(
+            f"SELECT status, attempts, last_error FROM {FOOD_LOOKUP_JOBS_TABLE} WHERE food_eaten_id = ?", (food_eaten_id,)
+        ).fetchone()
+
+
+def read_calories(db_path, food_eaten_id):
+    with connection_manager.connection(db_path) as conn:
+        return conn.execute("SELECT calories FROM food_eaten WHERE id = ?", (food_eaten_id,)).fetchone()[0]
+
+
+def read_entry(db_path, food_eaten_id):
+    with connection_manager.connection(db_path) as conn:
+        return conn.execute("SELECT name, serving_size_g, calories FROM food_eaten WHERE id = ?", (food_eaten_id,)).fetchone()
+
+
+def wait_for_status(db_path, food_eaten_id, status, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = read_job(db_path, food_eaten_id)
+        if job[0] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job of entry {food_eaten_id} is {read_job(db_path, food_eaten_id)}, not {status}")
+
+
+def test_submitted_food_is_filled_in(db_path, fake_api, make_queue):
+    queue = make_queue()
+    food_eaten_id = queue.submit("oats", 50, "2024-01-01 08:00")
+    status, attempts, last_error = wait_for_status(db_path, food_eaten_id, DONE)
+    assert (attempts, last_error) == (1, None)
+    assert read_calories(db_path, food_eaten_id) == pytest.approx(189.5)
+
+
+def test_lookup_is_retried_with_backoff_while_the_api_is_down(db_path, fake_api, make_queue):
+    fake_api.RequestHandlerClass.failure_rate = 1.0
+    queue = make_queue(max_attempts=10)
+    food_eaten_id = queue.submit("rice", 200, "2024-01-01 12:00")
+    deadline = time.monotonic() + 5
+    while read_job(db_path, food_eaten_id)[1] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    status, attempts, last_error = read_job(db_path, food_eaten_id)
+    assert status in (PENDING, RUNNING)
+    assert attempts >= 2
+    assert read_calories(db_path, food_eaten_id) is None
+
+    fake_api.RequestHandlerClass.failure_rate = 0.0
+    wait_for_status(db_path, food_eaten_id, DONE)
+    assert read_calories(db_path, food_eaten_id) == pytest.approx(254.8)
+
+
+def test_unknown_food_fails_and_can_be_retried(db_path, fake_api, make_queue, monkeypatch):
+    queue = make_queue()
+    food_eaten_id = queue.submit("quinoa", 100, "2024-01-01 19:00")
+    status, attempts, last_error = wait_for_status(db_path, food_eaten_id, FAILED)
+    assert (attempts, last_error) == (1, "unknown food")
+    assert not queue.retry(food_eaten_id + 1)
+
+    monkeypatch.setitem(fake_nutrition_api.FOODS, "quinoa", dict(fake_nutrition_api.FOODS["rice"], calories=120.0))
+    assert queue.retry(food_eaten_id)
+    status, attempts, last_error = wait_for_status(db_path, food_eaten_id, DONE)
+    assert attempts == 1
+    assert read_calories(db_path, food_eaten_id) == pytest.approx(120.0)
+    assert not queue.retry(food_eaten_id)
+
+
+def test_jobs_left_running_by_a_previous_process_are_requeued(db_path, fake_api, make_queue):
+    ensure_schema(db_path)
+    now = time.time()
+    with connection_manager.transaction(db_path) as cursor:
+        cursor.execute("INSERT INTO food_eaten (timestamp, name, serving_size_g) VALUES ('2024-01-01T08:00:00', 'egg', 60)")
+        food_eaten_id = cursor.lastrowid
+        cursor.execute(
+            f"""INSERT INTO {FOOD_LOOKUP_JOBS_TABLE}
+            (food_eaten_id, food_item, weight, status, attempts, next_attempt_at, created_at, updated_at)
+            VALUES (?, 'egg', 60, ?, 1, ?, ?, ?)""",
+            (food_eaten_id, RUNNING, now, now, now),
+        )
+    make_queue()
+    wait_for_status(db_path, food_eaten_id, DONE)
+    assert read_calories(db_path, food_eaten_id) == pytest.approx(88.2)
+
+
+def test_scheduled_retries_do_not_run_after_shutdown(db_path, fake_api, make_queue, monkeypatch):
+    errors = []
+    monkeypatch.setattr(threading, "excepthook", errors.append)
+    fake_api.RequestHandlerClass.failure_rate = 1.0
+    queue = make_queue(retry_delay=0.2)
+    food_eaten_id = queue.submit("apple", 100, "2024-01-01 10:00")
+    wait_for_status(db_path, food_eaten_id, PENDING)
+    deadline = time.monotonic() + 5
+    while read_job(db_path, food_eaten_id)[1] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    queue.shutdown()
+    requests_at_shutdown = fake_api.RequestHandlerClass.request_count
+
+    time.sleep(0.4)
+    assert errors == []
+    assert fake_api.RequestHandlerClass.request_count == requests_at_shutdown
+    assert read_job(db_path, food_eaten_id)[0] == PENDING
+
+
+def test_edit_before_a_pending_lookup_ends_the_job(db_path, fake_api, make_queue):
+    fake_api.RequestHandlerClass.failure_rate = 1.0
+    queue = make_queue(retry_delay=0.1, max_attempts=10)
+    food_eaten_id = queue.submit("rice", 200, "2024-01-01 12:00")
+    deadline = time.monotonic() + 5
+    while read_job(db_path, food_eaten_id)[:2] != (PENDING, 1) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    SQLite3Writer(db_path).update_data("food_eaten", {"name": "pasta", "serving_size_g": 150, "calories": 235.7}, food_eaten_id)
+    assert read_job(db_path, food_eaten_id)[0] == DONE
+    fake_api.RequestHandlerClass.failure_rate = 0.0
+    time.sleep(0.3)
+    assert read_entry(db_path, food_eaten_id) == ("pasta", 150.0, 235.7)
+    assert read_job(db_path, food_eaten_id) == (DONE, 1, None)
+
+
+def test_lookup_running_during_an_edit_does_not_overwrite_it(db_path, fake_api):
+    queue = FoodLookupQueue(db_path, workers=1)
+    queue.shutdown()
+    food_eaten_id = queue.submit("rice", 200, "2024-01-01 12:00")
+    job = queue._claim()
+    SQLite3Writer(db_path).update_data("food_eaten", {"serving_size_g": 100, "calories": 127.4}, food_eaten_id)
+    queue._process(job)
+    assert read_entry(db_path, food_eaten_id) == ("rice", 100.0, 127.4)
+    assert read_job(db_path, food_eaten_id)[0] == DONE
+
+
+def test_deleting_an_entry_removes_its_failed_lookup(db_path, fake_api, make_queue):
+    queue = make_queue()
+    food_eaten_id = queue.submit("quinoa", 100, "2024-01-01 19:00")
+    wait_for_status(db_path, food_eaten_id, FAILED)
+    SQLite3Writer(db_path).delete_data("food_eaten", food_eaten_id)
+    assert read_job(db_path, food_eaten_id) is None
+    assert not queue.retry(food_eaten_id)
@@ -0,0 +1,15 @@
+from instrumentation import MetricsRegistry
+
+
+def test_collector_values_that_only_grow_are_rendered_as_counters():
+    registry = MetricsRegistry(prefix="test_")
+    stats = {"hits": 3, "misses": 1, "hit_rate": 0.75, "latency_seconds_total": 0.5, "state": "closed"}
+    registry.register_collector("cache", "A cache.", lambda: stats, counters=("hits", "misses"))
+
+    lines = registry.render_prometheus().splitlines()
+    assert "# TYPE test_cache_hits_total counter" in lines
+    assert "test_cache_hits_total 3" in lines
+    assert "# TYPE test_cache_misses_total counter" in lines
+    assert "# TYPE test_cache_latency_seconds_total counter" in lines
+    assert "# TYPE test_cache_hit_rate gauge" in lines
+    assert 'test_cache_state_info{state="closed"} 1' in lines
@@ -0,0 +1,174 @@
+import time
+
+import pytest
+
+from api.fake_nutrition_api import start_fake_api
+from api.nutrition_client import CircuitBreaker, NutritionApiClient
+
+
+@pytest.fixture
+def fake_api():
+    """Starts the fake API. Statuses appended to server.statuses are answered, one per request, before normal responses."""
+    server, url = start_fake_api()
+    server.statuses = []
+    configured = server.RequestHandlerClass
+
+    class ScriptedHandler(configured):
+        def do_GET(self):
+            if server.statuses:
+                with self._count_lock:
+                    type(self).request_count += 1
+                status = server.statuses.pop(0)
+                self._respond(status, {"error": f"status {status}"})
+                return
+            super().do_GET()
+
+    server.RequestHandlerClass = ScriptedHandler
+    yield server, url
+    server.shutdown()
+    server.server_close()
+
+
+def request_count(server):
+    return server.RequestHandlerClass.request_count
+
+
+def make_client(url, **kwargs):
+    kwargs.setdefault("backoff_max", 0.01)
+    return NutritionApiClient(url, "test-key", **kwargs)
+
+
+def test_lookup_returns_the_items(fake_api):
+    server, url = fake_api
+    client = make_client(url)
+    data = client.lookup("oats 50g")
+    assert data["items"][0]["name"] == "oats"
+    assert data["items"][0]["calories"] == pytest.approx(189.5)
+    stats = client.stats()
+    assert (stats["requests"], stats["successes"], stats["errors"], stats["retries"]) == (1, 1, 0, 0)
+    assert stats["circuit_state"] == CircuitBreaker.CLOSED
+    assert stats["latency_seconds_total"] > 0
+    assert stats["latency_seconds_max"] <= stats["latency_seconds_total"]
+
+
+def test_read_timeout_fails_the_lookup_after_all_attempts():
+    server, url = start_fake_api(latency=0.5)
+    # the client is gone when the response is written
+    server.handle_error = lambda request, client_address: None
+    try:
+        client = make_client(url, read_timeout=0.05, max_attempts=2)
+        start = time.monotonic()
+        assert client.lookup("oats") is None
+        assert time.monotonic() - start < 0.5
+        stats = client.stats()
+        assert (stats["requests"], stats["retries"], stats["errors"], stats["successes"]) == (2, 1, 1, 0)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.parametrize("status", [500, 503, 429])
+def test_server_errors_and_rate_limiting_are_retried(fake_api, status):
+    server, url = fake_api
+    server.statuses.extend([status, status])
+    client = make_client(url, max_attempts=3)
+    assert client.lookup("rice")["items"][0]["name"] == "rice"
+    assert request_count(server) == 3
+    stats = client.stats()
+    assert (stats["requests"], stats["retries"], stats["successes"], stats["errors"]) == (3, 2, 1, 0)
+
+
+def test_retries_stop_after_max_attempts(fake_api):
+    server, url = fake_api
+    server.statuses.extend([503] * 5)
+    client = make_client(url, max_attempts=3)
+    assert client.lookup("rice") is None
+    assert request_count(server) == 3
+    stats = client.stats()
+    assert (stats["requests"], stats["retries"], stats["errors"]) == (3, 2, 1)
+
+
+@pytest.mark.parametrize("status", [400, 401, 404])
+def test_other_client_errors_are_not_retried(fake_api, status):
+    server, url = fake_api
+    server.statuses.append(status)
+    client = make_client(url, max_attempts=3)
+    assert client.lookup("rice") is None
+    assert request_count(server) == 1
+    stats = client.stats()
+    assert (stats["requests"], stats["retries"], stats["errors"]) == (1, 0, 1)
+
+
+def test_circuit_breaker_opens_and_rejects_without_requests(fake_api):
+    server, url = fake_api
+    server.statuses.extend([503] * 2)
+    client = make_client(url, max_attempts=1, circuit_breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    assert client.lookup("oats") is None
+    assert client.stats()["circuit_state"] == CircuitBreaker.CLOSED
+    assert client.lookup("oats") is None
+    assert client.stats()["circuit_state"] == CircuitBreaker.OPEN
+
+    assert client.lookup("oats") is None
+    assert request_count(server) == 2
+    stats = client.stats()
+    assert (stats["requests"], stats["errors"], stats["rejected_by_circuit_breaker"]) == (2, 2, 1)
+
+
+def test_circuit_breaker_recovers_through_a_trial_call(fake_api):
+    server, url = fake_api
+    server.statuses.extend([503] * 2)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    client = make_client(url, max_attempts=1, circuit_breaker=breaker)
+    assert client.lookup("oats") is None
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.15)
+
+    # the trial call fails, the circuit opens again for another reset_timeout
+    assert client.lookup("oats") is None
+    assert breaker.state == CircuitBreaker.OPEN
+    assert client.lookup("oats") is None
+    assert client.stats()["rejected_by_circuit_breaker"] == 1
+    time.sleep(0.15)
+
+    assert client.lookup("oats")["items"][0]["name"] == "oats"
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert request_count(server) == 3
+
+
+def test_circuit_breaker_lets_one_trial_call_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED, "failures are only counted while consecutive"
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+
+
+def test_client_errors_do_not_open_the_circuit_breaker(fake_api):
+    server, url = fake_api
+    server.statuses.extend([400, 404, 400, 404])
+    client = make_client(url, max_attempts=1, circuit_breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    for _ in range(4):
+        assert client.lookup("oatz") is None
+    assert client.stats()["circuit_state"] == CircuitBreaker.CLOSED
+    assert client.lookup("oats")["items"][0]["name"] == "oats"
+    assert client.stats()["rejected_by_circuit_breaker"] == 0
+
+
+def test_client_error_answering_a_trial_call_closes_the_circuit(fake_api):
+    server, url = fake_api
+    server.statuses.extend([503, 404])
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    client = make_client(url, max_attempts=1, circuit_breaker=breaker)
+    assert client.lookup("oats") is None
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.06)
+    assert client.lookup("oatz") is None
+    assert breaker.state == CircuitBreaker.CLOSED
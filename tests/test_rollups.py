@@ -0,0 +1,46 @@
+import sqlite3
+
+from data_tools.data_manager import DataReader, SQLite3Writer
+from data_tools.migrations import MIGRATIONS, apply_migrations
+
+
+def test_cycling_counts_towards_the_calendar_day_and_food_towards_the_shifted_day(db_path):
+    writer = SQLite3Writer(db_path)
+    writer.create_data("cycling_data", {"timestamp": "2024-01-02 01:00", "calories": 300, "duration": 45, "name_of_session": "late"})
+    writer.create_data("food_eaten", {"timestamp": "2024-01-02 01:00", "name": "oats", "calories": 200.0})
+    reader = DataReader(db_path)
+
+    cycling = reader.read_cycling_by_time_frame(time_frame="daily")
+    assert cycling["date"].dt.strftime("%Y-%m-%d").tolist() == ["2024-01-02"]
+    assert cycling["duration"].tolist() == [45]
+    nutrition = reader.read_nutrition_by_time_frame(time_frame="daily")
+    assert nutrition.index.strftime("%Y-%m-%d").tolist() == ["2024-01-01"]
+
+    writer.update_data("cycling_data", {"timestamp": "2024-01-03 00:30"}, 1)
+    cycling = reader.read_cycling_by_time_frame(time_frame="daily")
+    assert cycling["date"].dt.strftime("%Y-%m-%d").tolist() == ["2024-01-03"]
+
+
+def test_migration_regroups_the_existing_daily_cycling_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        for version, _, migration in MIGRATIONS[:7]:
+            migration(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version}")
+        conn.execute("DROP TRIGGER daily_cycling_on_insert")
+        conn.execute("DELETE FROM daily_cycling")
+        conn.execute(
+            """CREATE TRIGGER daily_cycling_on_insert AFTER INSERT ON cycling_data BEGIN
+            INSERT INTO daily_cycling (date, duration, calories, sessions)
+            VALUES (date(NEW.timestamp, '-2 hours'), NEW.duration, NEW.calories, 1); END"""
+        )
+        conn.execute("INSERT INTO cycling_data (timestamp, calories, duration) VALUES ('2024-01-02T01:00:00', 300, 45)")
+        conn.commit()
+        assert conn.execute("SELECT date FROM daily_cycling").fetchall() == [("2024-01-01",)]
+
+        apply_migrations(conn)
+        assert conn.execute("SELECT date, duration, sessions FROM daily_cycling").fetchall() == [("2024-01-02", 45.0, 1)]
+        conn.execute("INSERT INTO cycling_data (timestamp, calories, duration) VALUES ('2024-01-02T23:00:00', 100, 15)")
+        assert conn.execute("SELECT date, duration, sessions FROM daily_cycling").fetchall() == [("2024-01-02", 60.0, 2)]
+    finally:
+        conn.close()
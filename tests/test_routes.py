@@ -0,0 +1,129 @@
+import html
+import json
+import re
+
+import pytest
+
+import routes
+from data_tools import data_manager
+from data_tools.change_events import DataChangeBroker
+from data_tools.data_manager import SQLite3Writer, connection_manager, ensure_schema
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """A test client of the app, working on data/bodyweight.db in a temporary directory."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    # the app uses the same relative path in every test, each one has to migrate its own file
+    monkeypatch.setattr(data_manager, "_migrated_databases", set())
+    # as are the data versions known to this process
+    broker = DataChangeBroker()
+    monkeypatch.setattr(data_manager, "data_changes", broker)
+    monkeypatch.setattr(routes, "data_changes", broker)
+    ensure_schema("data/bodyweight.db")
+    import weightloss_dashboard  # imported late, it opens app.log in the working directory
+
+    yield weightloss_dashboard.app.test_client()
+    connection_manager.close_all()
+
+
+@pytest.mark.parametrize("path", ["/metrics", "/admin/metrics", "/admin/profiles/1"])
+def test_admin_endpoints_are_not_served_by_default(client, path):
+    assert client.get(path).status_code == 404
+    page = client.get("/manage_food")
+    assert page.status_code == 200
+    assert b"/admin/metrics" not in page.data
+
+
+def test_admin_endpoints_are_served_when_enabled(client, monkeypatch):
+    monkeypatch.setattr(routes, "ADMIN_ENDPOINTS_ENABLED", True)
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert b"# TYPE weightloss_daily_data_cache_hits_total counter" in response.data
+    assert client.get("/admin/metrics").status_code == 200
+    assert client.get("/admin/profiles/1").status_code == 404
+    assert b"/admin/metrics" in client.get("/manage_food").data
+
+
+def entry_ids(page):
+    return [int(entry_id) for entry_id in re.findall(r'/modify_food/(\d+)"', page.get_data(as_text=True))]
+
+
+def page_link(page, label):
+    match = re.search(rf'href="([^"]*)">{label}</a>', page.get_data(as_text=True))
+    return None if match.group(1) == "#" else html.unescape(match.group(1))
+
+
+def test_food_pages_follow_each_other_with_a_filter(client, monkeypatch):
+    monkeypatch.setattr(routes, "PAGE_SIZE", 3)
+    rows = [
+        ("2024-01-02T12:00:00", "rice"),
+        ("2024-01-02T12:00:00", "oats"),
+        ("2024-01-02T12:00:00", "Rice pudding"),
+        ("2024-01-02T12:00:00", "rice"),
+        ("2024-01-02T11:00:00", "rice"),
+        ("2024-01-02T10:00:00", "rice"),
+        ("2024-01-02T12:00:00", "rice"),
+        ("2024-01-05T12:00:00", "rice"),
+        ("2024-01-01T09:00:00", "rice"),
+    ]
+    SQLite3Writer("data/bodyweight.db").create_many_data(
+        "food_eaten", [{"timestamp": timestamp, "name": name, "serving_size_g": 100} for timestamp, name in rows]
+    )
+
+    first = client.get("/manage_food?start_date=2024-01-01&end_date=2024-01-03&search=RIC")
+    # the entries of 12:00 continue on the next page, ordered by id
+    assert entry_ids(first) == [7, 4, 3]
+    assert page_link(first, "Previous") is None
+    second = client.get(page_link(first, "Next"))
+    assert entry_ids(second) == [1, 5, 6]
+    third = client.get(page_link(second, "Next"))
+    assert entry_ids(third) == [9]
+    assert page_link(third, "Next") is None
+    assert entry_ids(client.get(page_link(second, "Previous"))) == [7, 4, 3]
+    assert entry_ids(client.get(page_link(third, "Previous"))) == [1, 5, 6]
+    assert "search=RIC" in page_link(second, "Next")
+
+
+def test_meal_is_saved_with_one_bulk_insert(client, monkeypatch):
+    oats = {"name": "oats", "calories": 389.0, "serving_size_g": 100.0, "protein_g": 16.9}
+    milk = {"name": "milk", "calories": 42.0, "serving_size_g": 100.0, "protein_g": 3.4}
+    lookups = []
+
+    def get_meal_info_from_api(food_items):
+        lookups.append(food_items)
+        return {"oats": oats, "milk": milk, "quinoa": None}
+
+    inserts = []
+    create_many_data = SQLite3Writer.create_many_data
+
+    def record_insert(self, table_name, rows):
+        inserts.append((table_name, len(rows)))
+        create_many_data(self, table_name, rows)
+
+    monkeypatch.setattr(routes, "get_meal_info_from_api", get_meal_info_from_api)
+    monkeypatch.setattr(SQLite3Writer, "create_many_data", record_insert)
+    response = client.post(
+        "/add_meal", data={"meal-timestamp": "2024-01-02T08:00", "meal_items": "Oats, 80\nmilk, 200\nquinoa, 50"}
+    )
+
+    assert response.status_code == 302
+    assert lookups == [["Oats", "milk", "quinoa"]]
+    assert inserts == [("food_eaten", 2)]
+    with connection_manager.connection("data/bodyweight.db") as conn:
+        rows = conn.execute("SELECT timestamp, name, serving_size_g, calories FROM food_eaten ORDER BY id").fetchall()
+    assert rows == [("2024-01-02T08:00:00", "oats", 80.0, pytest.approx(311.2)), ("2024-01-02T08:00:00", "milk", 200.0, 84.0)]
+
+
+def test_event_stream_sends_the_new_version_after_a_write(client):
+    writer = SQLite3Writer("data/bodyweight.db")
+    writer.create_data("bodyweight", {"date": "2024-01-01", "bodyweight": 80.0})
+    response = client.get("/events", buffered=False)
+    events = iter(response.response)
+    assert next(events) == f"retry: {routes.EVENT_RETRY_MS}\n\n".encode()
+    assert json.loads(next(events).removeprefix(b"data: ")) == {"food_eaten": 0, "bodyweight": 1, "cycling_data": 0}
+
+    writer.create_data("bodyweight", {"date": "2024-01-02", "bodyweight": 79.5})
+    assert next(events) == b'data: {"bodyweight": 2}\n\n'
+    response.close()
@@ -0,0 +1,112 @@
+import os
+
+from data_tools.bulk_io import import_rows
+from data_tools.data_manager import DataReader, SQLite3Writer, connection_manager
+from data_tools import snapshots
+from data_tools.snapshots import TableSnapshot
+
+
+def add_bodyweights(writer, count, start_day=1):
+    for day in range(start_day, start_day + count):
+        writer.create_data("bodyweight", {"date": f"2024-01-{day:02d}", "bodyweight": 80.0 + day})
+
+
+def test_snapshot_finds_a_row_that_reuses_the_id_of_the_deleted_newest_row(db_path):
+    writer = SQLite3Writer(db_path)
+    reader = DataReader(db_path)
+    add_bodyweights(writer, 3)
+    assert len(reader.read_table_snapshot("bodyweight")) == 3
+
+    writer.delete_data("bodyweight", 3)
+    assert sorted(reader.read_table_snapshot("bodyweight")["id"]) == [1, 2]
+
+    add_bodyweights(writer, 1, start_day=10)
+    snapshot = reader.read_table_snapshot("bodyweight")
+    assert sorted(snapshot["id"]) == [1, 2, 3]
+    assert snapshot.loc[snapshot["id"] == 3, "bodyweight"].item() == 90.0
+
+
+def test_snapshot_finds_rows_imported_with_ids_below_the_largest_one(db_path):
+    writer = SQLite3Writer(db_path)
+    reader = DataReader(db_path)
+    add_bodyweights(writer, 3)
+    assert len(reader.read_table_snapshot("bodyweight")) == 3
+    writer.delete_data("bodyweight", 2)
+    writer.delete_data("bodyweight", 3)
+    assert sorted(reader.read_table_snapshot("bodyweight")["id"]) == [1]
+
+    rows = [{"id": "2", "date": "2024-02-02", "bodyweight": "79.5"}, {"id": "3", "date": "2024-02-03", "bodyweight": "79.0"}]
+    result = import_rows(db_path, "bodyweight", rows, keep_ids=True)
+    assert result["imported"] == 2
+    assert sorted(reader.read_table_snapshot("bodyweight")["id"]) == [1, 2, 3]
+
+
+def test_snapshot_file_stays_correct_after_a_restart(db_path):
+    writer = SQLite3Writer(db_path)
+    directory = os.path.join(os.path.dirname(db_path), "restart")
+    add_bodyweights(writer, 3)
+    with connection_manager.connection(db_path) as conn:
+        TableSnapshot(db_path, "bodyweight", directory).read(conn)
+        writer.delete_data("bodyweight", 3)
+        TableSnapshot(db_path, "bodyweight", directory).read(conn)
+        add_bodyweights(writer, 1, start_day=10)
+        snapshot = TableSnapshot(db_path, "bodyweight", directory).read(conn)
+    assert sorted(snapshot["id"]) == [1, 2, 3]
+
+
+def count_log_entries(db_path):
+    with connection_manager.connection(db_path) as conn:
+        return conn.execute("SELECT COUNT(*), MAX(seq) FROM bodyweight_changes").fetchone()
+
+
+def test_applied_change_log_entries_are_pruned(db_path, monkeypatch):
+    monkeypatch.setattr(snapshots, "RETAINED_LOG_ENTRIES", 2)
+    writer = SQLite3Writer(db_path)
+    reader = DataReader(db_path)
+    for day in range(1, 21):
+        add_bodyweights(writer, 1, start_day=day)
+        reader.read_table_snapshot("bodyweight")
+    entries, last_seq = count_log_entries(db_path)
+    assert entries <= 4
+    assert last_seq == 20
+
+
+def test_snapshot_behind_the_pruned_entries_reloads(db_path, monkeypatch):
+    monkeypatch.setattr(snapshots, "RETAINED_LOG_ENTRIES", 2)
+    writer = SQLite3Writer(db_path)
+    add_bodyweights(writer, 3)
+    directory = os.path.join(os.path.dirname(db_path), "other_process")
+    with connection_manager.connection(db_path) as conn:
+        behind = TableSnapshot(db_path, "bodyweight", directory)
+        behind.read(conn)
+        writer.update_data("bodyweight", {"bodyweight": 70.0}, 1)
+        writer.delete_data("bodyweight", 2)
+        for day in range(10, 20):
+            add_bodyweights(writer, 1, start_day=day)
+            TableSnapshot(db_path, "bodyweight", os.path.join(os.path.dirname(db_path), "ahead")).read(conn)
+        assert count_log_entries(db_path)[0] < 10
+        snapshot = behind.read(conn)
+    assert sorted(snapshot["id"]) == [1, 3, *range(4, 14)]
+    assert snapshot.loc[snapshot["id"] == 1, "bodyweight"].item() == 70.0
+
+
+def test_only_the_snapshot_tables_keep_a_change_log(db_path):
+    writer = SQLite3Writer(db_path)
+    for minute in range(10):
+        writer.create_data("food_eaten", {"timestamp": f"2024-01-01T12:{minute:02d}:00", "name": "rice", "serving_size_g": 100})
+    for food_eaten_id in range(1, 11):
+        writer.update_data("food_eaten", {"serving_size_g": 150}, food_eaten_id)
+        writer.delete_data("food_eaten", food_eaten_id)
+    rows = [{"timestamp": f"2024-01-02T12:{minute:02d}:00", "name": "oats", "serving_size_g": "50"} for minute in range(10)]
+    assert import_rows(db_path, "food_eaten", rows)["imported"] == 10
+    writer.create_data("cycling_data", {"timestamp": "2024-01-01T18:00:00", "duration": 60, "name_of_session": "ride"})
+    add_bodyweights(writer, 1)
+
+    with connection_manager.connection(db_path) as conn:
+        names = conn.execute("SELECT type, name FROM sqlite_master WHERE name LIKE '%_changes' OR name LIKE '%_log_%'").fetchall()
+        assert conn.execute("SELECT COUNT(*) FROM food_eaten").fetchone()[0] == 10
+    log_tables = {name for kind, name in names if kind == "table"}
+    logging_triggers = {name for kind, name in names if kind == "trigger"}
+    assert log_tables == {"bodyweight_changes"}
+    assert logging_triggers == {"bodyweight_log_insert", "bodyweight_log_update", "bodyweight_log_delete"}
+    assert count_log_entries(db_path)[0] == 1